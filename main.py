@@ -8,10 +8,12 @@ import os
 # Add src directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
-from extract_data import extract_all_data
-from process_data import process_all_data
+from extract_data import NYT_URL, OWID_URL, WHO_URL, extract_all_data
+from process_data import has_processing_sources, load_processing_sources, process_all_data
 from analyze import run_complete_analysis
 from generate_html import create_html_dashboard
+from rollup_cube import DEFAULT_CUBE_PATH, RollupCube
+from validate_data import validate_sources
 
 
 def main():
@@ -28,21 +30,57 @@ def main():
     COUNTRY = "United States"
     SAVE_RAW = True
     SAVE_PROCESSED = True
+    CONCURRENT_EXTRACT = True
+    USE_CACHE = True  # Revalidate raw files with conditional GET instead of re-downloading
+    OFFLINE = False  # Serve raw files only from the local cache
+    SAVE_COLUMNAR = True  # Also keep typed .npy-per-column copies for fast reloads
+    SAVE_CUBE = True  # Materialize daily/weekly/monthly/variant rollups once for analysis and dashboard
+    MEMOIZE = True  # Skip processing when raw inputs and processing code are unchanged
+    INCREMENTAL = False  # Merge only new dates into existing raw/processed data
+    COUNTRIES = None  # e.g. [COUNTRY] to stream OWID/WHO and keep only these countries (None = whole world)
+    VALIDATE = True  # Write a data-quality report (data/processed/validation_report.json) on every run
+    TEST_METHOD = "asymptotic"  # "permutation" for Monte Carlo permutation p-values
+    SUBNATIONAL_LEVEL = None  # 'states' or 'counties' to also build a weekly NY Times panel per FIPS code
     
     try:
         # Step 1: Extract Data
         print("\n" + "=" * 80)
         print("STEP 1: DATA EXTRACTION")
         print("=" * 80)
-        owid_df, who_df, nyt_df, source_urls = extract_all_data(country=COUNTRY, save_raw=SAVE_RAW)
+        if OFFLINE and SAVE_COLUMNAR and has_processing_sources():
+            # Offline runs read only the needed raw columns from the columnar copies
+            print("Loading processing columns from the raw columnar store...")
+            owid_df, who_df, nyt_df = load_processing_sources()
+            source_urls = {'owid': OWID_URL, 'who': WHO_URL, 'nyt': NYT_URL}
+        else:
+            owid_df, who_df, nyt_df, source_urls = extract_all_data(
+                country=COUNTRY, save_raw=SAVE_RAW, concurrent=CONCURRENT_EXTRACT,
+                use_cache=USE_CACHE, offline=OFFLINE, countries=COUNTRIES,
+                save_columnar=SAVE_COLUMNAR, incremental=INCREMENTAL
+            )
+        
+        if VALIDATE:
+            validate_sources({'owid': owid_df, 'who': who_df, 'nyt': nyt_df})
         
         # Step 2: Process Data
         print("\n" + "=" * 80)
         print("STEP 2: DATA PROCESSING")
         print("=" * 80)
         owid_processed, who_processed, merged_df = process_all_data(
-            owid_df, who_df, nyt_df, country=COUNTRY, save_processed=SAVE_PROCESSED
+            owid_df, who_df, nyt_df, country=COUNTRY, save_processed=SAVE_PROCESSED,
+            save_columnar=SAVE_COLUMNAR, incremental=INCREMENTAL, save_cube=SAVE_CUBE,
+            memoize=MEMOIZE
         )
+        cube = RollupCube.load(DEFAULT_CUBE_PATH) if SAVE_CUBE else None
+        
+        if SUBNATIONAL_LEVEL:
+            from extract_data import extract_nyt_subnational_data
+            from subnational import build_subnational_panel
+            subnational_paths = extract_nyt_subnational_data(SUBNATIONAL_LEVEL, use_cache=USE_CACHE,
+                                                             offline=OFFLINE)
+            build_subnational_panel(subnational_paths, SUBNATIONAL_LEVEL,
+                                    save_path=f"data/processed/nyt_{SUBNATIONAL_LEVEL}_weekly.csv",
+                                    save_columnar=SAVE_COLUMNAR)
         
         # Convert to datetime index if needed
         import pandas as pd
@@ -54,13 +92,14 @@ def main():
         print("\n" + "=" * 80)
         print("STEP 3: STATISTICAL ANALYSIS")
         print("=" * 80)
-        analysis_results = run_complete_analysis(merged_df)
+        analysis_results = run_complete_analysis(merged_df, cube=cube, country=COUNTRY, test_method=TEST_METHOD)
         
         # Step 4: Create HTML Dashboard
         print("\n" + "=" * 80)
         print("STEP 4: CREATING HTML DASHBOARD")
         print("=" * 80)
-        create_html_dashboard(merged_df, analysis_results, source_urls, owid_df, who_df, nyt_df, save_path="index.html")
+        create_html_dashboard(merged_df, analysis_results, source_urls, owid_df, who_df, nyt_df, save_path="index.html",
+                              cube=cube)
         
         # Final Summary
         print("\n" + "=" * 80)
@@ -0,0 +1,275 @@
+"""
+Aggregation Module
+Vectorized daily-to-period rollups (daily, weekly, monthly, quarterly)
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# Frequencies and the label each period gets (the last day of the period,
+# matching pandas' 'D', 'W' (W-SUN), 'ME' and 'QE' resample labels)
+FREQUENCIES = ('D', 'W', 'M', 'Q')
+
+# Default reducers for the processed daily series
+DEFAULT_REDUCERS = {
+    'new_cases': 'sum',  # Sum cases for the period
+    'new_deaths': 'sum',  # Sum deaths for the period
+    'new_cases_owid': 'sum',  # OWID's own case counts, for source reconciliation
+    'I': 'any',  # 1 if any infection in the period
+    'vaccination_rate': 'mean',  # Average vaccination rate for the period
+    'people_vaccinated': 'mean',
+    'people_vaccinated_per_hundred': 'mean'
+}
+
+REDUCERS = ('sum', 'mean', 'any', 'max', 'min', 'first', 'last', 'count')
+
+# Named variant eras for the United States (name, first day); each era runs
+# until the day before the next one starts
+VARIANT_PERIODS = [
+    ('pre-Alpha', '2020-01-01'),
+    ('Alpha', '2021-04-01'),
+    ('Delta', '2021-06-27'),
+    ('Omicron', '2021-12-19')
+]
+
+
+def period_end_labels(dates, freq):
+    """
+    Label each date with the last day of its period
+
+    Args:
+        dates: datetime64 array
+        freq: 'D', 'W' (weeks ending Sunday), 'M' (month end) or 'Q' (quarter end)
+
+    Returns:
+        datetime64[ns] array of period labels, same length as dates
+    """
+    days = np.asarray(dates).astype('datetime64[D]')
+    if freq == 'D':
+        labels = days
+    elif freq == 'W':
+        # 1970-01-01 was a Thursday, so (days + 3) % 7 is Monday=0 ... Sunday=6
+        weekday = (days.astype(np.int64) + 3) % 7
+        labels = days + (6 - weekday).astype('timedelta64[D]')
+    elif freq == 'M':
+        labels = (days.astype('datetime64[M]') + 1).astype('datetime64[D]') - 1
+    elif freq == 'Q':
+        months = days.astype('datetime64[M]')
+        quarter_start = months - (months.astype(np.int64) % 3).astype('timedelta64[M]')
+        labels = (quarter_start + 3).astype('datetime64[D]') - 1
+    else:
+        raise ValueError(f"Unsupported frequency '{freq}', expected one of {FREQUENCIES}")
+    return labels.astype('datetime64[ns]')
+
+
+def calendar_trials(dates, freq):
+    """
+    Number of observation slots in each calendar period, at the resolution
+    of the series itself (days for a daily series, weeks for a weekly one)
+
+    The slots run from the first to the last date in steps of the series'
+    median spacing, so a month holds 28-31 days (or its 4-5 week ends) and
+    partial first and last periods are clipped to the observed span.
+
+    Args:
+        dates: Sorted datetime64 array of the series' observation dates
+        freq: Period frequency ('W', 'M', 'Q')
+
+    Returns:
+        Tuple of (datetime64[ns] period labels, int64 slots per period)
+    """
+    days = np.asarray(dates).astype('datetime64[D]')
+    if len(days) == 0:
+        return np.array([], dtype='datetime64[ns]'), np.array([], dtype=np.int64)
+    step = max(int(np.median(np.diff(days).astype(np.int64))), 1) if len(days) > 1 else 1
+    slots = np.arange(days[0], days[-1] + 1, step)
+    labels, trials = np.unique(period_end_labels(slots, freq), return_counts=True)
+    return labels, trials.astype(np.int64)
+
+
+def assign_periods(dates, periods=VARIANT_PERIODS):
+    """
+    Map each date to the index of the period containing it
+
+    Args:
+        dates: datetime64 array
+        periods: List of (name, start_date) sorted by start date
+
+    Returns:
+        int64 array of period codes (-1 for dates before the first period)
+    """
+    starts = np.array([pd.Timestamp(start).to_datetime64() for _, start in periods], dtype='datetime64[ns]')
+    return np.searchsorted(starts, np.asarray(dates).astype('datetime64[ns]'), side='right') - 1
+
+
+def _normalize_reducers(reducers, columns):
+    """Turn {out: how} / {out: (col, how)} into {out: (col, how)}"""
+    if reducers is None:
+        reducers = {col: how for col, how in DEFAULT_REDUCERS.items() if col in columns}
+    return {out: (out, how) if isinstance(how, str) else tuple(how) for out, how in reducers.items()}
+
+
+def _segment_starts(labels, groups=None):
+    """Start positions of contiguous runs of equal (group, label) in sorted arrays"""
+    boundary = np.empty(len(labels), dtype=bool)
+    if len(labels) > 0:
+        boundary[0] = True
+        boundary[1:] = labels[1:] != labels[:-1]
+        if groups is not None:
+            boundary[1:] |= groups[1:] != groups[:-1]
+    starts = np.flatnonzero(boundary)
+    counts = np.diff(np.append(starts, len(labels)))
+    return starts, counts
+
+
+def _reduce_segments(values, starts, counts, how):
+    """Apply one reducer to contiguous segments of a sorted array"""
+    values = np.asarray(values, dtype=float) if how not in ('any', 'count') else np.asarray(values)
+    if how == 'sum':
+        return np.add.reduceat(np.nan_to_num(values, nan=0.0), starts)
+    if how == 'mean':
+        valid = ~np.isnan(values)
+        sums = np.add.reduceat(np.where(valid, values, 0.0), starts)
+        n_valid = np.add.reduceat(valid.astype(np.int64), starts)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(n_valid > 0, sums / np.maximum(n_valid, 1), np.nan)
+    if how == 'any':
+        return np.maximum.reduceat((np.nan_to_num(values.astype(float), nan=0.0) > 0).astype(np.int64), starts)
+    if how == 'max':
+        return np.fmax.reduceat(values, starts)
+    if how == 'min':
+        return np.fmin.reduceat(values, starts)
+    if how == 'first':
+        return values[starts]
+    if how == 'last':
+        return values[starts + counts - 1]
+    if how == 'count':
+        return np.add.reduceat((~pd.isna(values)).astype(np.int64), starts)
+    raise ValueError(f"Unsupported reducer '{how}', expected one of {REDUCERS}")
+
+
+def aggregate_frequencies(daily, freqs=('W',), reducers=None, date_col=None, group_col=None):
+    """
+    Roll a daily series up to several frequencies from a single sort
+
+    The data is sorted once by (group, date). Period labels are monotone in
+    the date, so every frequency's periods are contiguous runs of that same
+    order, and each reducer is one NumPy ufunc.reduceat over the run starts;
+    no Python-level function is called per period. Only periods that contain
+    at least one row are returned.
+
+    Args:
+        daily: Daily DataFrame, with a DatetimeIndex or a date column
+        freqs: Iterable of frequencies ('D', 'W', 'M', 'Q')
+        reducers: Dict mapping output column to a reducer ('sum', 'mean', 'any',
+                  'max', 'min', 'first', 'last', 'count') or to a
+                  (source_column, reducer) pair; default: DEFAULT_REDUCERS
+                  restricted to the columns present
+        date_col: Date column name (default: use the index)
+        group_col: Optional column identifying independent series (e.g. country)
+
+    Returns:
+        Dict mapping frequency to an aggregated DataFrame indexed by period
+        end date, or by (group, date) when group_col is given
+    """
+    spec = _normalize_reducers(reducers, daily.columns)
+    dates, groups, group_names, columns = _sort_once(daily, spec, date_col, group_col)
+
+    results = {}
+    for freq in freqs:
+        labels = period_end_labels(dates, freq)
+        starts, counts = _segment_starts(labels, groups)
+
+        data = {out: _reduce_segments(columns[col], starts, counts, how)
+                for out, (col, how) in spec.items()}
+
+        date_index = pd.DatetimeIndex(labels[starts], name='date')
+        if groups is None:
+            index = date_index
+        else:
+            index = pd.MultiIndex.from_arrays(
+                [group_names.take(groups[starts]), date_index],
+                names=[group_col, 'date']
+            )
+        results[freq] = pd.DataFrame(data, index=index)
+
+    return results
+
+
+def aggregate_periods(daily, periods=VARIANT_PERIODS, reducers=None, date_col=None, group_col=None):
+    """
+    Roll a daily series up to named periods (e.g. variant eras)
+
+    Period codes come from one np.searchsorted over the period start dates,
+    and are reduced with the same segment reducers as aggregate_frequencies.
+    Dates before the first period are dropped.
+
+    Args:
+        daily: Daily DataFrame, with a DatetimeIndex or a date column
+        periods: List of (name, start_date) sorted by start date
+        reducers: See aggregate_frequencies
+        date_col: Date column name (default: use the index)
+        group_col: Optional column identifying independent series
+
+    Returns:
+        DataFrame indexed by period name (or (group, period)), with 'start'
+        and 'end' columns holding the first and last date seen in the period
+    """
+    spec = _normalize_reducers(reducers, daily.columns)
+    dates, groups, group_names, columns = _sort_once(daily, spec, date_col, group_col)
+
+    codes = assign_periods(dates, periods)
+    keep = codes >= 0
+    dates, codes = dates[keep], codes[keep]
+    if groups is not None:
+        groups = groups[keep]
+    columns = {col: values[keep] for col, values in columns.items()}
+
+    starts, counts = _segment_starts(codes, groups)
+    data = {
+        'start': pd.DatetimeIndex(dates[starts]),
+        'end': pd.DatetimeIndex(dates[starts + counts - 1])
+    }
+    for out, (col, how) in spec.items():
+        data[out] = _reduce_segments(columns[col], starts, counts, how)
+
+    names = np.array([name for name, _ in periods], dtype=object)
+    period_index = pd.Index(names[codes[starts]], name='period')
+    if groups is None:
+        index = period_index
+    else:
+        index = pd.MultiIndex.from_arrays(
+            [group_names.take(groups[starts]), period_index],
+            names=[group_col, 'period']
+        )
+    return pd.DataFrame(data, index=index)
+
+
+def _sort_once(daily, spec, date_col, group_col):
+    """Sort dates (within groups) once and gather the needed columns in that order"""
+    dates = daily.index.to_numpy() if date_col is None else daily[date_col].to_numpy()
+    dates = dates.astype('datetime64[ns]')
+
+    if group_col is None:
+        order = np.argsort(dates, kind='stable')
+        groups, group_names = None, None
+    else:
+        group_codes, group_names = pd.factorize(daily[group_col], sort=True)
+        order = np.lexsort((dates, group_codes))
+        groups = group_codes[order]
+
+    needed = {col for col, _ in spec.values()}
+    columns = {col: daily[col].to_numpy()[order] for col in needed}
+    return dates[order], groups, group_names, columns
+
+
+def aggregate(daily, freq='W', reducers=None, date_col=None, group_col=None):
+    """
+    Roll a daily series up to one frequency (see aggregate_frequencies)
+
+    Returns:
+        Aggregated DataFrame
+    """
+    return aggregate_frequencies(daily, freqs=(freq,), reducers=reducers,
+                                 date_col=date_col, group_col=group_col)[freq]
@@ -7,6 +7,18 @@ import pandas as pd
 import numpy as np
 from scipy import stats
 
+from aggregate import VARIANT_PERIODS, assign_periods, calendar_trials
+from changepoint import changepoint_periods, detect_changepoints
+from count_models import fit_count_models
+from cross_correlation import DEFAULT_MAX_LAG, lagged_cross_correlation, rolling_correlation
+from resampling import (batched_pearson, batched_proportion_difference, binomial_goodness_of_fit, bootstrap,
+                        default_block_size, permutation_test)
+
+
+# pandas period aliases accepted for the aggregate frequencies, and back
+TRIAL_FREQUENCIES = {'ME': 'M', 'QE': 'Q'}
+RESAMPLE_RULES = {'M': 'ME', 'Q': 'QE'}
+
 
 def calculate_bernoulli_parameters(df, infection_col="I", vaccination_col="vaccination_rate"):
     """
@@ -79,14 +91,23 @@ def calculate_conditional_probabilities(df, infection_col="I", vaccination_col="
     return results
 
 
-def calculate_binomial_parameters(df, period="W", infection_col="I"):
+def calculate_binomial_parameters(df, period="W", infection_col="I", cube=None, country="United States",
+                                  method="closed_form", n_simulations=100_000, seed=42):
     """
     Calculate Binomial distribution parameters for weekly/monthly infections
     
     Args:
         df: DataFrame with datetime index and infection data
-        period: Period for aggregation ('W' for weekly, 'M' for monthly)
+        period: Period for aggregation ('W' for weekly, 'M' for monthly, 'Q' for quarterly);
+                n_trials is the mean number of observations per calendar period
         infection_col: Column name for infection indicator
+        cube: Optional RollupCube; period totals are read from it instead of resampling
+        country: Country slice of the cube
+        method: 'closed_form' (Binomial moments) or 'simulation' (Monte Carlo
+                goodness of fit of Binomial and beta-binomial models, with each
+                period's exact number of trials from the calendar)
+        n_simulations: Simulated series per model for method='simulation'
+        seed: Seed for the simulations
     
     Returns:
         Dictionary with Binomial parameters and comparison
@@ -94,25 +115,25 @@ def calculate_binomial_parameters(df, period="W", infection_col="I"):
     # Calculate daily infection probability
     p_I = df[infection_col].mean()
     
-    # Determine number of trials based on period
-    if period == "W":
-        n_trials = 7
-    elif period == "M" or period == "ME":
-        n_trials = 30  # Approximate
-    else:
-        n_trials = 7
+    # Mean trials per calendar period at the series' own resolution (days
+    # for a daily series, weeks for a weekly one: 1 per week, 4-5 per month)
+    labels, trials = calendar_trials(df.index.to_numpy(), TRIAL_FREQUENCIES.get(period, period))
+    n_trials = float(trials.mean()) if len(trials) else np.nan
     
     # Expected value and variance for Binomial(n, p)
     E_period = n_trials * p_I
     Var_period = n_trials * p_I * (1 - p_I)
     
     # Aggregate actual data
-    if period == "W":
+    if cube is not None and period in ("W", "M", "ME"):
+        rollup = cube.slice(country, "W" if period == "W" else "M")
+        actual = rollup['infected_weeks'].astype(int).rename(infection_col)
+    elif period == "W":
         actual = df[infection_col].resample("W").sum()
     elif period == "M" or period == "ME":
         actual = df[infection_col].resample("ME").sum()
     else:
-        actual = df[infection_col].resample(period).sum()
+        actual = df[infection_col].resample(RESAMPLE_RULES.get(period, period)).sum()
     
     actual_mean = actual.mean()
     actual_var = actual.var()
@@ -129,10 +150,22 @@ def calculate_binomial_parameters(df, period="W", infection_col="I"):
         "variance_difference": actual_var - Var_period
     }
     
+    if method == "simulation":
+        counts = actual.reindex(pd.DatetimeIndex(labels)).fillna(0).to_numpy(dtype=float)
+        fit = binomial_goodness_of_fit(counts, trials, n_simulations=n_simulations, seed=seed)
+        results.update({
+            "method": "simulation",
+            "period_trials": trials.tolist(),
+            "goodness_of_fit": fit
+        })
+    elif method != "closed_form":
+        raise ValueError(f"Unsupported method '{method}', expected 'closed_form' or 'simulation'")
+    
     return results, actual
 
 
-def calculate_correlation_analysis(df, vaccination_col="vaccination_rate", cases_col="new_cases"):
+def calculate_correlation_analysis(df, vaccination_col="vaccination_rate", cases_col="new_cases",
+                                   method="asymptotic", seed=42):
     """
     Calculate correlation between vaccination rate and weekly case counts
     
@@ -140,6 +173,8 @@ def calculate_correlation_analysis(df, vaccination_col="vaccination_rate", cases
         df: DataFrame with vaccination and case data
         vaccination_col: Column name for vaccination rate
         cases_col: Column name for weekly case counts
+        method: 'asymptotic' (t-test) or 'permutation' (Monte Carlo permutation test)
+        seed: Seed for the permutations
     
     Returns:
         Dictionary with correlation results
@@ -165,10 +200,23 @@ def calculate_correlation_analysis(df, vaccination_col="vaccination_rate", cases
         "significant": p_value < 0.05 if not np.isnan(p_value) else False
     }
     
+    if method == "permutation":
+        data = df[[vaccination_col, cases_col]].dropna()
+        perm = permutation_test(data[vaccination_col], data[cases_col], statistic='pearson', seed=seed)
+        results.update({
+            "test_type": "Pearson correlation permutation test",
+            "p_value_asymptotic": p_value,
+            "p_value": perm["p_value"],
+            "p_value_mc_error": perm["mc_std_error"],
+            "n_permutations": perm["n_permutations"],
+            "significant": perm["p_value"] < 0.05
+        })
+    
     return results
 
 
-def perform_statistical_tests(df, infection_col="I", vaccination_col="vaccination_rate", threshold=0.5):
+def perform_statistical_tests(df, infection_col="I", vaccination_col="vaccination_rate", threshold=0.5,
+                              method="asymptotic", seed=42):
     """
     Perform statistical tests to compare high vs low vaccination groups
     
@@ -177,6 +225,8 @@ def perform_statistical_tests(df, infection_col="I", vaccination_col="vaccinatio
         infection_col: Column name for infection indicator
         vaccination_col: Column name for vaccination rate
         threshold: Vaccination rate threshold
+        method: 'asymptotic' (z-test) or 'permutation' (Monte Carlo permutation test)
+        seed: Seed for the permutations
     
     Returns:
         Dictionary with test results
@@ -213,10 +263,462 @@ def perform_statistical_tests(df, infection_col="I", vaccination_col="vaccinatio
         "significant": p_value < 0.05
     }
     
+    if method == "permutation" and n1 > 0 and n2 > 0:
+        data = df[[vaccination_col, infection_col]].dropna()
+        perm = permutation_test((data[vaccination_col] >= threshold).astype(float), data[infection_col],
+                                statistic='proportion_difference', seed=seed)
+        results.update({
+            "test_type": "Two-sample proportion permutation test",
+            "p_value_asymptotic": p_value,
+            "p_value": perm["p_value"],
+            "p_value_mc_error": perm["mc_std_error"],
+            "n_permutations": perm["n_permutations"],
+            "significant": perm["p_value"] < 0.05
+        })
+    
     return results
 
 
-def run_complete_analysis(df, infection_col="I", vaccination_col="vaccination_rate"):
+def _wide_panel(df, columns):
+    """One (country, week) array per column from a panel indexed by (country, date)"""
+    wide = df[columns].unstack(level='date')
+    return wide.index, wide.columns.unique(level='date'), [wide[col].to_numpy(dtype=float) for col in columns]
+
+
+def calculate_lagged_correlation(df, vaccination_col="vaccination_rate", cases_col="new_cases",
+                                 max_lag=DEFAULT_MAX_LAG, group_level="country"):
+    """
+    Correlation between vaccination and cases shifted by -max_lag..+max_lag weeks
+    
+    Lag k pairs the vaccination rate of week t with the cases of week t + k,
+    so positive lags test whether vaccination leads cases. All lags (and all
+    countries of a panel) are computed at once, see
+    cross_correlation.lagged_cross_correlation.
+    
+    Args:
+        df: Weekly DataFrame with a date index, or a panel indexed by (country, date)
+        vaccination_col: Column name for vaccination rate
+        cases_col: Column name for weekly case counts
+        max_lag: Largest lag in weeks
+        group_level: Index level holding the country in a panel
+    
+    Returns:
+        DataFrame with one row per (country,) lag: r, n, n_eff, p_value, significant
+    """
+    if isinstance(df.index, pd.MultiIndex):
+        groups, _, (vax, cases) = _wide_panel(df, [vaccination_col, cases_col])
+    else:
+        vax, cases = df[vaccination_col].to_numpy(dtype=float), df[cases_col].to_numpy(dtype=float)
+        groups = None
+    
+    result = lagged_cross_correlation(vax, cases, max_lag=max_lag)
+    n_series, n_lags = result["r"].shape
+    out = pd.DataFrame({
+        "lag": np.tile(result["lags"], n_series),
+        "r": result["r"].ravel(),
+        "n": result["n"].ravel(),
+        "n_eff": result["n_eff"].ravel(),
+        "p_value": result["p_value"].ravel()
+    })
+    out["significant"] = out["p_value"] < 0.05
+    if groups is not None:
+        out.insert(0, group_level, np.repeat(groups.to_numpy(), n_lags))
+    return out
+
+
+def calculate_rolling_correlation(df, vaccination_col="vaccination_rate", cases_col="new_cases", window=26,
+                                  min_periods=None, method="sums", group_level="country"):
+    """
+    Time-varying correlation between vaccination and cases over a sliding window
+    
+    Uses running sufficient statistics (O(1) per step), see
+    cross_correlation.rolling_correlation; method='welford' selects the
+    add/remove co-moment updates.
+    
+    Args:
+        df: DataFrame with a date index, or a panel indexed by (country, date)
+        vaccination_col: Column name for vaccination rate
+        cases_col: Column name for case counts
+        window: Window length in rows (weeks for the weekly data)
+        min_periods: Minimum number of valid pairs per window (default: window)
+        method: 'sums' or 'welford'
+        group_level: Index level holding the country in a panel
+    
+    Returns:
+        Series of r labelled by window end date (by (country, date) for a panel)
+    """
+    if isinstance(df.index, pd.MultiIndex):
+        groups, dates, (vax, cases) = _wide_panel(df, [vaccination_col, cases_col])
+        r = rolling_correlation(vax, cases, window, min_periods=min_periods, method=method)
+        rolling = pd.Series(r.ravel(), index=pd.MultiIndex.from_product([groups, dates]))
+        # Drop the padding outside each country's own date range
+        return rolling.reindex(df.index).rename("rolling_r")
+    
+    r = rolling_correlation(df[vaccination_col].to_numpy(dtype=float), df[cases_col].to_numpy(dtype=float),
+                            window, min_periods=min_periods, method=method)
+    return pd.Series(r, index=df.index, name="rolling_r")
+
+
+def threshold_sweep(df, infection_col="I", vaccination_col="vaccination_rate", thresholds=None):
+    """
+    Conditional infection probabilities and proportion z-tests for many thresholds
+    
+    Sorts the vaccination rates once and uses cumulative sums of the infection
+    indicator, so every threshold costs one binary search instead of a pass
+    over the data: O(n log n) in total. For each threshold t the groups match
+    calculate_conditional_probabilities and perform_statistical_tests
+    (high: V >= t, low: V < t).
+    
+    Args:
+        df: DataFrame with infection and vaccination data
+        infection_col: Column name for infection indicator
+        vaccination_col: Column name for vaccination rate
+        thresholds: Thresholds to evaluate (default: every distinct vaccination rate)
+    
+    Returns:
+        DataFrame with one row per threshold: n_high, n_low, p_I_high, p_I_low,
+        difference, se_high, se_low, z_statistic, p_value (NaN where a group is empty)
+    """
+    data = df[[vaccination_col, infection_col]].dropna()
+    vax = data[vaccination_col].to_numpy(dtype=float)
+    order = np.argsort(vax, kind="stable")
+    vax = vax[order]
+    infected = data[infection_col].to_numpy(dtype=float)[order]
+    cum_infected = np.concatenate(([0.0], np.cumsum(infected)))
+    
+    thresholds = np.unique(vax) if thresholds is None else np.asarray(thresholds, dtype=float)
+    n = len(vax)
+    n_low = np.searchsorted(vax, thresholds, side="left")
+    n_high = n - n_low
+    x_low = cum_infected[n_low]
+    x_high = cum_infected[-1] - x_low
+    
+    with np.errstate(invalid="ignore", divide="ignore"):
+        p_high = np.where(n_high > 0, x_high / n_high, np.nan)
+        p_low = np.where(n_low > 0, x_low / n_low, np.nan)
+        se_high = np.sqrt(p_high * (1 - p_high) / n_high)
+        se_low = np.sqrt(p_low * (1 - p_low) / n_low)
+        
+        # Two-sample proportion z-test with the pooled proportion
+        p_pooled = cum_infected[-1] / n if n > 0 else np.nan
+        se = np.sqrt(p_pooled * (1 - p_pooled) * (1 / n_high + 1 / n_low))
+        z_stat = np.where(se > 0, (p_high - p_low) / se, 0.0)
+        p_value = np.where(se > 0, 2 * stats.norm.sf(np.abs(z_stat)), 1.0)
+    
+    both = (n_high > 0) & (n_low > 0)
+    return pd.DataFrame({
+        "threshold": thresholds,
+        "n_high": n_high,
+        "n_low": n_low,
+        "p_I_high": p_high,
+        "p_I_low": p_low,
+        "difference": p_high - p_low,
+        "se_high": se_high,
+        "se_low": se_low,
+        "z_statistic": np.where(both, z_stat, np.nan),
+        "p_value": np.where(both, p_value, np.nan)
+    })
+
+
+def calculate_bootstrap_intervals(df, infection_col="I", vaccination_col="vaccination_rate", cases_col="new_cases",
+                                  threshold=0.5, n_resamples=10_000, block_size="auto", confidence=0.95,
+                                  seed=42, n_jobs=None):
+    """
+    Bootstrap confidence intervals for the correlation and the conditional
+    probability difference
+    
+    Weekly points are autocorrelated, so the moving-block bootstrap is the
+    default; pass block_size=None for the i.i.d. bootstrap.
+    
+    Args:
+        df: DataFrame with infection, vaccination and case data
+        infection_col: Column name for infection indicator
+        vaccination_col: Column name for vaccination rate
+        cases_col: Column name for weekly case counts
+        threshold: Vaccination rate threshold for the proportion difference
+        n_resamples: Number of bootstrap resamples
+        block_size: Moving-block length, "auto" for n^(1/3), or None for i.i.d.
+        confidence: Confidence level of the intervals
+        seed: Seed for reproducible resamples
+        n_jobs: Worker processes for very large n_resamples (see resampling.bootstrap)
+    
+    Returns:
+        Dictionary with 'correlation' and 'proportion_difference' results
+    """
+    data = df[[vaccination_col, cases_col, infection_col]].dropna()
+    if block_size == "auto":
+        block_size = default_block_size(len(data))
+    vax = data[vaccination_col].to_numpy(dtype=float)
+    
+    options = dict(n_resamples=n_resamples, block_size=block_size, confidence=confidence,
+                   seed=seed, n_jobs=n_jobs)
+    correlation = bootstrap(batched_pearson, (vax, data[cases_col].to_numpy(dtype=float)), **options)
+    difference = bootstrap(batched_proportion_difference,
+                           (data[infection_col].to_numpy(dtype=float), (vax >= threshold).astype(float)),
+                           **options)
+    difference["threshold"] = threshold
+    
+    return {
+        "correlation": correlation,
+        "proportion_difference": difference
+    }
+
+
+def batched_country_analysis(infection, vaccination, cases, threshold=0.5):
+    """
+    Bernoulli parameters, conditional probabilities, proportion z-test and
+    Pearson correlation test for many countries at once
+    
+    Each input is a (country, week) array and every statistic comes from
+    NaN-aware per-country sums (see grouped_statistics), so the cost of a
+    whole panel is a handful of array operations. Per row the results match
+    calculate_bernoulli_parameters, calculate_conditional_probabilities,
+    perform_statistical_tests and calculate_correlation_analysis, except
+    that missing weeks are skipped (the correlation uses complete pairs only)
+    and tests with an empty group or fewer than 3 pairs give NaN.
+    
+    Args:
+        infection: (country, week) array of the infection indicator, NaN = missing
+        vaccination: (country, week) array of vaccination rates
+        cases: (country, week) array of weekly case counts
+        threshold: Vaccination rate threshold for the high/low groups
+    
+    Returns:
+        Dictionary of per-country arrays
+    """
+    infection = np.atleast_2d(np.asarray(infection, dtype=float))
+    vaccination = np.atleast_2d(np.asarray(vaccination, dtype=float))
+    cases = np.atleast_2d(np.asarray(cases, dtype=float))
+    if not infection.shape == vaccination.shape == cases.shape:
+        raise ValueError("infection, vaccination and cases must have the same shape")
+    
+    rows = np.repeat(np.arange(infection.shape[0]), infection.shape[1])
+    return grouped_statistics(infection.ravel(), vaccination.ravel(), cases.ravel(), rows,
+                               infection.shape[0], threshold)
+
+
+def _center(values, valid, codes, n_codes):
+    """Center and scale values within each code (correlation is invariant to both)"""
+    count = np.bincount(codes, weights=valid, minlength=n_codes)
+    filled = np.where(valid, values, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(codes, weights=filled, minlength=n_codes) / count
+        centered = np.where(valid, values - mean[codes], 0.0)
+        std = np.sqrt(np.bincount(codes, weights=centered ** 2, minlength=n_codes) / count)
+    return centered / np.where(std > 0, std, 1.0)[codes]
+
+
+def grouped_statistics(infection, vaccination, cases, groups, n_groups, threshold=0.5, entities=None):
+    """
+    Bernoulli parameters, conditional probabilities, z-test and correlation
+    test per group from one pass of grouped sums
+    
+    This is the shared kernel of batched_country_analysis, analyze_segments
+    and the sensitivity grid; with a single group (all codes 0) it gives the
+    whole-series statistics.
+    
+    Every statistic is a function of per-group sums (counts, sums of I and
+    V, group counts and infections, and the pair sums of x, y, x^2, y^2,
+    xy), each one np.bincount over the group codes. Vaccination and cases
+    are centered and scaled per entity first, so the correlation sums do
+    not lose precision to cancellation.
+    
+    Args:
+        infection, vaccination, cases: 1-D arrays, NaN = missing
+        groups: int group code per row (0..n_groups-1, -1 to exclude the row)
+        n_groups: Number of groups
+        threshold: Vaccination rate threshold for the high/low groups
+        entities: Codes to center within (default: the groups themselves)
+    
+    Returns:
+        Dictionary of per-group arrays
+    """
+    keep = groups >= 0
+    infection, vaccination, cases, groups = infection[keep], vaccination[keep], cases[keep], groups[keep]
+    if entities is None:
+        entities, n_entities = groups, n_groups
+    else:
+        entities = entities[keep]
+        n_entities = int(entities.max()) + 1 if len(entities) else 0
+    
+    def total(weights):
+        return np.bincount(groups, weights=weights, minlength=n_groups)
+    
+    has_I, has_V, has_cases = ~np.isnan(infection), ~np.isnan(vaccination), ~np.isnan(cases)
+    I = np.where(has_I, infection, 0.0)
+    high = has_I & has_V & (vaccination >= threshold)
+    low = has_I & has_V & (vaccination < threshold)
+    pair = has_V & has_cases
+    x = _center(vaccination, pair, entities, n_entities)
+    y = _center(cases, pair, entities, n_entities)
+    
+    n_weeks = total(has_I).astype(np.int64)
+    n_high, n_low = total(high).astype(np.int64), total(low).astype(np.int64)
+    x_high, x_low = total(I * high), total(I * low)
+    n = total(pair).astype(np.int64)
+    sum_x, sum_y = total(x), total(y)
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Bernoulli parameters
+        p_I = total(I) / n_weeks
+        p_V = total(np.where(has_V, vaccination, 0.0)) / total(has_V)
+        
+        # Conditional probabilities and two-sample proportion z-test
+        p_high = x_high / n_high
+        p_low = x_low / n_low
+        se_high = np.where(n_high > 0, np.sqrt(p_high * (1 - p_high) / n_high), 0.0)
+        se_low = np.where(n_low > 0, np.sqrt(p_low * (1 - p_low) / n_low), 0.0)
+        
+        p_pooled = (x_high + x_low) / (n_high + n_low)
+        se = np.sqrt(p_pooled * (1 - p_pooled) * (1 / n_high + 1 / n_low))
+        both = (n_high > 0) & (n_low > 0)
+        z_stat = np.where(both, np.where(se > 0, (p_high - p_low) / se, 0.0), np.nan)
+        z_p_value = np.where(both, np.where(se > 0, 2 * stats.norm.sf(np.abs(z_stat)), 1.0), np.nan)
+        
+        # Pearson correlation over complete (vaccination, cases) pairs
+        cov = total(x * y) - sum_x * sum_y / n
+        var_x = total(x * x) - sum_x ** 2 / n
+        var_y = total(y * y) - sum_y ** 2 / n
+        r = np.clip(cov / np.sqrt(var_x * var_y), -1.0, 1.0)
+        r[(n < 3) | ~(var_x > 1e-12 * n) | ~(var_y > 1e-12 * n)] = np.nan
+        t_stat = np.where(np.abs(r) < 1, r * np.sqrt(n - 2) / np.sqrt(1 - r ** 2), np.sign(r) * np.inf)
+        p_value = np.where(np.abs(r) < 1, 2 * stats.t.sf(np.abs(t_stat), n - 2), 0.0)
+        p_value[np.isnan(r)] = np.nan
+    
+    return {
+        "n_weeks": n_weeks,
+        "p_I": p_I,
+        "p_V": p_V,
+        "var_I": p_I * (1 - p_I),
+        "var_V": p_V * (1 - p_V),
+        "p_I_high": p_high,
+        "p_I_low": p_low,
+        "difference": p_high - p_low,
+        "n_high": n_high,
+        "n_low": n_low,
+        "se_high": se_high,
+        "se_low": se_low,
+        "z_statistic": z_stat,
+        "z_p_value": z_p_value,
+        "sample_size": n,
+        "correlation_coefficient": r,
+        "t_statistic": t_stat,
+        "p_value": p_value
+    }
+
+
+def analyze_country_panel(panel, infection_col="I", vaccination_col="vaccination_rate", cases_col="new_cases",
+                          threshold=0.5, group_level="country"):
+    """
+    Run the single-country tests for every country of a weekly panel at once
+    
+    Args:
+        panel: Weekly DataFrame indexed by (country, date), e.g. from
+               process_data.build_country_panel
+        infection_col: Column name for infection indicator
+        vaccination_col: Column name for vaccination rate
+        cases_col: Column name for weekly case counts
+        threshold: Vaccination rate threshold for the high/low groups
+        group_level: Index level holding the country
+    
+    Returns:
+        DataFrame with one row per country (see batched_country_analysis for the columns)
+    """
+    groups, _, (infection, vaccination, cases) = _wide_panel(panel, [infection_col, vaccination_col, cases_col])
+    results = pd.DataFrame(batched_country_analysis(infection, vaccination, cases, threshold))
+    results.insert(0, group_level, groups.to_numpy())
+    results["significant"] = results["p_value"] < 0.05
+    results["threshold"] = threshold
+    return results
+
+
+def _period_table(periods):
+    """(name, start) pairs from named periods or bare breakpoint dates"""
+    table = [p if isinstance(p, (tuple, list)) else (f"from {pd.Timestamp(p):%Y-%m-%d}", p) for p in periods]
+    return sorted(((name, pd.Timestamp(start)) for name, start in table), key=lambda p: p[1])
+
+
+def analyze_segments(df, periods=VARIANT_PERIODS, infection_col="I", vaccination_col="vaccination_rate",
+                     cases_col="new_cases", threshold=0.5, group_level="country", changepoint_col="new_cases"):
+    """
+    Run the core tests separately for every period (and country) at once
+    
+    Each row gets a segment code, either from np.searchsorted on the period
+    start dates (aggregate.assign_periods) or from the regimes detected in
+    each country's own series (changepoint.detect_changepoints). All
+    statistics of all (country, period) segments then come from one grouped
+    pass over those codes (see grouped_statistics) rather than slicing the
+    frame per segment.
+    
+    Args:
+        df: Weekly DataFrame with a date index, or a panel indexed by (country, date)
+        periods: List of (name, start_date) periods such as VARIANT_PERIODS,
+                 bare breakpoint dates (each runs until the next one starts),
+                 or "changepoints" for regimes detected per country
+        infection_col: Column name for infection indicator
+        vaccination_col: Column name for vaccination rate
+        cases_col: Column name for weekly case counts
+        threshold: Vaccination rate threshold for the high/low groups
+        group_level: Index level holding the country in a panel
+        changepoint_col: Column segmented when periods="changepoints"
+    
+    Returns:
+        DataFrame with one row per (country,) period that has data
+        (see batched_country_analysis for the statistic columns)
+    """
+    panel = isinstance(df.index, pd.MultiIndex)
+    if panel:
+        entities, names = pd.factorize(df.index.get_level_values(group_level))
+        dates = df.index.get_level_values('date')
+    else:
+        entities, names = np.zeros(len(df), dtype=np.int64), None
+        dates = df.index
+    dates = dates.to_numpy(dtype='datetime64[ns]')
+    n_entities = len(names) if panel else 1
+    
+    detected = isinstance(periods, str)
+    if detected:
+        if periods != "changepoints":
+            raise ValueError(f"Unsupported periods '{periods}', expected a period list or 'changepoints'")
+        _, regimes = detect_changepoints(df, changepoint_col, group_level=group_level)
+        segments = regimes.to_numpy()
+        n_periods = int(segments.max()) + 1 if len(segments) else 0
+        period_names = [f"regime {k + 1}" for k in range(n_periods)]
+    else:
+        table = _period_table(periods)
+        n_periods = len(table)
+        segments = assign_periods(dates, table)
+        period_names = [name for name, _ in table]
+    
+    groups = np.where(segments >= 0, entities * n_periods + segments, -1)
+    results = pd.DataFrame(grouped_statistics(
+        df[infection_col].to_numpy(dtype=float), df[vaccination_col].to_numpy(dtype=float),
+        df[cases_col].to_numpy(dtype=float), groups, n_entities * n_periods, threshold, entities=entities
+    ))
+    
+    if detected:
+        # Detected regimes differ per country; label them with their first and last week
+        bounds = pd.Series(dates).groupby(groups).agg(['min', 'max']).reindex(range(n_entities * n_periods))
+        starts, ends = bounds['min'].to_numpy(), bounds['max'].to_numpy()
+    else:
+        starts = [start for _, start in table]
+        ends = [start - pd.Timedelta(days=1) for start in starts[1:]] + [pd.Timestamp(dates.max())]
+        starts, ends = np.tile(starts, n_entities), np.tile(ends, n_entities)
+    results.insert(0, "period", np.tile(period_names, n_entities))
+    results.insert(1, "start", starts)
+    results.insert(2, "end", ends)
+    if panel:
+        results.insert(0, group_level, np.repeat(names.to_numpy(), n_periods))
+    results["significant"] = results["p_value"] < 0.05
+    results["threshold"] = threshold
+    
+    # Segments without any rows (e.g. a period after a country's last report)
+    return results[results["n_weeks"] > 0].reset_index(drop=True)
+
+
+def run_complete_analysis(df, infection_col="I", vaccination_col="vaccination_rate", cube=None,
+                          country="United States", n_bootstrap=10_000, test_method="asymptotic",
+                          periods="changepoints"):
     """
     Run complete statistical analysis
     
@@ -224,6 +726,13 @@ def run_complete_analysis(df, infection_col="I", vaccination_col="vaccination_ra
         df: Processed DataFrame with infection and vaccination data
         infection_col: Column name for infection indicator
         vaccination_col: Column name for vaccination rate
+        cube: Optional RollupCube with pre-aggregated period totals
+        country: Country slice of the cube
+        n_bootstrap: Moving-block bootstrap resamples for the confidence intervals (0 to skip)
+        test_method: 'asymptotic' (t/z p-values) or 'permutation' (permutation-test p-values)
+        periods: Periods for the segmented tests and the count-model time
+                 dummies: "changepoints" for the case regimes detected by PELT,
+                 or a (name, start_date) list such as VARIANT_PERIODS
     
     Returns:
         Dictionary with all analysis results
@@ -249,34 +758,121 @@ def run_complete_analysis(df, infection_col="I", vaccination_col="vaccination_ra
     
     # Binomial parameters (weekly)
     print("\n3. Calculating Binomial parameters (weekly)...")
-    binomial_weekly, weekly_actual = calculate_binomial_parameters(df, period="W", infection_col=infection_col)
+    binomial_weekly, weekly_actual = calculate_binomial_parameters(df, period="W", infection_col=infection_col,
+                                                                     cube=cube, country=country)
     print(f"   Expected weekly infections: {binomial_weekly['expected_mean']:.3f}")
     print(f"   Actual weekly average: {binomial_weekly['actual_mean']:.3f}")
     print(f"   Expected variance: {binomial_weekly['expected_variance']:.3f}")
     print(f"   Actual variance: {binomial_weekly['actual_variance']:.3f}")
     
+    # Monte Carlo goodness of fit of the monthly counts, with exact month lengths
+    binomial_monthly, _ = calculate_binomial_parameters(df, period="M", infection_col=infection_col, cube=cube,
+                                                        country=country, method="simulation")
+    fit = binomial_monthly["goodness_of_fit"]
+    print(f"   Monthly counts ({fit['n_simulations']:,} simulations, beta-binomial rho = {fit['rho']:.3f}):")
+    for model in ("binomial", "beta_binomial"):
+        print(f"   {model}: variance p = {fit[model]['variance_p_value']:.4f}, "
+              f"dispersion p = {fit[model]['dispersion_p_value']:.4f}")
+    
     # Correlation analysis (main hypothesis test)
     print("\n4. Performing correlation analysis (main hypothesis test)...")
-    correlation_results = calculate_correlation_analysis(df, vaccination_col, cases_col="new_cases")
+    correlation_results = calculate_correlation_analysis(df, vaccination_col, cases_col="new_cases",
+                                                         method=test_method)
     print(f"   Correlation coefficient (r): {correlation_results['correlation_coefficient']:.4f}")
     print(f"   T-statistic: {correlation_results['t_statistic']:.4f}")
     print(f"   P-value: {correlation_results['p_value']:.6f}")
+    if "n_permutations" in correlation_results:
+        print(f"   ({correlation_results['n_permutations']:,} permutations, "
+              f"Monte Carlo error {correlation_results['p_value_mc_error']:.4f}; "
+              f"t-test p = {correlation_results['p_value_asymptotic']:.6f})")
     print(f"   Significant: {correlation_results['significant']}")
     
     # Statistical tests (conditional probability - for reference)
     print("\n5. Performing conditional probability tests (for reference)...")
-    test_results = perform_statistical_tests(df, infection_col, vaccination_col)
+    test_results = perform_statistical_tests(df, infection_col, vaccination_col, method=test_method)
     print(f"   Z-statistic: {test_results['z_statistic']:.4f}")
     print(f"   P-value: {test_results['p_value']:.4f}")
     print(f"   Significant: {test_results['significant']}")
     
+    # Conditional probabilities at every observed threshold
+    print("\n6. Sweeping vaccination thresholds...")
+    sweep = threshold_sweep(df, infection_col, vaccination_col)
+    tested = sweep.dropna(subset=["p_value"])
+    print(f"   Evaluated {len(sweep):,} thresholds ({len(tested):,} with both groups non-empty)")
+    if len(tested) > 0:
+        widest = tested.loc[tested["difference"].abs().idxmax()]
+        print(f"   Largest |difference|: {widest['difference']:.4f} at V >= {widest['threshold']:.3f} "
+              f"(p = {widest['p_value']:.4f})")
+    
+    # Lagged cross-correlation (vaccination effects act with a delay)
+    print(f"\n7. Computing lagged correlations (-{DEFAULT_MAX_LAG}..+{DEFAULT_MAX_LAG} weeks)...")
+    lagged = calculate_lagged_correlation(df, vaccination_col, cases_col="new_cases")
+    if lagged["r"].notna().any():
+        strongest = lagged.loc[lagged["r"].abs().idxmax()]
+        print(f"   Strongest correlation: r = {strongest['r']:.4f} at lag {int(strongest['lag']):+d} weeks "
+              f"(n_eff = {strongest['n_eff']:.1f}, p = {strongest['p_value']:.4f})")
+    
+    # Rolling correlation (how the association changes across waves)
+    print("\n8. Computing 26-week rolling correlation...")
+    rolling = calculate_rolling_correlation(df, vaccination_col, cases_col="new_cases", window=26)
+    if rolling.notna().any():
+        print(f"   Rolling r ranges from {rolling.min():.4f} ({rolling.idxmin():%Y-%m-%d}) "
+              f"to {rolling.max():.4f} ({rolling.idxmax():%Y-%m-%d})")
+    
+    # The same tests within each period (detected case regimes by default)
+    if isinstance(periods, str):
+        if periods != "changepoints":
+            raise ValueError(f"Unsupported periods '{periods}', expected a period list or 'changepoints'")
+        print("\n9. Segmenting into case regimes (PELT change points)...")
+        segment_source = "changepoints"
+        periods = changepoint_periods(df, "new_cases")
+    else:
+        print("\n9. Segmenting by period...")
+        segment_source = "periods"
+    segments = analyze_segments(df, periods, infection_col, vaccination_col, cases_col="new_cases")
+    for _, segment in segments.iterrows():
+        print(f"   {segment['period']}, {segment['start']:%Y-%m-%d} to {segment['end']:%Y-%m-%d} "
+              f"({segment['n_weeks']} weeks): r = {segment['correlation_coefficient']:.4f} "
+              f"(p = {segment['p_value']:.4f}), P(I|high) - P(I|low) = {segment['difference']:.4f}")
+    
+    # Count regressions (the Binomial comparison shows overdispersion)
+    print("\n10. Fitting Poisson and negative-binomial models of weekly cases...")
+    count_models = fit_count_models(df, cases_col="new_cases", vaccination_col=vaccination_col, periods=periods)
+    vax_terms = count_models["coefficients"].set_index(["family", "term"])
+    for _, fit in count_models["fits"].iterrows():
+        term = vax_terms.loc[(fit["family"], vaccination_col)]
+        print(f"   {fit['family']}: rate ratio per unit vaccination {term['rate_ratio']:.4f} "
+              f"(p = {term['p_value']:.4f}), alpha = {fit['alpha']:.4f}, AIC = {fit['aic']:,.1f}")
+    
+    # Bootstrap confidence intervals (robust to autocorrelation)
+    bootstrap_results = None
+    if n_bootstrap:
+        print(f"\n11. Bootstrapping confidence intervals ({n_bootstrap:,} moving-block resamples)...")
+        bootstrap_results = calculate_bootstrap_intervals(df, infection_col, vaccination_col,
+                                                          n_resamples=n_bootstrap)
+        corr_boot = bootstrap_results["correlation"]
+        diff_boot = bootstrap_results["proportion_difference"]
+        print(f"   r: {corr_boot['estimate']:.4f}, {corr_boot['confidence']:.0%} CI "
+              f"[{corr_boot['ci_low']:.4f}, {corr_boot['ci_high']:.4f}], block size {corr_boot['block_size']}")
+        print(f"   P(I|high) - P(I|low): {diff_boot['estimate']:.4f}, {diff_boot['confidence']:.0%} CI "
+              f"[{diff_boot['ci_low']:.4f}, {diff_boot['ci_high']:.4f}]")
+    
     # Compile all results
     all_results = {
         "bernoulli": bernoulli,
         "conditional": conditional,
         "binomial_weekly": binomial_weekly,
+        "binomial_monthly": binomial_monthly,
         "correlation_analysis": correlation_results,  # Main hypothesis test
         "statistical_tests": test_results,  # Reference analysis
+        "threshold_sweep": sweep,
+        "lagged_correlation": lagged,
+        "rolling_correlation": rolling,
+        "segments": segments,
+        "segment_source": segment_source,  # "changepoints" or "periods"
+        "segment_periods": periods,
+        "count_models": count_models,
+        "bootstrap": bootstrap_results,
         "weekly_actual": weekly_actual
     }
     
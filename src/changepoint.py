@@ -0,0 +1,236 @@
+"""
+Change-Point Module
+PELT segmentation of weekly case and vaccination series into regimes,
+batched over countries or counties
+"""
+
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+COSTS = ('normal', 'poisson')
+
+# Cost and transform used for each analysis column: weekly cases are counts,
+# and the vaccination rate is segmented by its weekly uptake (first differences)
+SERIES_MODELS = {
+    'new_cases': ('poisson', None),
+    'vaccination_rate': ('normal', 'diff')
+}
+
+# Fewest weeks in a regime; shorter regimes split single waves into steps
+# and leave too few weeks for the per-regime tests
+MIN_SIZE = 8
+
+
+def _noise_scale(values):
+    """Robust per-series noise standard deviation from first differences (MAD / 0.6745 / sqrt(2))"""
+    diffs = np.diff(values, axis=1)
+    with np.errstate(invalid='ignore'):
+        mad = np.nanmedian(np.abs(diffs - np.nanmedian(diffs, axis=1, keepdims=True)), axis=1)
+    scale = mad / 0.6745 / np.sqrt(2)
+    fallback = np.nanstd(values, axis=1)
+    scale = np.where(scale > 0, scale, fallback)
+    return np.where(scale > 0, scale, 1.0)
+
+
+def _cumulative_sums(values, cost):
+    """
+    Prefix sums that give any segment's cost in O(1): counts, sums and
+    (normal) sums of squares, each with a leading zero column
+    """
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    pad = np.zeros((values.shape[0], 1))
+    sums = [np.concatenate((pad, np.cumsum(valid, axis=1)), axis=1),
+            np.concatenate((pad, np.cumsum(filled, axis=1)), axis=1)]
+    if cost == 'normal':
+        sums.append(np.concatenate((pad, np.cumsum(filled ** 2, axis=1)), axis=1))
+    return sums
+
+
+def _segment_cost(sums, starts, end, cost):
+    """
+    Cost of the segments [starts, end) of every series, shape (series, len(starts))
+
+    normal: residual sum of squares around the segment mean (noise scaled to 1).
+    poisson: -2 log-likelihood with the segment's mean rate, without the
+             terms that do not depend on the segmentation.
+    """
+    count = sums[0][:, end, None] - sums[0][:, starts]
+    total = sums[1][:, end, None] - sums[1][:, starts]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if cost == 'normal':
+            squares = sums[2][:, end, None] - sums[2][:, starts]
+            return np.where(count > 0, squares - total ** 2 / count, 0.0)
+        return np.where(total > 0, 2 * (total - total * np.log(total / count)), 0.0)
+
+
+def pelt(values, cost='normal', penalty=None, min_size=MIN_SIZE, scale=True):
+    """
+    Optimal segmentation by Pruned Exact Linear Time (Killick et al. 2012)
+
+    F(t) = min_s F(s) + C(s, t) + penalty over the candidate last breakpoints
+    s, where any candidate with F(s) + C(s, t) > F(t) can never be optimal
+    again and is pruned. Segment costs come from prefix sums in O(1), so the
+    expected run time is linear in the series length. All series are run
+    together: each step evaluates the surviving candidates of every series
+    in one array operation, over the column range still admissible for any
+    series.
+
+    Args:
+        values: 1-D series or 2-D (series, time) array; NaN marks missing values
+        cost: 'normal' (change in mean) or 'poisson' (change in rate of counts)
+        penalty: Cost of each additional change point (default: 3 log n, a
+                 modified BIC)
+        min_size: Fewest observations in a segment
+        scale: Normalize costs by a robust noise estimate per series (the
+               standard deviation for 'normal', the overdispersion for
+               'poisson'), so one penalty fits series of any scale
+
+    Returns:
+        List (one entry per series) of int arrays with the positions where
+        a new segment starts
+    """
+    if cost not in COSTS:
+        raise ValueError(f"Unsupported cost '{cost}', expected one of {COSTS}")
+    values = np.asarray(values, dtype=float)
+    values = values[None, :] if values.ndim == 1 else values
+    n_series, n_time = values.shape
+    penalty = 3 * np.log(max(n_time, 2)) if penalty is None else penalty
+
+    if scale and cost == 'normal':
+        values = values / _noise_scale(values)[:, None]
+    sums = _cumulative_sums(values, cost)
+    if scale and cost == 'poisson':
+        # Quasi-Poisson: divide the cost by the dispersion (variance / mean)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            dispersion = _noise_scale(values) ** 2 / np.nanmean(values, axis=1)
+        dispersion = np.where(np.isfinite(dispersion) & (dispersion > 1), dispersion, 1.0)[:, None]
+    else:
+        dispersion = 1.0
+
+    F = np.full((n_series, n_time + 1), np.inf)
+    F[:, 0] = -penalty
+    last = np.zeros((n_series, n_time + 1), dtype=np.int64)
+    admissible = np.zeros((n_series, n_time + 1), dtype=bool)
+    admissible[:, 0] = True
+    first = 0
+    pending = deque()
+
+    for end in range(min_size, n_time + 1):
+        # A pruning test made at step t only holds once t itself can end a
+        # segment again, i.e. from step t + min_size on
+        if pending and pending[0][0] <= end - min_size:
+            _, pruned_starts, keep = pending.popleft()
+            admissible[:, pruned_starts] &= keep
+            while first < end and not admissible[:, first].any():
+                first += 1
+
+        starts = np.arange(first, end - min_size + 1)
+        segment = _segment_cost(sums, starts, end, cost) / dispersion
+        total = np.where(admissible[:, starts], F[:, starts] + segment + penalty, np.inf)
+        best = np.argmin(total, axis=1)
+        F[:, end] = total[np.arange(n_series), best]
+        last[:, end] = starts[best]
+
+        # Candidates that can no longer start the last segment
+        pending.append((end, starts, F[:, starts] + segment <= F[:, end, None]))
+        admissible[:, end] = True
+
+    breakpoints = []
+    for i in range(n_series):
+        points, t = [], n_time
+        while t > 0:
+            t = last[i, t]
+            if t > 0:
+                points.append(t)
+        breakpoints.append(np.array(points[::-1], dtype=np.int64))
+    return breakpoints
+
+
+def segment_codes(breakpoints, n_time):
+    """
+    Regime number of every time step, shape (series, n_time)
+
+    Args:
+        breakpoints: List of breakpoint arrays as returned by pelt
+        n_time: Series length
+
+    Returns:
+        int64 array where each row counts the breakpoints at or before each step
+    """
+    marks = np.zeros((len(breakpoints), n_time), dtype=np.int64)
+    for i, points in enumerate(breakpoints):
+        marks[i, points] = 1
+    return np.cumsum(marks, axis=1)
+
+
+def detect_changepoints(df, column="new_cases", cost=None, transform=None, penalty=None, min_size=MIN_SIZE,
+                        group_level="country"):
+    """
+    Change points of one column for a single country or every country of a panel
+
+    Args:
+        df: Weekly DataFrame with a date index, or a panel indexed by (country, date)
+        column: Column to segment
+        cost: 'normal' or 'poisson' (default: from SERIES_MODELS, else 'normal')
+        transform: None, or 'diff' to segment week-on-week changes
+        penalty: Penalty per change point (default: 3 log n)
+        min_size: Fewest weeks in a regime
+        group_level: Index level holding the country in a panel
+
+    Returns:
+        Tuple of (DataFrame with one row per change point: (country,) date,
+        and a regime code Series aligned with df.index)
+    """
+    default_cost, default_transform = SERIES_MODELS.get(column, ('normal', None))
+    cost = cost or default_cost
+    transform = transform if transform is not None else default_transform
+
+    if isinstance(df.index, pd.MultiIndex):
+        wide = df[column].unstack(level='date')
+        groups, dates = wide.index, wide.columns
+        values = wide.to_numpy(dtype=float)
+    else:
+        groups, dates = None, df.index
+        values = df[column].to_numpy(dtype=float)[None, :]
+
+    # Edges outside a country's own date range stay NaN and cost nothing
+    if transform == 'diff':
+        values = np.concatenate((np.full((len(values), 1), np.nan), np.diff(values, axis=1)), axis=1)
+    breakpoints = pelt(values, cost=cost, penalty=penalty, min_size=min_size)
+    codes = segment_codes(breakpoints, values.shape[1])
+
+    rows = pd.DataFrame({
+        "date": dates[np.concatenate(breakpoints)] if breakpoints else pd.DatetimeIndex([]),
+        "column": column
+    })
+    if groups is not None:
+        rows.insert(0, group_level, np.repeat(groups.to_numpy(), [len(p) for p in breakpoints]))
+        code_series = pd.Series(codes.ravel(), index=pd.MultiIndex.from_product([groups, dates]))
+        code_series = code_series.reindex(df.index)
+    else:
+        code_series = pd.Series(codes[0], index=df.index)
+    return rows, code_series.rename("regime")
+
+
+def changepoint_periods(df, column="new_cases", **kwargs):
+    """
+    Regimes of a single series as a (name, start_date) period table, usable
+    wherever VARIANT_PERIODS is
+
+    Args:
+        df: Weekly DataFrame with a date index
+        column: Column to segment
+        **kwargs: Passed on to detect_changepoints
+
+    Returns:
+        List of (name, start_date) tuples
+    """
+    points, _ = detect_changepoints(df, column, **kwargs)
+    starts = [df.index.min()] + list(points["date"])
+    # Weekly labels are week ends; a regime starts on the Monday of its first week
+    return [(f"regime {i + 1}", (pd.Timestamp(start) - pd.Timedelta(days=6)).strftime('%Y-%m-%d'))
+            for i, start in enumerate(starts)]
@@ -0,0 +1,224 @@
+"""
+Columnar Store Module
+Stores DataFrames as one memory-mapped .npy file per column with typed schemas
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_STORE_ROOT = "data/raw/columnar"
+
+SCHEMA_FILE = "_schema.json"
+
+# Explicit per-source dtypes. Columns not listed keep their NumPy dtype, or
+# fall back to category for text and float64 for other numbers.
+# 'Int32' is a nullable int32 stored with a mask.
+SOURCE_SCHEMAS = {
+    'owid': {
+        'iso_code': 'category',
+        'continent': 'category',
+        'location': 'category',
+        'date': 'datetime64[ns]',
+        'total_cases': 'Int32',
+        'new_cases': 'Int32',
+        'total_deaths': 'Int32',
+        'new_deaths': 'Int32',
+        'people_vaccinated_per_hundred': 'float32',
+        'people_fully_vaccinated_per_hundred': 'float32',
+        'total_vaccinations': 'float64',
+        'people_vaccinated': 'float64',
+        'people_fully_vaccinated': 'float64'
+    },
+    'who': {
+        'Date_reported': 'datetime64[ns]',
+        'Country_code': 'category',
+        'Country': 'category',
+        'WHO_region': 'category',
+        'New_cases': 'Int32',
+        'Cumulative_cases': 'Int32',
+        'New_deaths': 'Int32',
+        'Cumulative_deaths': 'Int32'
+    },
+    'nyt': {
+        'date': 'datetime64[ns]',
+        'cases': 'int32',
+        'deaths': 'int32'
+    },
+    'weekly': {
+        'date': 'datetime64[ns]',
+        'new_cases': 'float64',
+        'new_deaths': 'float64',
+        'new_cases_nyt': 'float64',
+        'new_cases_owid': 'float64',
+        'new_cases_who': 'float64',
+        'I': 'int8',
+        'vaccination_rate': 'float64',
+        'people_vaccinated': 'float64',
+        'people_vaccinated_per_hundred': 'float64'
+    }
+}
+
+_INT32_MIN, _INT32_MAX = np.iinfo(np.int32).min, np.iinfo(np.int32).max
+
+
+def _infer_dtype(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'datetime64[ns]'
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind in 'iufb':
+        return series.dtype.name
+    if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+        return 'float64'
+    return 'category'
+
+
+def _fits_int32(values):
+    """Check that float values are whole numbers inside the int32 range"""
+    finite = values[~np.isnan(values)]
+    return bool(np.all(finite == np.round(finite)) and
+                (finite.size == 0 or (finite.min() >= _INT32_MIN and finite.max() <= _INT32_MAX)))
+
+
+def _save_array(path, arr):
+    tmp_path = path + ".tmp.npy"
+    np.save(tmp_path, arr)
+    os.replace(tmp_path, path)
+
+
+def write_columnar(df, store_dir, schema=None):
+    """
+    Write a DataFrame as one .npy file per column plus a schema file
+
+    Args:
+        df: DataFrame to store
+        store_dir: Directory for this table
+        schema: Optional dict of column name to dtype; unlisted columns are inferred.
+                Supported dtypes: 'category', 'datetime64[ns]', 'Int32' (nullable),
+                and any NumPy dtype name.
+
+    Returns:
+        Dict describing the stored columns
+    """
+    schema = schema or {}
+    os.makedirs(store_dir, exist_ok=True)
+    columns = {}
+
+    for col in df.columns:
+        dtype = schema.get(col) or _infer_dtype(df[col])
+        series = df[col]
+        path = os.path.join(store_dir, f"{col}.npy")
+        info = {'dtype': dtype}
+
+        if dtype == 'category':
+            cat = series.astype('category')
+            codes = cat.cat.codes.to_numpy()
+            code_dtype = np.int16 if len(cat.cat.categories) < np.iinfo(np.int16).max else np.int32
+            _save_array(path, codes.astype(code_dtype))
+            info['categories'] = [str(c) for c in cat.cat.categories]
+        elif dtype == 'datetime64[ns]':
+            _save_array(path, pd.to_datetime(series).to_numpy(dtype='datetime64[ns]'))
+        elif dtype in ('Int32', 'int32'):
+            values = pd.to_numeric(series, errors='coerce').to_numpy(dtype='float64')
+            if not _fits_int32(values):
+                print(f"   ⚠ Column '{col}' does not fit int32, storing as float64")
+                info['dtype'] = 'float64'
+                _save_array(path, values)
+            else:
+                mask = np.isnan(values)
+                _save_array(path, np.where(mask, 0, values).astype(np.int32))
+                if mask.any():
+                    info['dtype'] = 'Int32'
+                    _save_array(os.path.join(store_dir, f"{col}.mask.npy"), mask)
+                else:
+                    info['dtype'] = 'int32'
+        else:
+            _save_array(path, pd.to_numeric(series, errors='coerce').to_numpy(dtype=dtype))
+
+        columns[col] = info
+
+    meta = {'n_rows': len(df), 'columns': columns}
+    with open(os.path.join(store_dir, SCHEMA_FILE), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    return meta
+
+
+def read_columnar(store_dir, columns=None, mmap=True):
+    """
+    Read selected columns from a columnar store
+
+    Only the requested column files are opened, and with mmap=True they are
+    memory-mapped so pages are read from disk on demand.
+
+    Args:
+        store_dir: Directory for this table
+        columns: List of columns to load (default: all)
+        mmap: Memory-map the column files instead of reading them eagerly
+
+    Returns:
+        DataFrame with the requested columns and their stored dtypes
+    """
+    with open(os.path.join(store_dir, SCHEMA_FILE)) as f:
+        meta = json.load(f)
+
+    if columns is None:
+        columns = list(meta['columns'])
+    missing = [c for c in columns if c not in meta['columns']]
+    if missing:
+        raise KeyError(f"Columns not in store {store_dir}: {missing}")
+
+    mmap_mode = 'r' if mmap else None
+    data = {}
+    for col in columns:
+        info = meta['columns'][col]
+        arr = np.load(os.path.join(store_dir, f"{col}.npy"), mmap_mode=mmap_mode)
+        if info['dtype'] == 'category':
+            data[col] = pd.Categorical.from_codes(arr, categories=info['categories'])
+        elif info['dtype'] == 'Int32':
+            mask = np.load(os.path.join(store_dir, f"{col}.mask.npy"), mmap_mode=mmap_mode)
+            data[col] = pd.arrays.IntegerArray(np.asarray(arr), np.asarray(mask))
+        else:
+            data[col] = arr
+
+    return pd.DataFrame(data, columns=columns)
+
+
+def save_source(df, source, root=DEFAULT_STORE_ROOT):
+    """
+    Save a source DataFrame ('owid', 'who', 'nyt', 'weekly') using its schema
+
+    Args:
+        df: Source DataFrame
+        source: Source name, also the subdirectory under root
+        root: Root directory of the columnar store
+
+    Returns:
+        Path to the table directory
+    """
+    store_dir = os.path.join(root, source)
+    write_columnar(df, store_dir, schema=SOURCE_SCHEMAS.get(source))
+    print(f"Columnar copy saved to {store_dir}")
+    return store_dir
+
+
+def load_source(source, columns=None, root=DEFAULT_STORE_ROOT):
+    """
+    Load selected columns of a source from the columnar store
+
+    Args:
+        source: Source name ('owid', 'who', 'nyt', 'weekly')
+        columns: List of columns to load (default: all)
+        root: Root directory of the columnar store
+
+    Returns:
+        DataFrame with the requested columns
+    """
+    return read_columnar(os.path.join(root, source), columns=columns)
+
+
+def has_source(source, root=DEFAULT_STORE_ROOT):
+    """Check whether a source has been written to the columnar store"""
+    return os.path.exists(os.path.join(root, source, SCHEMA_FILE))
@@ -0,0 +1,277 @@
+"""
+Count Models Module
+Poisson and negative-binomial regressions of weekly cases, fitted for many
+countries at once with batched IRLS
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import special, stats
+
+from aggregate import VARIANT_PERIODS, assign_periods
+
+
+COUNT_FAMILIES = ('poisson', 'negative_binomial')
+
+MAX_ITER = 100
+TOLERANCE = 1e-8
+
+# Linear predictors are clipped here so exp() cannot overflow
+ETA_BOUND = 50.0
+
+
+def build_design(cases, vaccination, dates, periods=VARIANT_PERIODS, lags=1):
+    """
+    Stacked design matrices for a (country, week) panel
+
+    Columns: intercept, vaccination rate, one dummy per period after the
+    first (time controls: variant eras or detected case regimes) and
+    log(1 + cases) of the previous `lags` weeks (lagged incidence). Rows
+    without a response or a complete design are masked out.
+
+    Args:
+        cases: (country, week) array of weekly cases, NaN = missing
+        vaccination: (country, week) array of vaccination rates
+        dates: (week,) datetime64 array
+        periods: List of (name, start_date) periods (None for no dummies)
+        lags: Number of lagged-incidence terms
+
+    Returns:
+        Tuple of (X (country, week, k), y (country, week), mask (country, week), column names)
+    """
+    cases = np.atleast_2d(np.asarray(cases, dtype=float))
+    vaccination = np.atleast_2d(np.asarray(vaccination, dtype=float))
+    n_series, n_time = cases.shape
+
+    columns = [np.ones_like(cases), vaccination]
+    names = ['intercept', 'vaccination_rate']
+    if periods:
+        codes = assign_periods(np.asarray(dates, dtype='datetime64[ns]'), periods)
+        for code in range(1, len(periods)):
+            columns.append(np.broadcast_to((codes == code).astype(float), cases.shape))
+            names.append(f"period_{periods[code][0]}")
+    log_cases = np.log1p(np.clip(cases, 0, None))
+    for lag in range(1, lags + 1):
+        lagged = np.full_like(cases, np.nan)
+        lagged[:, lag:] = log_cases[:, :-lag]
+        columns.append(lagged)
+        names.append(f"log1p_cases_lag{lag}")
+
+    X = np.stack(columns, axis=-1)
+    mask = ~np.isnan(cases) & ~np.isnan(X).any(axis=-1)
+    X = np.where(mask[..., None], X, 0.0)
+    y = np.where(mask, np.clip(cases, 0, None), 0.0)
+    return X, y, mask, names
+
+
+def _deviance(y, mu, mask, alpha):
+    """Per-series deviance; alpha = 0 gives the Poisson deviance"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        y_log = np.where(y > 0, y * np.log(y / mu), 0.0)
+        a = np.maximum(alpha, 1e-12)[:, None]
+        nb = y_log - (y + 1 / a) * np.log((1 + a * y) / (1 + a * mu))
+    unit = np.where(alpha[:, None] > 0, nb, y_log - (y - mu))
+    return 2 * np.where(mask, unit, 0.0).sum(axis=1)
+
+
+def _log_likelihood(y, mu, mask, alpha):
+    """Per-series log-likelihood; alpha = 0 gives the Poisson log-likelihood"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        a = np.maximum(alpha, 1e-12)[:, None]
+        nb = (special.gammaln(y + 1 / a) - special.gammaln(1 / a) - special.gammaln(y + 1)
+              + y * np.log(a * mu / (1 + a * mu)) - np.log1p(a * mu) / a)
+        poisson = y * np.log(mu) - mu - special.gammaln(y + 1)
+    unit = np.where(alpha[:, None] > 0, nb, poisson)
+    return np.where(mask, unit, 0.0).sum(axis=1)
+
+
+def fit_glm_batch(X, y, mask, family='poisson', start=None, max_iter=MAX_ITER, tol=TOLERANCE):
+    """
+    Fit one log-link count GLM per series with IRLS, all series together
+
+    Each iteration forms the weighted normal equations of every series as a
+    (series, k, k) stack and solves them in one batched call, so the cost
+    of a panel is a few einsums per iteration rather than a Python loop over
+    countries. For the negative binomial (NB2, Var = mu + alpha mu^2), alpha
+    is re-estimated every iteration by the Pearson moment equation
+    sum((y - mu)^2 - mu) / mu^2 = alpha (n - k). Columns without variation
+    in a series are not identified and get NaN.
+
+    Args:
+        X: (series, time, k) design; rows outside mask are ignored
+        y: (series, time) counts
+        mask: (series, time) rows used in each fit
+        family: 'poisson' or 'negative_binomial'
+        start: Optional (series, k) starting coefficients (warm start, e.g.
+               the Poisson fit or the previous refresh)
+        max_iter: Maximum IRLS iterations
+        tol: Convergence tolerance on the relative change in deviance
+
+    Returns:
+        Dictionary of per-series arrays: coef, std_error, alpha, deviance,
+        log_likelihood, aic, n_obs, iterations, converged
+    """
+    if family not in COUNT_FAMILIES:
+        raise ValueError(f"Unsupported family '{family}', expected one of {COUNT_FAMILIES}")
+    n_series, n_time, k = X.shape
+    w_mask = mask.astype(float)
+    n_obs = mask.sum(axis=1)
+
+    # Constant columns are collinear with the intercept; zero them out
+    with np.errstate(invalid='ignore', divide='ignore'):
+        col_mean = np.einsum('stk,st->sk', X, w_mask) / n_obs[:, None]
+        col_var = np.einsum('stk,st->sk', (X - col_mean[:, None, :]) ** 2, w_mask) / n_obs[:, None]
+    identified = col_var > 1e-12
+    identified[:, 0] = n_obs > 0
+    X = X * identified[:, None, :]
+
+    if start is not None:
+        beta = np.where(identified, np.nan_to_num(np.asarray(start, dtype=float)), 0.0)
+        eta = np.clip(np.einsum('stk,sk->st', X, beta), -ETA_BOUND, ETA_BOUND)
+        mu = np.exp(eta)
+    else:
+        mean_y = (y * w_mask).sum(axis=1, keepdims=True) / np.maximum(n_obs, 1)[:, None]
+        mu = y + 0.5 * mean_y + 0.1
+        eta = np.log(mu)
+        beta = np.zeros((n_series, k))
+
+    alpha = np.zeros(n_series)
+    negative_binomial = family == 'negative_binomial'
+    deviance = _deviance(y, mu, mask, alpha)
+    converged = np.zeros(n_series, dtype=bool)
+    iterations = np.zeros(n_series, dtype=np.int64)
+    eye = np.eye(k) * ~identified[:, :, None]
+
+    for iteration in range(1, max_iter + 1):
+        active = ~converged
+        if negative_binomial:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                pearson = np.where(mask, ((y - mu) ** 2 - mu) / mu ** 2, 0.0).sum(axis=1)
+            alpha = np.where(active, np.clip(pearson / np.maximum(n_obs - k, 1), 1e-8, None), alpha)
+
+        # Working weights and response of the log link
+        weights = w_mask * mu / (1 + alpha[:, None] * mu)
+        z = eta + (y - mu) / mu
+        xtwx = np.einsum('stk,st,stl->skl', X, weights, X) + eye
+        xtwz = np.einsum('stk,st->sk', X, weights * z)
+        beta_new = np.linalg.solve(xtwx, xtwz[..., None])[..., 0]
+
+        beta[active] = beta_new[active]
+        iterations[active] = iteration
+        eta = np.clip(np.einsum('stk,sk->st', X, beta), -ETA_BOUND, ETA_BOUND)
+        mu = np.exp(eta)
+
+        new_deviance = _deviance(y, mu, mask, alpha)
+        change = np.abs(new_deviance - deviance) / (np.abs(new_deviance) + 0.1)
+        converged |= change < tol
+        deviance = new_deviance
+        if converged.all():
+            break
+
+    weights = w_mask * mu / (1 + alpha[:, None] * mu)
+    cov = np.linalg.inv(np.einsum('stk,st,stl->skl', X, weights, X) + eye)
+    std_error = np.sqrt(np.diagonal(cov, axis1=1, axis2=2))
+    log_likelihood = _log_likelihood(y, mu, mask, alpha)
+    n_params = identified.sum(axis=1) + negative_binomial
+
+    return {
+        "coef": np.where(identified, beta, np.nan),
+        "std_error": np.where(identified, std_error, np.nan),
+        "alpha": alpha if negative_binomial else np.zeros(n_series),
+        "deviance": deviance,
+        "pearson_dispersion": np.where(mask, (y - mu) ** 2 / (mu * (1 + alpha[:, None] * mu)), 0.0).sum(axis=1)
+                              / np.maximum(n_obs - identified.sum(axis=1), 1),
+        "log_likelihood": log_likelihood,
+        "aic": 2 * n_params - 2 * log_likelihood,
+        "n_obs": n_obs,
+        "iterations": iterations,
+        "converged": converged
+    }
+
+
+def fit_count_models(df, cases_col="new_cases", vaccination_col="vaccination_rate", periods=VARIANT_PERIODS,
+                     lags=1, families=COUNT_FAMILIES, start=None, group_level="country"):
+    """
+    Poisson and negative-binomial regressions of weekly cases on vaccination,
+    variant-period controls and lagged incidence for one country or a panel
+
+    The negative binomial is warm-started from the Poisson fit; pass the
+    'coefficients' table of a previous run as start to warm-start both on a
+    refresh.
+
+    Args:
+        df: Weekly DataFrame with a date index, or a panel indexed by (country, date)
+        cases_col: Column name for weekly case counts
+        vaccination_col: Column name for vaccination rate
+        periods: (name, start_date) periods used as time controls, e.g.
+                 VARIANT_PERIODS or changepoint.changepoint_periods (None for none)
+        lags: Number of lagged-incidence terms
+        families: Families to fit, in order
+        start: Optional coefficients DataFrame from an earlier fit_count_models call
+        group_level: Index level holding the country in a panel
+
+    Returns:
+        Dictionary with 'coefficients' (one row per country, family and term)
+        and 'fits' (one row per country and family: alpha, deviance,
+        dispersion, AIC, convergence)
+    """
+    if isinstance(df.index, pd.MultiIndex):
+        wide = df[[cases_col, vaccination_col]].unstack(level='date')
+        groups = wide.index
+        dates = wide[cases_col].columns
+        cases, vaccination = wide[cases_col].to_numpy(dtype=float), wide[vaccination_col].to_numpy(dtype=float)
+    else:
+        groups = None
+        dates = df.index
+        cases, vaccination = df[cases_col].to_numpy(dtype=float), df[vaccination_col].to_numpy(dtype=float)
+
+    X, y, mask, names = build_design(cases, vaccination, dates.to_numpy(dtype='datetime64[ns]'), periods, lags)
+    labels = groups.to_numpy() if groups is not None else np.array([None])
+
+    coefficients, fits = [], []
+    previous = None
+    for family in families:
+        warm = previous
+        if start is not None and family in set(start['family']):
+            prior = start[start['family'] == family]
+            if groups is not None:
+                warm = prior.pivot(index=group_level, columns='term', values='coef').reindex(
+                    index=labels, columns=names).to_numpy(dtype=float)
+            else:
+                warm = prior.set_index('term')['coef'].reindex(names).to_numpy(dtype=float)[None, :]
+        fit = fit_glm_batch(X, y, mask, family, start=warm)
+        previous = fit["coef"]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            z_stat = fit["coef"] / fit["std_error"]
+        coef = pd.DataFrame({
+            "family": family,
+            "term": np.tile(names, len(labels)),
+            "coef": fit["coef"].ravel(),
+            "std_error": fit["std_error"].ravel(),
+            "z_statistic": z_stat.ravel(),
+            "p_value": 2 * stats.norm.sf(np.abs(z_stat)).ravel(),
+            "rate_ratio": np.exp(fit["coef"]).ravel()
+        })
+        summary = pd.DataFrame({
+            "family": family,
+            "n_obs": fit["n_obs"],
+            "alpha": fit["alpha"],
+            "deviance": fit["deviance"],
+            "pearson_dispersion": fit["pearson_dispersion"],
+            "log_likelihood": fit["log_likelihood"],
+            "aic": fit["aic"],
+            "iterations": fit["iterations"],
+            "converged": fit["converged"]
+        })
+        if groups is not None:
+            coef.insert(0, group_level, np.repeat(labels, len(names)))
+            summary.insert(0, group_level, labels)
+        coefficients.append(coef)
+        fits.append(summary)
+
+    return {
+        "coefficients": pd.concat(coefficients, ignore_index=True),
+        "fits": pd.concat(fits, ignore_index=True),
+        "terms": names
+    }
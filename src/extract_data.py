@@ -5,121 +5,501 @@ Extracts COVID-19 data from OWID and WHO sources
 
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 from io import StringIO
+import json
 import os
-from datetime import datetime
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
+from raw_cache import DEFAULT_CACHE_DIR, fetch_cached
+from columnar_store import save_source
 
-def extract_owid_data(url=None, save_path="data/raw/owid_covid_data.csv"):
+
+# Default source URLs
+OWID_URL = "https://raw.githubusercontent.com/owid/covid-19-data/master/public/data/owid-covid-data.csv"
+WHO_URL = "https://srhdpeuwpubsa.blob.core.windows.net/whdh/COVID/WHO-COVID-19-global-data.csv"
+NYT_URL = "https://raw.githubusercontent.com/nytimes/covid-19-data/master/us.csv"
+
+# NY Times sub-national files; county data is published as one file per year,
+# listed in chronological order
+NYT_SUBNATIONAL_URLS = {
+    'states': ["https://raw.githubusercontent.com/nytimes/covid-19-data/master/us-states.csv"],
+    'counties': [f"https://raw.githubusercontent.com/nytimes/covid-19-data/master/us-counties-{year}.csv"
+                 for year in (2020, 2021, 2022, 2023)]
+}
+
+# WHO spells some country names differently from OWID
+WHO_COUNTRY_NAMES = {
+    'United States': 'United States of America',
+    'United Kingdom': 'United Kingdom of Great Britain and Northern Ireland',
+    'Russia': 'Russian Federation',
+    'Iran': 'Iran (Islamic Republic of)',
+    'South Korea': 'Republic of Korea',
+    'Vietnam': 'Viet Nam',
+    'Bolivia': 'Bolivia (Plurinational State of)',
+    'Venezuela': 'Venezuela (Bolivarian Republic of)',
+    'Tanzania': 'United Republic of Tanzania',
+    'Syria': 'Syrian Arab Republic',
+    'Moldova': 'Republic of Moldova',
+    'Laos': "Lao People's Democratic Republic"
+}
+
+
+def who_country_name(country):
+    """Translate an OWID country name to the name used in the WHO file"""
+    return WHO_COUNTRY_NAMES.get(country, country)
+
+# Date column and (optional) country column of each raw source
+SOURCE_KEYS = {
+    'owid': ('date', 'location'),
+    'who': ('Date_reported', 'Country'),
+    'nyt': ('date', None)
+}
+
+# Per-source request timeouts in seconds (OWID is by far the largest file)
+DEFAULT_TIMEOUTS = {
+    'owid': 120,
+    'who': 30,
+    'nyt': 30
+}
+
+
+class ExtractionError(Exception):
+    """
+    Raised when one or more sources fail during concurrent extraction.
+    The `errors` attribute maps source name to the original exception.
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        details = "; ".join(f"{name}: {err}" for name, err in errors.items())
+        super().__init__(f"Failed to extract {len(errors)} source(s): {details}")
+
+
+def create_session(pool_size=10):
+    """
+    Create an HTTP session with a shared connection pool
+    
+    Args:
+        pool_size: Maximum number of pooled connections per host
+    
+    Returns:
+        requests.Session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def read_csv_filtered(source, country_col, countries, chunksize=100_000):
+    """
+    Parse a CSV in chunks, keeping only rows for the requested countries
+    
+    Peak memory scales with the selected countries plus one chunk, not with
+    the full global file.
+    
+    Args:
+        source: Path or file-like object (e.g. an HTTP response stream)
+        country_col: Column holding the country name ('location' for OWID, 'Country' for WHO)
+        countries: Iterable of country names to keep
+        chunksize: Number of rows parsed per chunk
+    
+    Returns:
+        DataFrame containing only the requested countries
+    """
+    keep = set(countries)
+    columns = [country_col]
+    chunks = []
+    for chunk in pd.read_csv(source, chunksize=chunksize):
+        columns = chunk.columns
+        chunk = chunk[chunk[country_col].isin(keep)]
+        if len(chunk) > 0:
+            chunks.append(chunk)
+    if not chunks:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def _fetch_csv(url, save_path, session, timeout, use_cache=False, offline=False,
+               cache_dir=DEFAULT_CACHE_DIR, country_col=None, countries=None):
+    """
+    Download a CSV (optionally through the local raw-data cache) and save a copy
+    
+    With the cache enabled the raw bytes are copied to save_path instead of
+    re-serializing the DataFrame, and the copy is skipped entirely when the
+    upstream file has not changed. When countries are given, the CSV is parsed
+    in chunks straight from the response stream (or cached file) and only the
+    matching rows are kept; without the cache, save_path then holds that subset.
+    
+    Returns:
+        DataFrame parsed from the downloaded CSV
+    """
+    filtered = countries is not None and country_col is not None
+    
+    if not (use_cache or offline):
+        http = session if session is not None else requests
+        if filtered:
+            with http.get(url, timeout=timeout, stream=True) as resp:
+                resp.raise_for_status()
+                resp.raw.decode_content = True
+                df = read_csv_filtered(resp.raw, country_col, countries)
+        else:
+            resp = http.get(url, timeout=timeout)
+            resp.raise_for_status()
+            df = pd.read_csv(StringIO(resp.text))
+        if save_path:
+            # Create directory if it doesn't exist
+            os.makedirs(os.path.dirname(save_path), exist_ok=True)
+            
+            # Save to file
+            df.to_csv(save_path, index=False)
+            print(f"Data saved to {save_path}")
+        return df
+    
+    blob_path, status = fetch_cached(url, session=session, timeout=timeout,
+                                     cache_dir=cache_dir, offline=offline)
+    print(f"Cache status for {url}: {status}")
+    if filtered:
+        df = read_csv_filtered(blob_path, country_col, countries)
+    else:
+        df = pd.read_csv(blob_path)
+    if save_path:
+        if status == "downloaded" or not os.path.exists(save_path):
+            os.makedirs(os.path.dirname(save_path), exist_ok=True)
+            shutil.copyfile(blob_path, save_path)
+            print(f"Data saved to {save_path}")
+        else:
+            print(f"{save_path} is already current")
+    return df
+
+
+def extract_owid_data(url=None, save_path="data/raw/owid_covid_data.csv", session=None, timeout=120,
+                      use_cache=False, offline=False, countries=None):
     """
     Extract COVID-19 data from Our World in Data
     
     Args:
         url: URL to OWID data (default: latest OWID URL)
-        save_path: Path to save the extracted data
+        save_path: Path to save the extracted data (None to skip saving)
+        session: Optional requests.Session to reuse pooled connections
+        timeout: Request timeout in seconds
+        use_cache: Revalidate against the local raw-data cache (conditional GET)
+        offline: Serve only from the local raw-data cache
+        countries: Optional list of OWID location names; when given, the file is
+                   streamed in chunks and only these countries are kept
     
     Returns:
         DataFrame with OWID data
     """
     if url is None:
-        url = "https://raw.githubusercontent.com/owid/covid-19-data/master/public/data/owid-covid-data.csv"
+        url = OWID_URL
     
     print(f"Extracting OWID data from {url}...")
     
     try:
-        df = pd.read_csv(url)
+        df = _fetch_csv(url, save_path, session, timeout, use_cache, offline,
+                        country_col='location', countries=countries)
         print(f"Successfully extracted {len(df)} rows from OWID")
         
-        # Create directory if it doesn't exist
-        os.makedirs(os.path.dirname(save_path), exist_ok=True)
-        
-        # Save to file
-        df.to_csv(save_path, index=False)
-        print(f"Data saved to {save_path}")
-        
         return df
     except Exception as e:
         print(f"Error extracting OWID data: {e}")
         raise
 
 
-def extract_who_data(url=None, save_path="data/raw/who_covid_data.csv"):
+def extract_who_data(url=None, save_path="data/raw/who_covid_data.csv", session=None, timeout=30,
+                     use_cache=False, offline=False, countries=None):
     """
     Extract COVID-19 data from World Health Organization
     
     Args:
         url: URL to WHO data (default: latest WHO URL)
-        save_path: Path to save the extracted data
+        save_path: Path to save the extracted data (None to skip saving)
+        session: Optional requests.Session to reuse pooled connections
+        timeout: Request timeout in seconds
+        use_cache: Revalidate against the local raw-data cache (conditional GET)
+        offline: Serve only from the local raw-data cache
+        countries: Optional list of WHO Country names; when given, the file is
+                   streamed in chunks and only these countries are kept
     
     Returns:
         DataFrame with WHO data
     """
     if url is None:
-        url = "https://srhdpeuwpubsa.blob.core.windows.net/whdh/COVID/WHO-COVID-19-global-data.csv"
+        url = WHO_URL
     
     print(f"Extracting WHO data from {url}...")
     
     try:
-        resp = requests.get(url, timeout=30)
-        resp.raise_for_status()
-        df = pd.read_csv(StringIO(resp.text))
+        df = _fetch_csv(url, save_path, session, timeout, use_cache, offline,
+                        country_col='Country', countries=countries)
         print(f"Successfully extracted {len(df)} rows from WHO")
         
-        # Create directory if it doesn't exist
-        os.makedirs(os.path.dirname(save_path), exist_ok=True)
-        
-        # Save to file
-        df.to_csv(save_path, index=False)
-        print(f"Data saved to {save_path}")
-        
         return df
     except Exception as e:
         print(f"Error extracting WHO data: {e}")
         raise
 
 
-def extract_nyt_data(url=None, save_path="data/raw/nyt_covid_data.csv"):
+def extract_nyt_data(url=None, save_path="data/raw/nyt_covid_data.csv", session=None, timeout=30,
+                     use_cache=False, offline=False):
     """
     Extract COVID-19 data from New York Times
     
     Args:
         url: URL to NY Times data (default: latest NY Times URL)
-        save_path: Path to save the extracted data
+        save_path: Path to save the extracted data (None to skip saving)
+        session: Optional requests.Session to reuse pooled connections
+        timeout: Request timeout in seconds
+        use_cache: Revalidate against the local raw-data cache (conditional GET)
+        offline: Serve only from the local raw-data cache
     
     Returns:
         DataFrame with NY Times data
     """
     if url is None:
-        url = "https://raw.githubusercontent.com/nytimes/covid-19-data/master/us.csv"
+        url = NYT_URL
     
     print(f"Extracting NY Times data from {url}...")
     
     try:
-        resp = requests.get(url, timeout=30)
-        resp.raise_for_status()
-        df = pd.read_csv(StringIO(resp.text))
+        df = _fetch_csv(url, save_path, session, timeout, use_cache, offline)
         print(f"Successfully extracted {len(df)} rows from NY Times")
         
-        # Create directory if it doesn't exist
-        os.makedirs(os.path.dirname(save_path), exist_ok=True)
-        
-        # Save to file
-        df.to_csv(save_path, index=False)
-        print(f"Data saved to {save_path}")
-        
         return df
     except Exception as e:
         print(f"Error extracting NY Times data: {e}")
         raise
 
 
-def extract_all_data(country="United States", save_raw=True):
+def download_csv(url, save_path, session=None, timeout=300, use_cache=False, offline=False,
+                 cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Download a CSV straight to disk without parsing it
+    
+    Used for files too large to hold in memory; they are read back in chunks.
+    
+    Args:
+        url: Source URL
+        save_path: Local path of the copy
+        session: Optional requests.Session to reuse pooled connections
+        timeout: Request timeout in seconds
+        use_cache: Revalidate against the local raw-data cache (conditional GET)
+        offline: Serve only from the local raw-data cache
+        cache_dir: Raw-data cache directory
+    
+    Returns:
+        save_path
+    """
+    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    
+    if use_cache or offline:
+        blob_path, status = fetch_cached(url, session=session, timeout=timeout,
+                                         cache_dir=cache_dir, offline=offline)
+        print(f"Cache status for {url}: {status}")
+        if status == "downloaded" or not os.path.exists(save_path):
+            shutil.copyfile(blob_path, save_path)
+            print(f"Data saved to {save_path}")
+        return save_path
+    
+    http = session if session is not None else requests
+    tmp_path = save_path + ".tmp"
+    with http.get(url, timeout=timeout, stream=True) as resp:
+        resp.raise_for_status()
+        with open(tmp_path, "wb") as f:
+            for chunk in resp.iter_content(chunk_size=1 << 20):
+                f.write(chunk)
+    os.replace(tmp_path, save_path)
+    print(f"Data saved to {save_path}")
+    return save_path
+
+
+def extract_nyt_subnational_data(level="counties", save_dir="data/raw", session=None, timeout=300,
+                                 use_cache=False, offline=False):
+    """
+    Download the NY Times state or county files
+    
+    The county files hold millions of rows, so they are streamed to disk and
+    not parsed here; see subnational.build_subnational_panel.
+    
+    Args:
+        level: 'states' or 'counties'
+        save_dir: Directory for the downloaded files
+        session: Optional requests.Session to reuse pooled connections
+        timeout: Request timeout in seconds per file
+        use_cache: Revalidate against the local raw-data cache (conditional GET)
+        offline: Serve only from the local raw-data cache
+    
+    Returns:
+        List of local CSV paths in chronological order
+    """
+    if level not in NYT_SUBNATIONAL_URLS:
+        raise ValueError(f"Unknown level '{level}', expected one of {list(NYT_SUBNATIONAL_URLS)}")
+    
+    print(f"Extracting NY Times {level} data...")
+    paths = []
+    own_session = session is None
+    if own_session:
+        session = create_session()
+    try:
+        for url in NYT_SUBNATIONAL_URLS[level]:
+            save_path = os.path.join(save_dir, "nyt_" + url.rsplit("/", 1)[-1])
+            paths.append(download_csv(url, save_path, session=session, timeout=timeout,
+                                      use_cache=use_cache, offline=offline))
+    finally:
+        if own_session:
+            session.close()
+    
+    print(f"Successfully extracted {len(paths)} NY Times {level} file(s)")
+    return paths
+
+
+def _filter_path(save_path):
+    """Sidecar file recording which countries a raw snapshot holds"""
+    return save_path + ".filter.json"
+
+
+def read_snapshot_filter(save_path):
+    """
+    Country filter a raw snapshot was written with
+    
+    Returns:
+        Tuple of (found, countries) where countries is a sorted list or None
+        for a whole-world snapshot; found is False when no record exists
+    """
+    path = _filter_path(save_path)
+    if not os.path.exists(path):
+        return False, None
+    with open(path) as f:
+        return True, json.load(f)["countries"]
+
+
+def write_snapshot_filter(save_path, countries):
+    """Record the country filter (None = whole world) of a raw snapshot"""
+    with open(_filter_path(save_path), "w") as f:
+        json.dump({"countries": sorted(countries) if countries is not None else None}, f)
+
+
+def append_new_rows(existing_df, fresh_df, date_col, country_col=None, save_path=None):
+    """
+    Merge only rows dated after the last date already stored
+    
+    Upstream sources only add new dates, so anything at or before the stored
+    last date (per country when country_col is given) is skipped. New rows are
+    appended to save_path instead of re-writing the whole snapshot.
+    
+    Args:
+        existing_df: Previously stored snapshot
+        fresh_df: Newly downloaded data
+        date_col: Name of the date column
+        country_col: Optional country column to track the last date per country
+        save_path: Optional CSV snapshot to append the new rows to
+    
+    Returns:
+        Tuple of (merged_df, n_new_rows)
+    """
+    existing_dates = pd.to_datetime(existing_df[date_col])
+    fresh_dates = pd.to_datetime(fresh_df[date_col])
+    
+    if country_col is None:
+        is_new = fresh_dates > existing_dates.max()
+    else:
+        last_dates = existing_dates.groupby(existing_df[country_col]).max()
+        cutoff = pd.to_datetime(fresh_df[country_col].map(last_dates))
+        is_new = cutoff.isna() | (fresh_dates > cutoff)
+    
+    new_rows = fresh_df.loc[is_new.to_numpy()].reindex(columns=existing_df.columns)
+    
+    if save_path and len(new_rows) > 0:
+        new_rows.to_csv(save_path, mode='a', header=False, index=False)
+        print(f"Appended {len(new_rows)} new rows to {save_path}")
+    
+    merged = pd.concat([existing_df, new_rows], ignore_index=True) if len(new_rows) > 0 else existing_df
+    return merged, len(new_rows)
+
+
+def extract_sources_concurrently(sources, timeouts=None, max_workers=None, session=None,
+                                 use_cache=False, offline=False):
+    """
+    Extract several sources in parallel threads over one pooled HTTP session
+    
+    Downloads are network-bound, so total wall time is roughly that of the
+    slowest single source instead of the sum of all of them.
+    
+    Args:
+        sources: Dict mapping source name to (extract_func, url, save_path)
+        timeouts: Dict mapping source name to request timeout in seconds
+                  (default: DEFAULT_TIMEOUTS, 30 seconds for unknown sources)
+        max_workers: Number of worker threads (default: one per source)
+        session: Optional requests.Session (default: a new pooled session)
+        use_cache: Revalidate against the local raw-data cache (conditional GET)
+        offline: Serve only from the local raw-data cache
+    
+    Returns:
+        Dict mapping source name to extracted DataFrame
+    
+    Raises:
+        ExtractionError: If any source fails; all sources are attempted first
+    """
+    timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+    max_workers = max_workers or max(1, len(sources))
+    own_session = session is None
+    if own_session:
+        session = create_session(pool_size=max_workers)
+    
+    results = {}
+    errors = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                name: executor.submit(func, url=url, save_path=save_path,
+                                      session=session, timeout=timeouts.get(name, 30),
+                                      use_cache=use_cache, offline=offline)
+                for name, (func, url, save_path) in sources.items()
+            }
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    errors[name] = e
+    finally:
+        if own_session:
+            session.close()
+    
+    if errors:
+        raise ExtractionError(errors)
+    
+    return results
+
+
+def extract_all_data(country="United States", save_raw=True, concurrent=False, timeouts=None,
+                     use_cache=False, offline=False, countries=None, save_columnar=False,
+                     incremental=False):
     """
     Extract all data sources (OWID, WHO, NY Times)
     
     Args:
         country: Country to filter (default: United States)
         save_raw: Whether to save raw data files
+        concurrent: Download all sources in parallel over a shared session
+        timeouts: Optional dict of per-source timeouts in seconds ('owid', 'who', 'nyt')
+        use_cache: Revalidate raw files against the local cache so unchanged
+                   sources cost one 304 round trip
+        offline: Serve only from the local cache (no network access)
+        countries: Optional list of OWID country names; when given, OWID and WHO
+                   are streamed in chunks and only these countries are kept
+        save_columnar: Also write typed columnar copies under data/raw/columnar/
+        incremental: Merge only dates newer than the existing raw snapshots and
+                     append them, instead of re-writing each snapshot. The full
+                     upstream files are still downloaded and parsed (the sources
+                     offer no range requests); only the merge and the write are
+                     incremental. A snapshot written with a different country
+                     filter (recorded next to it in <file>.filter.json) is
+                     re-written in full instead.
     
     Returns:
         Tuple of (owid_df, who_df, nyt_df, source_urls)
@@ -129,28 +509,83 @@ def extract_all_data(country="United States", save_raw=True):
     print("DATA EXTRACTION")
     print("=" * 60)
     
-    # Data source URLs
-    OWID_URL = "https://raw.githubusercontent.com/owid/covid-19-data/master/public/data/owid-covid-data.csv"
-    WHO_URL = "https://srhdpeuwpubsa.blob.core.windows.net/whdh/COVID/WHO-COVID-19-global-data.csv"
-    NYT_URL = "https://raw.githubusercontent.com/nytimes/covid-19-data/master/us.csv"
-    
     source_urls = {
         'owid': OWID_URL,
         'who': WHO_URL,
         'nyt': NYT_URL
     }
     
-    # Extract OWID data
-    owid_path = "data/raw/owid_covid_data.csv" if save_raw else None
-    owid_df = extract_owid_data(url=OWID_URL, save_path=owid_path)
+    extract_owid, extract_who = extract_owid_data, extract_who_data
+    if countries is not None:
+        extract_owid = partial(extract_owid_data, countries=list(countries))
+        extract_who = partial(extract_who_data, countries=[who_country_name(c) for c in countries])
+    
+    raw_paths = {
+        'owid': "data/raw/owid_covid_data.csv",
+        'who': "data/raw/who_covid_data.csv",
+        'nyt': "data/raw/nyt_covid_data.csv"
+    }
+    
+    # Countries each parsed frame keeps, and each raw file on disk holds (the
+    # cache copies the whole upstream file, so cached snapshots are unfiltered)
+    frame_filters = {name: None for name in raw_paths}
+    if countries is not None:
+        frame_filters['owid'] = sorted(countries)
+        frame_filters['who'] = sorted(who_country_name(c) for c in countries)
+    file_filters = {name: None if (use_cache or offline) else keep for name, keep in frame_filters.items()}
+    
+    # A snapshot written with another (or an unrecorded) filter is stale
+    if save_raw:
+        for name, path in raw_paths.items():
+            if os.path.exists(path) and read_snapshot_filter(path) != (True, file_filters[name]):
+                print(f"  ⚠ {path} was written with a different country filter; re-writing it in full")
+                os.remove(path)
+    
+    # Snapshots that already exist are appended to rather than re-written, as
+    # long as the file holds exactly the countries the fresh frame does
+    snapshots = {}
+    if incremental:
+        for name, path in raw_paths.items():
+            if os.path.exists(path) and file_filters[name] == frame_filters[name]:
+                snapshots[name] = pd.read_csv(path)
+    
+    def save_path_for(name):
+        return raw_paths[name] if save_raw and name not in snapshots else None
+    
+    sources = {
+        'owid': (extract_owid, OWID_URL, save_path_for('owid')),
+        'who': (extract_who, WHO_URL, save_path_for('who')),
+        'nyt': (extract_nyt_data, NYT_URL, save_path_for('nyt'))
+    }
+    
+    if concurrent:
+        print("Extracting all sources concurrently...")
+        frames = extract_sources_concurrently(sources, timeouts=timeouts,
+                                              use_cache=use_cache, offline=offline)
+    else:
+        timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        frames = {}
+        with create_session() as session:
+            for name, (func, url, save_path) in sources.items():
+                frames[name] = func(url=url, save_path=save_path, session=session, timeout=timeouts[name],
+                                    use_cache=use_cache, offline=offline)
+    
+    for name, existing_df in snapshots.items():
+        date_col, country_col = SOURCE_KEYS[name]
+        frames[name], n_new = append_new_rows(existing_df, frames[name], date_col, country_col,
+                                              save_path=raw_paths[name] if save_raw else None)
+        print(f"  {name}: {n_new} new rows since the last snapshot")
+    
+    if save_raw:
+        for name, path in raw_paths.items():
+            if os.path.exists(path):
+                write_snapshot_filter(path, file_filters[name])
     
-    # Extract WHO data
-    who_path = "data/raw/who_covid_data.csv" if save_raw else None
-    who_df = extract_who_data(url=WHO_URL, save_path=who_path)
+    owid_df, who_df, nyt_df = frames['owid'], frames['who'], frames['nyt']
     
-    # Extract NY Times data
-    nyt_path = "data/raw/nyt_covid_data.csv" if save_raw else None
-    nyt_df = extract_nyt_data(url=NYT_URL, save_path=nyt_path)
+    if save_columnar:
+        for name, df in frames.items():
+            save_source(df, name)
     
     print("\nExtraction Summary:")
     print(f"  OWID data: {len(owid_df)} rows, {len(owid_df.columns)} columns")
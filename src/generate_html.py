@@ -6,43 +6,39 @@ import pandas as pd
 import json
 import os
 
+from process_data import SOURCE_CASE_COLUMNS
 
-def prepare_chart_data(df, owid_df, who_df, nyt_df):
+
+def _align_raw_sources(owid_df, who_df, nyt_df, cube=None, country="United States"):
     """
-    Prepare data for simple Canvas charts
-    
-    Args:
-        df: Clean daily DataFrame with date index
-        owid_df: Raw OWID DataFrame
-        who_df: Raw WHO DataFrame
-        nyt_df: Raw NY Times DataFrame
+    Align the raw sources to weekly values by date matching (fallback for
+    processed files without the reconciled per-source columns)
     
     Returns:
-        Dictionary with chart data
+        Tuple of (dates, owid values, who values, nyt values)
     """
-    # Calculate statistics
-    p_I = df['I'].mean()
-    p_V = df['vaccination_rate'].mean()
-    high_vax = df[df['vaccination_rate'] >= 0.5]
-    low_vax = df[df['vaccination_rate'] < 0.5]
-    p_I_high = high_vax['I'].mean() if len(high_vax) > 0 else 0
-    p_I_low = low_vax['I'].mean() if len(low_vax) > 0 else 0
-    
     # Prepare data for 3-source comparison chart - ALL SOURCES ARE NOW WEEKLY
     # Convert all sources to weekly aggregation for comparison
     
+    weekly_rollup = cube.slice(country, 'W') if cube is not None else None
+    
     # OWID: US data, new_cases - aggregate daily to weekly
-    owid_us = owid_df[owid_df['location'] == 'United States'].copy()
-    if 'date' in owid_us.columns:
-        owid_us['date'] = pd.to_datetime(owid_us['date'])
-        owid_us = owid_us.set_index('date').sort_index()
-        owid_us = owid_us[(owid_us.index >= '2020-01-01') & (owid_us.index <= '2022-12-31')]
-        # Aggregate to weekly (sum of new_cases)
-        owid_weekly = owid_us['new_cases'].resample('W').sum().fillna(0)
+    if weekly_rollup is not None and 'new_cases_owid' in weekly_rollup.columns:
+        owid_weekly = weekly_rollup['new_cases_owid'].fillna(0)
         owid_dates = [d.strftime('%Y-%m-%d') for d in owid_weekly.index]
-        owid_values = [float(v) if pd.notna(v) else 0.0 for v in owid_weekly.values]
+        owid_values = [float(v) for v in owid_weekly.values]
     else:
-        owid_dates, owid_values = [], []
+        owid_us = owid_df[owid_df['location'] == 'United States'].copy()
+        if 'date' in owid_us.columns:
+            owid_us['date'] = pd.to_datetime(owid_us['date'])
+            owid_us = owid_us.set_index('date').sort_index()
+            owid_us = owid_us[(owid_us.index >= '2020-01-01') & (owid_us.index <= '2022-12-31')]
+            # Aggregate to weekly (sum of new_cases)
+            owid_weekly = owid_us['new_cases'].resample('W').sum().fillna(0)
+            owid_dates = [d.strftime('%Y-%m-%d') for d in owid_weekly.index]
+            owid_values = [float(v) if pd.notna(v) else 0.0 for v in owid_weekly.values]
+        else:
+            owid_dates, owid_values = [], []
     
     # WHO: US data, New_cases - already weekly
     who_us = who_df[who_df['Country'] == 'United States of America'].copy()
@@ -58,20 +54,25 @@ def prepare_chart_data(df, owid_df, who_df, nyt_df):
         who_dates, who_values = [], []
     
     # NY Times: convert cumulative to daily, then aggregate to weekly
-    nyt_copy = nyt_df.copy()
-    if 'date' in nyt_copy.columns:
-        nyt_copy['date'] = pd.to_datetime(nyt_copy['date'])
-        nyt_copy = nyt_copy.sort_values('date')
-        nyt_copy = nyt_copy[(nyt_copy['date'] >= '2020-01-01') & (nyt_copy['date'] <= '2022-12-31')]
-        # Convert cumulative to daily
-        nyt_copy['new_cases'] = nyt_copy['cases'].diff().fillna(nyt_copy['cases'].iloc[0]).clip(lower=0)
-        nyt_copy = nyt_copy.set_index('date')
-        # Aggregate to weekly (sum of new_cases)
-        nyt_weekly = nyt_copy['new_cases'].resample('W').sum().fillna(0)
-        nyt_dates = [pd.to_datetime(d).strftime('%Y-%m-%d') for d in nyt_weekly.index]
-        nyt_values = [float(v) if pd.notna(v) else 0.0 for v in nyt_weekly.values]
+    if weekly_rollup is not None:
+        nyt_weekly = weekly_rollup['new_cases']
+        nyt_dates = [d.strftime('%Y-%m-%d') for d in nyt_weekly.index]
+        nyt_values = [float(v) for v in nyt_weekly.values]
     else:
-        nyt_dates, nyt_values = [], []
+        nyt_copy = nyt_df.copy()
+        if 'date' in nyt_copy.columns:
+            nyt_copy['date'] = pd.to_datetime(nyt_copy['date'])
+            nyt_copy = nyt_copy.sort_values('date')
+            nyt_copy = nyt_copy[(nyt_copy['date'] >= '2020-01-01') & (nyt_copy['date'] <= '2022-12-31')]
+            # Convert cumulative to daily
+            nyt_copy['new_cases'] = nyt_copy['cases'].diff().fillna(nyt_copy['cases'].iloc[0]).clip(lower=0)
+            nyt_copy = nyt_copy.set_index('date')
+            # Aggregate to weekly (sum of new_cases)
+            nyt_weekly = nyt_copy['new_cases'].resample('W').sum().fillna(0)
+            nyt_dates = [pd.to_datetime(d).strftime('%Y-%m-%d') for d in nyt_weekly.index]
+            nyt_values = [float(v) if pd.notna(v) else 0.0 for v in nyt_weekly.values]
+        else:
+            nyt_dates, nyt_values = [], []
     
     # Align dates across all 3 sources
     # Create dictionaries for alignment
@@ -127,6 +128,61 @@ def prepare_chart_data(df, owid_df, who_df, nyt_df):
     comparison_nyt = [match_weekly_value(d, nyt_dict, nyt_dates) for d in comparison_dates]
     comparison_who = [match_weekly_value(d, who_dict, who_dates) for d in comparison_dates] if who_dict else [0.0] * len(comparison_dates)
     
+    return comparison_dates, comparison_owid, comparison_who, comparison_nyt
+
+
+def prepare_chart_data(df, owid_df, who_df, nyt_df, cube=None, country="United States", sweep=None,
+                       rolling=None):
+    """
+    Prepare data for simple Canvas charts
+    
+    Args:
+        df: Clean daily DataFrame with date index
+        owid_df: Raw OWID DataFrame
+        who_df: Raw WHO DataFrame
+        nyt_df: Raw NY Times DataFrame
+        cube: Optional RollupCube, used only when df lacks the per-source case
+              columns (see _align_raw_sources)
+        country: Country slice of the cube
+        sweep: Optional threshold_sweep DataFrame (computed from df if not given)
+        rolling: Optional rolling correlation Series (computed from df if not given)
+    
+    Returns:
+        Dictionary with chart data
+    """
+    # Calculate statistics
+    p_I = df['I'].mean()
+    p_V = df['vaccination_rate'].mean()
+    high_vax = df[df['vaccination_rate'] >= 0.5]
+    low_vax = df[df['vaccination_rate'] < 0.5]
+    p_I_high = high_vax['I'].mean() if len(high_vax) > 0 else 0
+    p_I_low = low_vax['I'].mean() if len(low_vax) > 0 else 0
+    
+    # 3-source comparison: the processed weekly frame already carries the
+    # per-source case columns aligned to the same W-SUN weeks
+    if all(col in df.columns for col in SOURCE_CASE_COLUMNS):
+        aligned = df[SOURCE_CASE_COLUMNS].dropna().iloc[:200]
+        comparison_dates = [d.strftime('%Y-%m-%d') for d in aligned.index]
+        comparison_nyt = [float(v) for v in aligned['new_cases_nyt'].values]
+        comparison_owid = [float(v) for v in aligned['new_cases_owid'].values]
+        comparison_who = [float(v) for v in aligned['new_cases_who'].values]
+    else:
+        # Processed data written before the sources were reconciled
+        comparison_dates, comparison_owid, comparison_who, comparison_nyt = _align_raw_sources(
+            owid_df, who_df, nyt_df, cube=cube, country=country)
+    
+    # Conditional probabilities for every threshold where both groups are non-empty
+    if sweep is None:
+        from analyze import threshold_sweep
+        sweep = threshold_sweep(df)
+    curve = sweep.dropna(subset=['p_value'])
+    
+    # 26-week rolling correlation between vaccination and cases
+    if rolling is None:
+        from analyze import calculate_rolling_correlation
+        rolling = calculate_rolling_correlation(df)
+    rolling = rolling.dropna()
+    
     # Prepare data
     chart_data = {
         'dataCoverage': {
@@ -150,6 +206,17 @@ def prepare_chart_data(df, owid_df, who_df, nyt_df):
             'highVax': float(p_I_high),
             'lowVax': float(p_I_low)
         },
+        'thresholdSweep': {
+            'thresholds': [float(t) for t in curve['threshold'].values],
+            'labels': [f'{t:.2f}' for t in curve['threshold'].values],
+            'highVax': [float(v) for v in curve['p_I_high'].values],
+            'lowVax': [float(v) for v in curve['p_I_low'].values],
+            'pValues': [float(v) for v in curve['p_value'].values]
+        },
+        'rollingCorrelation': {
+            'dates': [d.strftime('%Y-%m-%d') for d in rolling.index],
+            'values': [float(v) for v in rolling.values]
+        },
         'descriptiveStats': {
             'mean': float(df['new_cases'].mean()),
             'median': float(df['new_cases'].median()),
@@ -164,7 +231,8 @@ def prepare_chart_data(df, owid_df, who_df, nyt_df):
     return chart_data
 
 
-def create_html_dashboard(df, analysis_results, source_urls, owid_df, who_df, nyt_df, save_path="index.html"):
+def create_html_dashboard(df, analysis_results, source_urls, owid_df, who_df, nyt_df, save_path="index.html",
+                          cube=None):
     """
     Create simple HTML dashboard with Canvas charts
     
@@ -173,8 +241,11 @@ def create_html_dashboard(df, analysis_results, source_urls, owid_df, who_df, ny
         analysis_results: Analysis results dictionary
         source_urls: Dictionary with 'owid', 'who', 'nyt' URLs
         save_path: Path to save HTML file
+        cube: Optional RollupCube with pre-aggregated weekly series
     """
-    chart_data = prepare_chart_data(df, owid_df, who_df, nyt_df)
+    chart_data = prepare_chart_data(df, owid_df, who_df, nyt_df, cube=cube,
+                                    sweep=analysis_results.get("threshold_sweep"),
+                                    rolling=analysis_results.get("rolling_correlation"))
     
     # Get correlation analysis results (main hypothesis test)
     corr_analysis = analysis_results.get("correlation_analysis", {})
@@ -182,6 +253,14 @@ def create_html_dashboard(df, analysis_results, source_urls, owid_df, who_df, ny
     corr_p_value = corr_analysis.get("p_value", 1.0)
     corr_t_stat = corr_analysis.get("t_statistic", 0)
     corr_significant = corr_analysis.get("significant", False)
+    corr_test_type = corr_analysis.get("test_type", "Pearson correlation test")
+    if "n_permutations" in corr_analysis:
+        corr_p_label = f"P-value (permutation, {corr_analysis['n_permutations']:,} permutations)"
+        corr_p_extra = (f"<li><strong>P-value (t-test):</strong> "
+                        f"{corr_analysis['p_value_asymptotic']:.6f}</li>")
+    else:
+        corr_p_label = "P-value (t-test)"
+        corr_p_extra = ""
     
     # Determine conclusion based on correlation
     if corr_significant:
@@ -416,7 +495,7 @@ def create_html_dashboard(df, analysis_results, source_urls, owid_df, who_df, ny
             <p style="font-size: 18px; line-height: 1.9;">
                 <strong>Research Question:</strong> Is there a significant relationship between vaccination rates and weekly new case counts?<br><br>
                 <strong>Hypothesis:</strong> There is a significant correlation between vaccination rate and weekly new case counts across the analysis period (2020-2022).<br><br>
-                <strong>Statistical Test:</strong> Pearson correlation test (tests whether correlation is significantly different from zero)
+                <strong>Statistical Test:</strong> {corr_test_type} (tests whether correlation is significantly different from zero)
             </p>
         </div>
         
@@ -507,15 +586,34 @@ def create_html_dashboard(df, analysis_results, source_urls, owid_df, who_df, ny
             </div>
         </div>
         
+        <div class="chart-container">
+            <div class="chart-title">4. Conditional Probabilities Across Vaccination Thresholds</div>
+            <canvas id="chart4"></canvas>
+            <div class="viz-explanation">
+                <h3>What it shows:</h3>
+                <p>Chart 3 uses a single cut-off of 0.5. This chart repeats the comparison for every observed vaccination rate t: the green line is the infection probability in weeks with V ≥ t and the orange line in weeks with V < t. If the gap between the lines keeps the same sign across most thresholds, the result does not depend on the particular choice of 0.5.</p>
+            </div>
+        </div>
+        
+        <div class="chart-container">
+            <div class="chart-title">5. Rolling 26-Week Correlation: Vaccination Rate vs Weekly Cases</div>
+            <canvas id="chart5"></canvas>
+            <div class="viz-explanation">
+                <h3>What it shows:</h3>
+                <p>The overall correlation r summarizes the whole period in one number. This chart recomputes r over a sliding window of the previous 26 weeks, so each point shows the association during one stretch of the pandemic. Large swings between positive and negative values across waves indicate that the overall r is driven by timing (which variant was circulating when coverage rose) rather than by a stable relationship. The red dashed line marks r = 0.</p>
+            </div>
+        </div>
+        
         <div class="conclusion-box">
             <h2>Hypothesis Testing Results & Conclusion</h2>
             <div style="font-size: 18px; line-height: 1.8;">
                 <p><strong>Statistical Test Results (Correlation Analysis):</strong></p>
                 <ul style="line-height: 2; margin-left: 20px;">
-                    <li><strong>Test:</strong> Pearson correlation test</li>
+                    <li><strong>Test:</strong> {corr_test_type}</li>
                     <li><strong>Correlation Coefficient (r):</strong> {correlation:.4f}</li>
                     <li><strong>T-statistic:</strong> {corr_t_stat:.4f}</li>
-                    <li><strong>P-value:</strong> {corr_p_value:.6f}</li>
+                    <li><strong>{corr_p_label}:</strong> {corr_p_value:.6f}</li>
+                    {corr_p_extra}
                     <li><strong>Significance Level (α):</strong> 0.05</li>
                     <li><strong>Result:</strong> {conclusion}</li>
                 </ul>
@@ -775,7 +873,7 @@ def create_html_dashboard(df, analysis_results, source_urls, owid_df, who_df, ny
             for (let i = 0; i <= 5; i++) {{
                 const val = minVal + (range / 5) * (5 - i);
                 const y = padding.top + (chartHeight / 5) * i;
-                ctx.fillText(val.toFixed(0), padding.left - 10, y + 4);
+                ctx.fillText(val.toFixed(options.yDecimals || 0), padding.left - 10, y + 4);
             }}
             
             // X-axis labels (week numbers)
@@ -916,6 +1014,28 @@ def create_html_dashboard(df, analysis_results, source_urls, owid_df, who_df, ny
                 [chartData.conditionalProbabilities.highVax, chartData.conditionalProbabilities.lowVax],
                 ['#06A77D', '#F18F01']
             );
+            
+            // Chart 4: Conditional probabilities for every threshold
+            drawMultiLineChart('chart4', chartData.thresholdSweep.labels, [
+                {{label: 'P(I | V ≥ t)', values: chartData.thresholdSweep.highVax, color: '#06A77D'}},
+                {{label: 'P(I | V < t)', values: chartData.thresholdSweep.lowVax, color: '#F18F01'}}
+            ], {{
+                xLabel: 'Vaccination threshold t',
+                weekNumbers: chartData.thresholdSweep.labels,
+                yLabel: 'Infection Probability',
+                yDecimals: 2
+            }});
+            
+            // Chart 5: Rolling correlation
+            const rollingData = chartData.rollingCorrelation.dates.map((d, i) => [d, chartData.rollingCorrelation.values[i]]);
+            drawLineChart('chart5', rollingData, {{
+                color: '#A23B72',
+                fill: false,
+                threshold: 0,
+                xLabel: 'Window end (week)',
+                weekNumbers: chartData.rollingCorrelation.dates,
+                yLabel: 'Rolling r'
+            }});
         }});
     </script>
 </body>
@@ -934,7 +1054,11 @@ def create_html_dashboard(df, analysis_results, source_urls, owid_df, who_df, ny
 if __name__ == "__main__":
     # Test
     import pandas as pd
-    df = pd.read_csv('data/processed/merged_data_clean_weekly.csv')
+    from columnar_store import has_source, load_source
+    if has_source('weekly', root='data/processed/columnar'):
+        df = load_source('weekly', root='data/processed/columnar')
+    else:
+        df = pd.read_csv('data/processed/merged_data_clean_weekly.csv')
     df['date'] = pd.to_datetime(df['date'])
     df = df.set_index('date').sort_index()
     
@@ -0,0 +1,284 @@
+"""
+Panel Regression Module
+Fixed-effects (within) regression with country and week/month effects,
+variant-period dummies and cluster-robust standard errors
+
+Usage:
+    python src/panel_regression.py
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import linalg, stats
+
+from aggregate import VARIANT_PERIODS, assign_periods, period_end_labels
+
+
+# Time effects absorbed next to the entity effects
+TIME_EFFECTS = ('W', 'M', None)
+
+OUTCOME_TRANSFORMS = ('log1p', None)
+
+# Alternating projections stop once no value moves by more than this
+DEMEAN_TOLERANCE = 1e-8
+DEMEAN_MAX_ITER = 1_000
+
+# Regressors whose demeaned norm falls below this fraction of the original
+# are absorbed by the fixed effects and dropped
+COLLINEARITY_TOLERANCE = 1e-8
+
+
+def _drop_singletons(fe_codes):
+    """
+    Mask of rows to keep after iteratively removing fixed-effect levels with a
+    single observation (they are fitted exactly and only distort the
+    degrees of freedom)
+    """
+    keep = np.ones(len(fe_codes[0]), dtype=bool)
+    while True:
+        singleton = np.zeros(len(keep), dtype=bool)
+        for codes in fe_codes:
+            counts = np.bincount(codes[keep], minlength=codes.max() + 1)
+            singleton |= keep & (counts[codes] == 1)
+        if not singleton.any():
+            return keep
+        keep &= ~singleton
+
+
+def demean(X, fe_codes, tol=DEMEAN_TOLERANCE, max_iter=DEMEAN_MAX_ITER):
+    """
+    Remove any number of fixed effects from the columns of X
+
+    Alternating projections: subtract the group means of each effect in
+    turn (np.bincount per column) until the columns stop changing. One
+    effect is removed exactly in a single pass, as are two effects on a
+    balanced panel. No dummy matrix is ever built, so memory stays at a few
+    copies of X.
+
+    Args:
+        X: (n, k) float array
+        fe_codes: List of int arrays of length n with codes 0..levels-1
+        tol: Convergence tolerance on the largest change in a pass
+        max_iter: Maximum number of passes
+
+    Returns:
+        Tuple of (demeaned copy of X, number of passes)
+    """
+    X = np.array(X, dtype=float, copy=True)
+    counts = [np.bincount(codes).astype(float) for codes in fe_codes]
+    scale = max(1.0, np.abs(X).max()) if X.size else 1.0
+
+    for iteration in range(1, max_iter + 1):
+        change = 0.0
+        for codes, n in zip(fe_codes, counts):
+            for j in range(X.shape[1]):
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    means = np.bincount(codes, weights=X[:, j], minlength=len(n)) / n
+                means = np.nan_to_num(means)
+                X[:, j] -= means[codes]
+                change = max(change, np.abs(means).max())
+        if len(fe_codes) == 1 or change <= tol * scale:
+            return X, iteration
+
+    print(f"   ⚠ Fixed-effect demeaning did not converge after {max_iter} passes (change {change:.2e})")
+    return X, max_iter
+
+
+def fit_fixed_effects(y, X, fe_codes, cluster=None, names=None, confidence=0.95,
+                      tol=DEMEAN_TOLERANCE, max_iter=DEMEAN_MAX_ITER):
+    """
+    OLS of y on X with absorbed fixed effects (within estimator)
+
+    Standard errors are cluster-robust (CR1) when cluster codes are given:
+    V = (X'X)^-1 [sum_g X_g' u_g u_g' X_g] (X'X)^-1 * G/(G-1) * (N-1)/(N-K),
+    with G-1 degrees of freedom for the t-tests. K counts the regressors plus
+    the levels of fixed effects that are not nested within the clusters.
+    Without clusters, homoskedastic standard errors are used.
+
+    Args:
+        y: (n,) outcome
+        X: (n, k) regressors (no constant; it is absorbed by the fixed effects)
+        fe_codes: List of int code arrays, one per fixed effect
+        cluster: Optional int code array for clustering
+        names: Regressor names (default: x0, x1, ...)
+        confidence: Confidence level of the coefficient intervals
+        tol: Demeaning tolerance
+        max_iter: Maximum demeaning passes
+
+    Returns:
+        Dictionary with a 'coefficients' DataFrame, dropped (collinear)
+        regressors, n_obs, n_clusters, r2_within and demeaning passes
+    """
+    y = np.asarray(y, dtype=float)
+    X = np.asarray(X, dtype=float).reshape(len(y), -1)
+    names = list(names) if names is not None else [f"x{j}" for j in range(X.shape[1])]
+    fe_codes = [np.asarray(codes) for codes in fe_codes]
+
+    valid = np.isfinite(y) & np.isfinite(X).all(axis=1)
+    if cluster is not None:
+        cluster = np.asarray(cluster)
+        valid &= cluster >= 0
+    for codes in fe_codes:
+        valid &= codes >= 0
+    n_complete = int(valid.sum())
+    valid[valid] = _drop_singletons([codes[valid] for codes in fe_codes])
+    n_singletons = n_complete - int(valid.sum())
+
+    # Re-code on the estimation sample so bincount sizes match the data
+    fe_codes = [pd.factorize(codes[valid])[0] for codes in fe_codes]
+    cluster = pd.factorize(cluster[valid])[0] if cluster is not None else None
+    data, iterations = demean(np.column_stack([y[valid], X[valid]]), fe_codes, tol, max_iter)
+    y_w, X_w = data[:, 0], data[:, 1:]
+
+    # Regressors absorbed by the fixed effects, then any remaining rank deficiency
+    original = np.linalg.norm(X[valid], axis=0)
+    keep = np.linalg.norm(X_w, axis=0) > COLLINEARITY_TOLERANCE * np.maximum(original, 1.0)
+    if keep.any():
+        _, R, pivot = linalg.qr(X_w[:, keep], mode='economic', pivoting=True)
+        diag = np.abs(np.diag(R))
+        independent = np.zeros(keep.sum(), dtype=bool)
+        independent[pivot[diag > COLLINEARITY_TOLERANCE * diag.max()]] = True
+        keep[np.flatnonzero(keep)[~independent]] = False
+    dropped = [name for name, kept in zip(names, keep) if not kept]
+    names = [name for name, kept in zip(names, keep) if kept]
+    X_w = X_w[:, keep]
+
+    n_obs, k = X_w.shape
+    xtx_inv = np.linalg.inv(X_w.T @ X_w) if k else np.zeros((0, 0))
+    beta = xtx_inv @ (X_w.T @ y_w)
+    resid = y_w - X_w @ beta
+
+    levels = [int(codes.max()) + 1 for codes in fe_codes]
+    if cluster is not None:
+        n_clusters = int(cluster.max()) + 1
+        # Effects nested in the clusters do not use up degrees of freedom
+        nested = [len(np.unique(codes.astype(np.int64) * n_clusters + cluster)) == n for codes, n
+                  in zip(fe_codes, levels)]
+        dof_fe = sum(n for n, is_nested in zip(levels, nested) if not is_nested)
+        scores = np.column_stack([np.bincount(cluster, weights=X_w[:, j] * resid, minlength=n_clusters)
+                                  for j in range(k)]) if k else np.zeros((n_clusters, 0))
+        correction = n_clusters / (n_clusters - 1) * (n_obs - 1) / (n_obs - k - dof_fe)
+        cov = correction * xtx_inv @ (scores.T @ scores) @ xtx_inv
+        df_resid = n_clusters - 1
+    else:
+        n_clusters = None
+        dof_fe = sum(levels) - (len(levels) - 1)
+        df_resid = n_obs - k - dof_fe
+        cov = (resid @ resid / df_resid) * xtx_inv
+
+    std_error = np.sqrt(np.diag(cov))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t_stat = beta / std_error
+    p_value = 2 * stats.t.sf(np.abs(t_stat), df_resid)
+    margin = stats.t.ppf(0.5 + confidence / 2, df_resid) * std_error
+
+    coefficients = pd.DataFrame({
+        "coefficient": beta,
+        "std_error": std_error,
+        "t_statistic": t_stat,
+        "p_value": p_value,
+        "ci_low": beta - margin,
+        "ci_high": beta + margin
+    }, index=pd.Index(names, name="regressor"))
+
+    return {
+        "coefficients": coefficients,
+        "dropped": dropped,
+        "n_obs": n_obs,
+        "n_singletons": n_singletons,
+        "fe_levels": levels,
+        "n_clusters": n_clusters,
+        "df_resid": df_resid,
+        "r2_within": 1 - (resid @ resid) / (y_w @ y_w) if y_w @ y_w > 0 else np.nan,
+        "iterations": iterations,
+        "covariance": cov
+    }
+
+
+def panel_regression(panel, outcome="new_cases", regressors=("vaccination_rate",), entity_level=None,
+                     time_effects="M", variant_dummies=True, periods=VARIANT_PERIODS,
+                     outcome_transform="log1p", cluster="entity", confidence=0.95):
+    """
+    Fixed-effects regression of a weekly panel
+
+    outcome ~ regressors + variant dummies + entity effects + time effects,
+    estimated within entities and time periods, with standard errors
+    clustered by entity. Weekly time effects absorb everything common to a
+    week, including the variant dummies (which are then reported as
+    dropped); monthly effects leave the variant switch within a month
+    identified.
+
+    Args:
+        panel: Weekly DataFrame indexed by (entity, date), e.g. from
+               process_data.build_country_panel or subnational.build_subnational_panel
+        outcome: Outcome column
+        regressors: Regressor columns
+        entity_level: Index level of the entity (default: the first level)
+        time_effects: 'W' (week), 'M' (month) or None
+        variant_dummies: Add one dummy per variant period after the first
+        periods: List of (name, start_date) variant periods
+        outcome_transform: 'log1p' (log(1 + outcome), for skewed counts) or None
+        cluster: 'entity' for entity-clustered standard errors, or None
+        confidence: Confidence level of the coefficient intervals
+
+    Returns:
+        Dictionary as from fit_fixed_effects, plus the model description
+    """
+    if time_effects not in TIME_EFFECTS:
+        raise ValueError(f"Unsupported time_effects '{time_effects}', expected one of {TIME_EFFECTS}")
+    if outcome_transform not in OUTCOME_TRANSFORMS:
+        raise ValueError(f"Unsupported outcome_transform '{outcome_transform}', "
+                         f"expected one of {OUTCOME_TRANSFORMS}")
+
+    entity_level = entity_level or panel.index.names[0]
+    entities = pd.factorize(panel.index.get_level_values(entity_level))[0]
+    dates = panel.index.get_level_values('date').to_numpy(dtype='datetime64[ns]')
+
+    y = panel[outcome].to_numpy(dtype=float)
+    if outcome_transform == "log1p":
+        y = np.log1p(np.clip(y, 0, None))
+
+    columns = [panel[col].to_numpy(dtype=float) for col in regressors]
+    names = list(regressors)
+    if variant_dummies:
+        codes = assign_periods(dates, periods)
+        for code in range(1, len(periods)):
+            columns.append((codes == code).astype(float))
+            names.append(f"variant_{periods[code][0]}")
+
+    fe_codes = [entities]
+    if time_effects is not None:
+        fe_codes.append(pd.factorize(period_end_labels(dates, time_effects))[0])
+
+    result = fit_fixed_effects(y, np.column_stack(columns), fe_codes,
+                               cluster=entities if cluster == "entity" else None,
+                               names=names, confidence=confidence)
+    result.update({
+        "outcome": f"log1p({outcome})" if outcome_transform == "log1p" else outcome,
+        "entity_level": entity_level,
+        "time_effects": time_effects,
+        "cluster": cluster
+    })
+    return result
+
+
+def print_regression(result):
+    """Print a regression result in the style of the analysis steps"""
+    effects = [result["entity_level"]] + ([{"W": "week", "M": "month"}[result["time_effects"]]]
+                                          if result["time_effects"] else [])
+    print(f"   {result['outcome']} with {' + '.join(effects)} fixed effects "
+          f"({result['n_obs']:,} rows, levels {result['fe_levels']})")
+    for name, row in result["coefficients"].iterrows():
+        print(f"   {name}: {row['coefficient']:.4f} (SE {row['std_error']:.4f}, p = {row['p_value']:.4f})")
+    for name in result["dropped"]:
+        print(f"   ⚠ {name} is absorbed by the fixed effects and was dropped")
+    clusters = f", {result['n_clusters']:,} clusters" if result["n_clusters"] else ""
+    print(f"   Within R²: {result['r2_within']:.4f}{clusters}")
+
+
+if __name__ == "__main__":
+    from extract_data import extract_all_data
+    from process_data import build_country_panel
+    owid_df, _, _, _ = extract_all_data(use_cache=True, countries=None)
+    panel = build_country_panel(owid_df)
+    print_regression(panel_regression(panel))
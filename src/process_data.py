@@ -5,23 +5,256 @@ Uses NY Times data for better quality
 """
 import pandas as pd
 import numpy as np
-import requests
-from io import StringIO
 import os
-from datetime import datetime
+import sys
 
+from aggregate import aggregate
+from columnar_store import DEFAULT_STORE_ROOT, has_source, load_source, save_source
+from extract_data import who_country_name
+from rollup_cube import DEFAULT_CUBE_PATH, RollupCube
+from stage_cache import DEFAULT_STAGE_CACHE_DIR, code_version, load_stage, stage_key, store_stage
 
-def get_better_covid_data(nyt_df, owid_df, country="United States", save_path="data/processed/merged_data_clean_weekly.csv"):
+
+# Peak COVID period used for the analysis (the heavy years)
+START_DATE = "2020-01-01"
+END_DATE = "2022-12-31"
+
+# OWID vaccination columns merged into the daily NY Times series
+VACCINATION_COLUMNS = ['people_vaccinated_per_hundred', 'people_vaccinated',
+                       'total_vaccinations', 'people_fully_vaccinated']
+
+# Vaccination columns forward-filled across missing days
+FFILL_COLUMNS = ['vaccination_rate', 'people_vaccinated', 'people_vaccinated_per_hundred']
+
+# Raw columns the processing stage reads from each source
+PROCESSING_COLUMNS = {
+    'owid': ['location', 'date', 'new_cases'] + VACCINATION_COLUMNS,
+    'who': ['Date_reported', 'Country', 'New_cases'],
+    'nyt': ['date', 'cases', 'deaths']
+}
+
+# Per-source weekly case counts in the reconciled weekly frame
+SOURCE_CASE_COLUMNS = ['new_cases_nyt', 'new_cases_owid', 'new_cases_who']
+
+# WHO reports weekly; a report dated within this many days after the start of
+# a W-SUN bin (i.e. up to and including the bin's Sunday) belongs to that bin
+WHO_TOLERANCE = pd.Timedelta(days=6)
+
+
+def has_processing_sources(root=DEFAULT_STORE_ROOT):
+    """Check whether columnar copies of all three raw sources exist"""
+    return all(has_source(name, root=root) for name in PROCESSING_COLUMNS)
+
+
+def load_processing_sources(root=DEFAULT_STORE_ROOT):
+    """
+    Load only the raw columns the processing stage needs from the columnar copies
+    
+    Args:
+        root: Root directory of the raw columnar store
+    
+    Returns:
+        Tuple of (owid_df, who_df, nyt_df)
+    """
+    frames = []
+    for name, columns in PROCESSING_COLUMNS.items():
+        df = load_source(name, columns=columns, root=root)
+        # Nullable integer counts become float (NaN) like a parsed CSV
+        for col in df.columns:
+            if isinstance(df[col].dtype, pd.Int32Dtype):
+                df[col] = df[col].astype('float64')
+        frames.append(df)
+    return tuple(frames)
+
+
+def _filter_window(df, date_col, start_date, end_date):
+    """Keep rows inside [start_date, end_date] (end_date=None means open-ended)"""
+    mask = df[date_col] >= start_date
+    if end_date is not None:
+        mask &= df[date_col] <= end_date
+    return df[mask].copy()
+
+
+def _prepare_nyt(nyt_df, start_date, end_date):
+    """NY Times rows inside the date window, sorted by date"""
+    nyt = nyt_df.copy()
+    nyt['date'] = pd.to_datetime(nyt['date'])
+    nyt = nyt.sort_values('date')
+    return _filter_window(nyt, 'date', start_date, end_date)
+
+
+def _prepare_owid(owid_df, country, start_date, end_date):
+    """OWID rows for one country inside the date window, sorted by date"""
+    us_owid = owid_df[owid_df['location'] == country].copy()
+    us_owid['date'] = pd.to_datetime(us_owid['date'])
+    us_owid = us_owid.sort_values('date')
+    return _filter_window(us_owid, 'date', start_date, end_date)
+
+
+def build_daily_data(nyt_window, owid_window=None, carry=None, start=None):
+    """
+    Build the complete daily series (new cases/deaths, infection indicator, vaccination)
+    
+    Args:
+        nyt_window: NY Times rows (cumulative cases/deaths) sorted by date
+        owid_window: OWID rows for the same country and window (None = no vaccination data)
+        carry: Optional state from the day before nyt_window starts: cumulative
+               'cases'/'deaths' baselines for diff() and last forward-fill values
+               for the vaccination columns (default: zeros, i.e. a full rebuild)
+        start: First date of the daily index (default: first date in nyt_window)
+    
+    Returns:
+        Daily DataFrame with date index
+    """
+    carry = carry or {}
+    daily = nyt_window.copy()
+    
+    if owid_window is not None:
+        owid_cols = owid_window[['date'] + VACCINATION_COLUMNS]
+        if 'new_cases' in owid_window.columns:
+            # OWID's own case counts, kept for source comparison
+            owid_cols = owid_cols.assign(new_cases_owid=owid_window['new_cases'])
+        daily = daily.merge(owid_cols, on='date', how='left')
+        daily['vaccination_rate'] = daily['people_vaccinated_per_hundred'] / 100.0
+        daily['vaccination_rate'] = daily['vaccination_rate'].ffill().fillna(carry.get('vaccination_rate', 0))
+        daily['vaccination_rate'] = daily['vaccination_rate'].clip(0, 1)
+    else:
+        daily['vaccination_rate'] = 0.0
+    
+    # NY Times data has cumulative cases, need to calculate daily new cases
+    daily = daily.sort_values('date')
+    daily['new_cases'] = daily['cases'] - daily['cases'].shift(1).fillna(carry.get('cases', 0))
+    daily['new_deaths'] = daily['deaths'] - daily['deaths'].shift(1).fillna(carry.get('deaths', 0))
+    
+    # Ensure non-negative (sometimes data corrections cause negative)
+    daily['new_cases'] = daily['new_cases'].clip(lower=0)
+    daily['new_deaths'] = daily['new_deaths'].clip(lower=0)
+    
+    # Create infection indicator
+    daily['I'] = (daily['new_cases'] > 0).astype(int)
+    
+    # Drop cumulative columns
+    daily = daily.drop(columns=['cases', 'deaths'])
+    
+    # Ensure complete daily series
+    date_range = pd.date_range(start=start if start is not None else daily['date'].min(),
+                               end=daily['date'].max(), freq='D')
+    complete_dates = pd.DataFrame({'date': date_range})
+    daily = complete_dates.merge(daily, on='date', how='left')
+    
+    # Fill missing values appropriately
+    daily['new_cases'] = daily['new_cases'].fillna(0)
+    daily['new_deaths'] = daily['new_deaths'].fillna(0)
+    daily['I'] = daily['I'].fillna(0)
+    
+    # Forward fill vaccination data
+    for col in FFILL_COLUMNS:
+        if col in daily.columns:
+            daily[col] = daily[col].ffill().fillna(carry.get(col, 0))
+    
+    # Set date as index
+    return daily.set_index('date').sort_index()
+
+
+def aggregate_weekly(daily):
+    """
+    Aggregate a daily series to weekly (W-SUN) bins
+    
+    Args:
+        daily: Daily DataFrame from build_daily_data
+    
+    Returns:
+        Weekly DataFrame with date index
+    """
+    weekly_data = aggregate(daily, freq='W')
+    
+    # Keep only columns that exist
+    for col in ['people_vaccinated', 'people_vaccinated_per_hundred']:
+        if col not in weekly_data.columns:
+            weekly_data[col] = 0
+    
+    return weekly_data
+
+
+def reconcile_sources(weekly_df, who_df, country="United States", tolerance=WHO_TOLERANCE):
+    """
+    Add per-source weekly case columns (NY Times, OWID, WHO) to a weekly frame
+    
+    WHO rows are aligned to the W-SUN bins with a sorted backward
+    merge_asof: each bin (labelled by its Sunday) takes the latest WHO
+    report dated no more than `tolerance` before that Sunday. Bins without
+    a WHO report in range get NaN; reports with a missing count get 0.
+    
+    Args:
+        weekly_df: Weekly DataFrame with a 'date' column or a date index
+        who_df: Raw WHO DataFrame (None = no WHO column values)
+        country: OWID country name, translated to WHO's naming
+        tolerance: Maximum distance between a bin's Sunday and the WHO report
+    
+    Returns:
+        Weekly DataFrame with new_cases_nyt, new_cases_owid and new_cases_who
+    """
+    indexed = 'date' not in weekly_df.columns
+    weekly = weekly_df.reset_index() if indexed else weekly_df.copy()
+    weekly['date'] = pd.to_datetime(weekly['date']).astype('datetime64[ns]')
+    weekly = weekly.drop(columns=[c for c in ('new_cases_who',) if c in weekly.columns])
+    
+    weekly['new_cases_nyt'] = weekly['new_cases']
+    if 'new_cases_owid' not in weekly.columns:
+        weekly['new_cases_owid'] = np.nan
+    
+    if who_df is not None and len(who_df) > 0:
+        who = who_df.loc[who_df['Country'] == who_country_name(country), ['Date_reported', 'New_cases']]
+        who = who.rename(columns={'New_cases': 'new_cases_who'})
+        who['Date_reported'] = pd.to_datetime(who['Date_reported']).astype('datetime64[ns]')
+        who['new_cases_who'] = pd.to_numeric(who['new_cases_who'], errors='coerce').fillna(0).astype(float)
+        who = who.sort_values('Date_reported')
+        weekly = pd.merge_asof(weekly.sort_values('date'), who, left_on='date', right_on='Date_reported',
+                               direction='backward', tolerance=tolerance)
+        weekly = weekly.drop(columns=['Date_reported'])
+    else:
+        weekly['new_cases_who'] = np.nan
+    
+    return weekly.set_index('date') if indexed else weekly
+
+
+def _carry_state(prior_nyt, owid_window):
+    """
+    State needed to continue the daily series after the last row of prior_nyt:
+    cumulative baselines for diff() and the forward-filled vaccination values
+    """
+    last = prior_nyt.iloc[-1]
+    carry = {'cases': last['cases'], 'deaths': last['deaths']}
+    if owid_window is not None:
+        # Only OWID values on NY Times dates survive the merge
+        merged = owid_window[owid_window['date'].isin(prior_nyt['date'])]
+        for col in ['people_vaccinated', 'people_vaccinated_per_hundred']:
+            seen = merged[col].dropna()
+            carry[col] = seen.iloc[-1] if len(seen) > 0 else 0
+        seen = (merged['people_vaccinated_per_hundred'] / 100.0).dropna()
+        carry['vaccination_rate'] = min(max(seen.iloc[-1], 0), 1) if len(seen) > 0 else 0
+    return carry
+
+
+def get_better_covid_data(nyt_df, owid_df, country="United States", save_path="data/processed/merged_data_clean_weekly.csv",
+                          start_date=START_DATE, end_date=END_DATE, cube_path=None, who_df=None):
     """
     Process COVID-19 data from NY Times, OWID, and WHO
     Filter to peak COVID period: 2020-2022
     Aggregate all data to weekly (sum for cases/deaths, mean for vaccination)
     
+    NY Times only covers the United States; for other countries (or many
+    countries at once) use build_country_panel, which takes cases from OWID.
+    
     Args:
         nyt_df: NY Times DataFrame
         owid_df: OWID DataFrame (for vaccination data)
-        country: Country name (default: United States)
+        country: OWID country name used for the vaccination data (default: United States)
         save_path: Path to save cleaned data
+        start_date: First date of the analysis window
+        end_date: Last date of the analysis window (None = no upper bound)
+        cube_path: Optional directory to save the daily/weekly/monthly/variant rollup cube
+        who_df: Optional raw WHO DataFrame, joined in as new_cases_who
     
     Returns:
         Clean weekly DataFrame
@@ -33,99 +266,34 @@ def get_better_covid_data(nyt_df, owid_df, country="United States", save_path="d
     print("\n1. Processing NY Times COVID-19 data...")
     try:
         # Use provided NY Times data
-        nyt_us = nyt_df.copy()
-        print(f"   ✓ Loaded {len(nyt_us):,} rows from NY Times")
-        
-        # Convert date
-        nyt_us['date'] = pd.to_datetime(nyt_us['date'])
-        nyt_us = nyt_us.sort_values('date')
-        
-        print(f"   Date range: {nyt_us['date'].min().date()} to {nyt_us['date'].max().date()}")
+        print(f"   ✓ Loaded {len(nyt_df):,} rows from NY Times")
+        all_dates = pd.to_datetime(nyt_df['date'])
+        print(f"   Date range: {all_dates.min().date()} to {all_dates.max().date()}")
         
         # Filter to peak COVID period: 2020-2022 (the heavy years)
-        print("\n2. Filtering to peak COVID period (2020-2022)...")
-        peak_period = nyt_us[(nyt_us['date'] >= '2020-01-01') & (nyt_us['date'] <= '2022-12-31')].copy()
+        print(f"\n2. Filtering to peak COVID period ({start_date} to {end_date or 'latest'})...")
+        peak_period = _prepare_nyt(nyt_df, start_date, end_date)
         print(f"   ✓ Filtered to {len(peak_period):,} days")
         print(f"   Date range: {peak_period['date'].min().date()} to {peak_period['date'].max().date()}")
         
         # Get vaccination data from OWID (they have better vaccination data)
         print("\n3. Getting vaccination data from OWID...")
         try:
-            us_owid = owid_df[owid_df['location'] == 'United States'].copy()
-            us_owid['date'] = pd.to_datetime(us_owid['date'])
-            
-            # Filter to same period
-            us_owid = us_owid[(us_owid['date'] >= '2020-01-01') & (us_owid['date'] <= '2022-12-31')].copy()
-            
-            # Merge vaccination data
-            peak_period = peak_period.merge(
-                us_owid[['date', 'people_vaccinated_per_hundred', 'people_vaccinated', 
-                        'total_vaccinations', 'people_fully_vaccinated']],
-                on='date',
-                how='left'
-            )
-            
-            # Calculate vaccination rate
-            peak_period['vaccination_rate'] = peak_period['people_vaccinated_per_hundred'] / 100.0
-            peak_period['vaccination_rate'] = peak_period['vaccination_rate'].ffill().fillna(0)
-            peak_period['vaccination_rate'] = peak_period['vaccination_rate'].clip(0, 1)
-            
+            us_owid = _prepare_owid(owid_df, country, start_date, end_date)
+            daily = build_daily_data(peak_period, us_owid)
             print(f"   ✓ Merged vaccination data")
         except Exception as e:
             print(f"   ⚠ Could not get vaccination data: {e}")
-            peak_period['vaccination_rate'] = 0.0
-        
-        # NY Times data has cumulative cases, need to calculate daily new cases
-        peak_period = peak_period.sort_values('date')
-        peak_period['new_cases'] = peak_period['cases'].diff().fillna(peak_period['cases'].iloc[0])
-        peak_period['new_deaths'] = peak_period['deaths'].diff().fillna(peak_period['deaths'].iloc[0])
-        
-        # Ensure non-negative (sometimes data corrections cause negative)
-        peak_period['new_cases'] = peak_period['new_cases'].clip(lower=0)
-        peak_period['new_deaths'] = peak_period['new_deaths'].clip(lower=0)
-        
-        # Create infection indicator
-        peak_period['I'] = (peak_period['new_cases'] > 0).astype(int)
-        
-        # Drop cumulative columns
-        peak_period = peak_period.drop(columns=['cases', 'deaths'])
-        
-        # Ensure complete daily series
-        date_range = pd.date_range(start=peak_period['date'].min(), end=peak_period['date'].max(), freq='D')
-        complete_dates = pd.DataFrame({'date': date_range})
-        peak_period = complete_dates.merge(peak_period, on='date', how='left')
-        
-        # Fill missing values appropriately
-        peak_period['new_cases'] = peak_period['new_cases'].fillna(0)
-        peak_period['new_deaths'] = peak_period['new_deaths'].fillna(0)
-        peak_period['I'] = peak_period['I'].fillna(0)
-        
-        # Forward fill vaccination data
-        vacc_cols = ['vaccination_rate', 'people_vaccinated', 'people_vaccinated_per_hundred']
-        for col in vacc_cols:
-            if col in peak_period.columns:
-                peak_period[col] = peak_period[col].ffill().fillna(0)
-        
-        # Set date as index
-        peak_period = peak_period.set_index('date').sort_index()
+            daily = build_daily_data(peak_period)
         
         # Aggregate to weekly (WHO is already weekly, NY Times and OWID are daily - convert to weekly)
         print(f"\n4. Aggregating to weekly data...")
-        weekly_data = peak_period.resample('W').agg({
-            'new_cases': 'sum',  # Sum cases for the week
-            'new_deaths': 'sum',  # Sum deaths for the week
-            'I': lambda x: 1 if x.sum() > 0 else 0,  # 1 if any infection in the week
-            'vaccination_rate': 'mean',  # Average vaccination rate for the week
-            'people_vaccinated': 'mean',
-            'people_vaccinated_per_hundred': 'mean'
-        })
+        weekly_data = aggregate_weekly(daily)
         
-        # Keep only columns that exist
-        for col in ['people_vaccinated', 'people_vaccinated_per_hundred']:
-            if col not in weekly_data.columns:
-                weekly_data[col] = 0
+        print(f"   ✓ Aggregated {len(daily):,} daily records to {len(weekly_data):,} weekly records")
         
-        print(f"   ✓ Aggregated {len(peak_period):,} daily records to {len(weekly_data):,} weekly records")
+        weekly_data = reconcile_sources(weekly_data, who_df, country=country)
+        print(f"   ✓ Aligned WHO weekly reports to {weekly_data['new_cases_who'].notna().sum():,} weeks")
         
         print(f"\n5. Final weekly dataset:")
         print(f"   Total weeks: {len(weekly_data):,}")
@@ -133,13 +301,17 @@ def get_better_covid_data(nyt_df, owid_df, country="United States", save_path="d
         print(f"   Total cases: {weekly_data['new_cases'].sum():,.0f}")
         print(f"   Average vaccination rate: {weekly_data['vaccination_rate'].mean():.4f}")
         print(f"   Max vaccination rate: {weekly_data['vaccination_rate'].max():.4f}")
-        print(f"   Missing values: {weekly_data.isnull().sum().sum()}")
+        print(f"   Missing values: {weekly_data.drop(columns=SOURCE_CASE_COLUMNS).isnull().sum().sum()}")
         
         # Save clean data
-        os.makedirs(os.path.dirname(save_path), exist_ok=True)
-        weekly_data.reset_index().to_csv(save_path, index=False)
+        if save_path:
+            os.makedirs(os.path.dirname(save_path), exist_ok=True)
+            weekly_data.reset_index().to_csv(save_path, index=False)
+            print(f"\n✓ Saved clean weekly data to: {save_path}")
+        
+        if cube_path:
+            RollupCube.from_daily(daily, country=country).save(cube_path)
         
-        print(f"\n✓ Saved clean weekly data to: {save_path}")
         print(f"✓ Data covers: {weekly_data.index.min().date()} to {weekly_data.index.max().date()}")
         print(f"✓ Note: All data sources converted to weekly aggregation (daily sources aggregated, WHO was already weekly)")
         
@@ -150,10 +322,176 @@ def get_better_covid_data(nyt_df, owid_df, country="United States", save_path="d
         raise
 
 
-def process_all_data(owid_df, who_df, nyt_df, country="United States", save_processed=True):
+def build_country_panel(owid_df, countries=None, start_date=START_DATE, end_date=END_DATE,
+                        save_path=None):
+    """
+    Process many countries at once into a weekly panel
+    
+    Applies the same steps as get_better_covid_data (daily diffs of the
+    cumulative counts, clipping of corrections, infection indicator,
+    forward-filled vaccination rate, weekly aggregation) to every country in
+    one grouped, vectorized pass. Cases and deaths come from OWID's cumulative
+    total_cases/total_deaths, since NY Times only covers the United States.
+    
+    Args:
+        owid_df: OWID DataFrame
+        countries: List of OWID country names (default: all locations)
+        start_date: First date of the analysis window
+        end_date: Last date of the analysis window (None = no upper bound)
+        save_path: Optional path to save the panel as a long CSV
+    
+    Returns:
+        Weekly DataFrame indexed by (country, date)
+    """
+    print("=" * 60)
+    print("PROCESSING MULTI-COUNTRY PANEL")
+    print("=" * 60)
+    
+    cols = ['location', 'date', 'total_cases', 'total_deaths',
+            'people_vaccinated_per_hundred', 'people_vaccinated']
+    df = owid_df[[c for c in cols if c in owid_df.columns]]
+    if countries is not None:
+        df = df[df['location'].isin(countries)]
+    df = df.copy()
+    df['date'] = pd.to_datetime(df['date'])
+    df = _filter_window(df, 'date', start_date, end_date)
+    df = df.sort_values(['location', 'date']).drop_duplicates(['location', 'date'])
+    for col in cols[2:]:
+        if col not in df.columns:
+            df[col] = np.nan
+    
+    # Factorize country names once; every grouping below uses the integer codes
+    codes, names = pd.factorize(df['location'], sort=True)
+    df['key'] = codes
+    print(f"\n1. Loaded {len(df):,} daily rows for {len(names):,} countries")
+    
+    # Complete daily grid per country (min..max date), built without a Python loop
+    bounds = df.groupby('key', sort=True)['date'].agg(['min', 'max'])
+    lengths = ((bounds['max'] - bounds['min']).dt.days + 1).to_numpy()
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    grid = pd.DataFrame({
+        'key': np.repeat(bounds.index.to_numpy(), lengths),
+        'date': np.repeat(bounds['min'].to_numpy(), lengths) + pd.to_timedelta(offsets, unit='D')
+    })
+    daily = grid.merge(df.drop(columns='location'), on=['key', 'date'], how='left')
+    print(f"2. Completed daily grid: {len(daily):,} country-days")
+    
+    # Cumulative counts carry across gaps; a gap day then has zero new cases
+    key = daily['key']
+    for cum, new in [('total_cases', 'new_cases'), ('total_deaths', 'new_deaths')]:
+        cumulative = daily[cum].groupby(key, sort=False).ffill().fillna(0)
+        previous = cumulative.groupby(key, sort=False).shift(1).fillna(0)
+        # Ensure non-negative (sometimes data corrections cause negative)
+        daily[new] = (cumulative - previous).clip(lower=0)
+    daily['I'] = (daily['new_cases'] > 0).astype(int)
+    
+    daily['vaccination_rate'] = (daily['people_vaccinated_per_hundred'] / 100.0)
+    for col in FFILL_COLUMNS:
+        daily[col] = daily[col].groupby(key, sort=False).ffill().fillna(0)
+    daily['vaccination_rate'] = daily['vaccination_rate'].clip(0, 1)
+    
+    # Weekly W-SUN bins per country from one sorted pass
+    panel = aggregate(daily, freq='W', date_col='date', group_col='key')
+    panel.index = pd.MultiIndex.from_arrays(
+        [names.take(panel.index.get_level_values('key')), panel.index.get_level_values('date')],
+        names=['country', 'date']
+    )
+    
+    print(f"3. Aggregated to {len(panel):,} country-weeks")
+    
+    if save_path:
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        panel.reset_index().to_csv(save_path, index=False)
+        print(f"\n✓ Saved weekly panel to: {save_path}")
+    
+    return panel
+
+
+def update_weekly_data(weekly_df, nyt_df, owid_df, country="United States",
+                       save_path="data/processed/merged_data_clean_weekly.csv",
+                       start_date=START_DATE, end_date=END_DATE, who_df=None):
+    """
+    Incrementally refresh a weekly dataset with newly arrived dates
+    
+    Only the last stored week (which may have been partial) and the weeks
+    after it are recomputed. The cumulative cases/deaths baseline and the
+    forward-filled vaccination values from the day before are carried in,
+    so the result is identical to a full get_better_covid_data rebuild.
+    
+    Args:
+        weekly_df: Previously computed weekly DataFrame with a 'date' column
+        nyt_df: NY Times DataFrame (full history, cumulative counts)
+        owid_df: OWID DataFrame (for vaccination data)
+        country: Country name (default: United States)
+        save_path: Path to save cleaned data (None to skip saving)
+        start_date: First date of the analysis window
+        end_date: Last date of the analysis window (None = no upper bound)
+        who_df: Optional raw WHO DataFrame, joined in as new_cases_who
+    
+    Returns:
+        Clean weekly DataFrame
+    """
+    if weekly_df is None or len(weekly_df) == 0 or \
+            any(col not in weekly_df.columns for col in SOURCE_CASE_COLUMNS):
+        return get_better_covid_data(nyt_df, owid_df, country=country, save_path=save_path,
+                                     start_date=start_date, end_date=end_date, who_df=who_df)
+    
+    print("=" * 60)
+    print("INCREMENTAL WEEKLY REFRESH")
+    print("=" * 60)
+    
+    weekly_df = weekly_df.copy()
+    weekly_df['date'] = pd.to_datetime(weekly_df['date'])
+    
+    # Recompute from the first day of the last stored week
+    restart = weekly_df['date'].max().normalize() - pd.Timedelta(days=6)
+    
+    nyt_window = _prepare_nyt(nyt_df, start_date, end_date)
+    prior = nyt_window[nyt_window['date'] < restart]
+    if len(prior) == 0:
+        print("   No history before the last stored week, running a full rebuild")
+        return get_better_covid_data(nyt_df, owid_df, country=country, save_path=save_path,
+                                     start_date=start_date, end_date=end_date, who_df=who_df)
+    
+    try:
+        us_owid = _prepare_owid(owid_df, country, start_date, end_date)
+    except Exception as e:
+        print(f"   ⚠ Could not get vaccination data: {e}")
+        us_owid = None
+    
+    carry = _carry_state(prior, us_owid)
+    recent = nyt_window[nyt_window['date'] >= restart]
+    if len(recent) == 0:
+        print("   No new dates to process")
+        return weekly_df
+    
+    recent_owid = us_owid[us_owid['date'] >= restart] if us_owid is not None else None
+    daily = build_daily_data(recent, recent_owid, carry=carry, start=restart)
+    new_weeks = reconcile_sources(aggregate_weekly(daily).reset_index(), who_df, country=country)
+    
+    kept = weekly_df[weekly_df['date'] < restart]
+    updated = pd.concat([kept, new_weeks[kept.columns]], ignore_index=True)
+    
+    print(f"   ✓ Recomputed {len(daily):,} days into {len(new_weeks):,} trailing weeks "
+          f"(kept {len(kept):,} stored weeks)")
+    
+    if save_path:
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        updated.to_csv(save_path, index=False)
+        print(f"✓ Saved clean weekly data to: {save_path}")
+    
+    return updated
+
+
+def process_all_data(owid_df, who_df, nyt_df, country="United States", save_processed=True,
+                     save_columnar=False, incremental=False,
+                     processed_path="data/processed/merged_data_clean_weekly.csv",
+                     save_cube=False, cube_path=DEFAULT_CUBE_PATH, memoize=False,
+                     cache_dir=DEFAULT_STAGE_CACHE_DIR):
     """
     Process all data sources and create clean weekly dataset
-    (All sources aggregated to weekly: OWID and NY Times from daily, WHO was already weekly)
+    (All sources aggregated to weekly: OWID and NY Times from daily, WHO was already weekly
+    and is aligned to the weekly bins with an as-of join)
     
     Args:
         owid_df: OWID DataFrame
@@ -161,27 +499,100 @@ def process_all_data(owid_df, who_df, nyt_df, country="United States", save_proc
         nyt_df: NY Times DataFrame
         country: Country name
         save_processed: Whether to save processed data
+        save_columnar: Also write a typed columnar copy under data/processed/columnar/
+        incremental: Recompute only the trailing weeks of the existing processed file
+                     (the rollup cube has no incremental path: with save_cube it
+                     is still rebuilt from the full daily series)
+        processed_path: Path of the processed weekly CSV
+        save_cube: Also materialize the rollup cube (daily/weekly/monthly/variant)
+        cube_path: Directory of the rollup cube
+        memoize: Reuse the cached output when the inputs, country, date window
+                 and processing code are unchanged
+        cache_dir: Directory of the stage cache
     
     Returns:
-        Clean weekly DataFrame
+        Tuple of (None, None, clean weekly DataFrame). The first two slots are
+        placeholders kept for callers that unpack three values; the reconciled
+        per-source case columns (new_cases_nyt/_owid/_who) are in the weekly frame
     """
     print("=" * 60)
     print("DATA PROCESSING")
     print("=" * 60)
     
+    if memoize:
+        key = stage_key(
+            (owid_df, who_df, nyt_df),
+            country=country, start_date=START_DATE, end_date=END_DATE, save_cube=save_cube,
+            code=code_version(*(sys.modules[name] for name in (__name__, 'aggregate', 'rollup_cube', 'extract_data')))
+        )
+        cached = load_stage('process', key, cache_dir=cache_dir)
+        if cached is not None:
+            print("\n✓ Inputs unchanged, reusing cached processed data")
+            clean_df = cached['weekly']
+            _restore_outputs(clean_df, cached.get('cube'), key, processed_path, cube_path,
+                             save_columnar, cache_dir)
+            return None, None, clean_df
+    
     # Process data from all 3 sources
     print("\nProcessing data from NY Times, OWID, and WHO...")
-    clean_df = get_better_covid_data(nyt_df, owid_df, country=country)
+    if incremental and os.path.exists(processed_path):
+        existing = pd.read_csv(processed_path, parse_dates=['date'], float_precision='round_trip')
+        clean_df = update_weekly_data(existing, nyt_df, owid_df, country=country, save_path=processed_path,
+                                      who_df=who_df)
+        if save_cube:
+            print("  ⚠ The rollup cube is rebuilt in full (no incremental update)")
+            daily = build_daily_data(_prepare_nyt(nyt_df, START_DATE, END_DATE),
+                                     _prepare_owid(owid_df, country, START_DATE, END_DATE))
+            RollupCube.from_daily(daily, country=country).save(cube_path)
+    else:
+        clean_df = get_better_covid_data(nyt_df, owid_df, country=country, save_path=processed_path,
+                                         cube_path=cube_path if save_cube else None, who_df=who_df)
+    
+    if save_columnar:
+        save_source(clean_df, 'weekly', root="data/processed/columnar")
+    
+    if memoize:
+        outputs = {'weekly': clean_df}
+        if save_cube:
+            outputs['cube'] = RollupCube.load(cube_path).table
+        store_stage('process', key, outputs, cache_dir=cache_dir)
+        _mark_outputs(key, cache_dir)
     
     return None, None, clean_df
 
 
+def _mark_outputs(key, cache_dir):
+    """Record which cache key the files under data/processed/ were written from"""
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(os.path.join(cache_dir, 'process.current'), 'w') as f:
+        f.write(key)
+
+
+def _restore_outputs(clean_df, cube_table, key, processed_path, cube_path, save_columnar, cache_dir):
+    """Re-write processed files from a cache hit, unless they already match it"""
+    marker = os.path.join(cache_dir, 'process.current')
+    if os.path.exists(marker) and os.path.exists(processed_path):
+        with open(marker) as f:
+            if f.read().strip() == key:
+                print("✓ Processed files are already current")
+                return
+    os.makedirs(os.path.dirname(processed_path), exist_ok=True)
+    clean_df.to_csv(processed_path, index=False)
+    print(f"✓ Restored clean weekly data to: {processed_path}")
+    if cube_table is not None:
+        RollupCube(cube_table).save(cube_path)
+    if save_columnar:
+        save_source(clean_df, 'weekly', root="data/processed/columnar")
+    _mark_outputs(key, cache_dir)
+
+
 if __name__ == "__main__":
     # Test processing
     import sys
     sys.path.insert(0, os.path.dirname(__file__))
     from extract_data import extract_all_data
     
-    owid_df, who_df = extract_all_data()
-    clean_df = process_all_data(owid_df, who_df)
+    owid_df, who_df, nyt_df, source_urls = extract_all_data()
+    _, _, clean_df = process_all_data(owid_df, who_df, nyt_df)
+    
     print("\n✓ Processing completed successfully!")
@@ -0,0 +1,163 @@
+"""
+Raw Data Cache Module
+Content-addressed local cache for downloaded source files with HTTP revalidation
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime
+
+import requests
+
+
+DEFAULT_CACHE_DIR = "data/raw/.cache"
+
+
+def _url_key(url):
+    """Stable file-name-safe key for a URL"""
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()[:24]
+
+
+def _meta_path(url, cache_dir):
+    return os.path.join(cache_dir, f"{_url_key(url)}.json")
+
+
+def _blob_path(content_hash, cache_dir):
+    return os.path.join(cache_dir, "objects", f"{content_hash}.csv")
+
+
+def load_metadata(url, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Load cached metadata for a URL
+
+    Args:
+        url: Source URL
+        cache_dir: Cache directory
+
+    Returns:
+        Metadata dict (url, sha256, etag, last_modified, size, fetched_at)
+        or None if the URL is not cached
+    """
+    path = _meta_path(url, cache_dir)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        meta = json.load(f)
+    if not os.path.exists(_blob_path(meta["sha256"], cache_dir)):
+        return None
+    return meta
+
+
+def _write_metadata(meta, cache_dir):
+    path = _meta_path(meta["url"], cache_dir)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _blob_in_use(content_hash, cache_dir, exclude_url):
+    """Check whether any other cached URL still points at a blob"""
+    for name in os.listdir(cache_dir):
+        if not name.endswith(".json") or name == os.path.basename(_meta_path(exclude_url, cache_dir)):
+            continue
+        with open(os.path.join(cache_dir, name)) as f:
+            if json.load(f).get("sha256") == content_hash:
+                return True
+    return False
+
+
+def fetch_cached(url, session=None, timeout=30, cache_dir=DEFAULT_CACHE_DIR, offline=False):
+    """
+    Fetch a URL through the local cache
+
+    Sends a conditional GET (If-None-Match / If-Modified-Since) when a cached
+    copy exists, so an unchanged upstream costs a single 304 round trip.
+    New content is streamed to disk, hashed, and stored under its SHA-256.
+
+    Args:
+        url: Source URL
+        session: Optional requests.Session to reuse pooled connections
+        timeout: Request timeout in seconds
+        cache_dir: Cache directory
+        offline: Serve only from the cache, never touch the network
+
+    Returns:
+        Tuple of (blob_path, status) where status is 'downloaded',
+        'not_modified' (304), 'unchanged' (200 with the cached content)
+        or 'offline'
+
+    Raises:
+        FileNotFoundError: In offline mode when the URL has not been cached
+    """
+    meta = load_metadata(url, cache_dir)
+
+    if offline:
+        if meta is None:
+            raise FileNotFoundError(f"Offline mode: no cached copy of {url} in {cache_dir}")
+        return _blob_path(meta["sha256"], cache_dir), "offline"
+
+    os.makedirs(os.path.join(cache_dir, "objects"), exist_ok=True)
+
+    headers = {}
+    if meta is not None:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    http = session if session is not None else requests
+    with http.get(url, headers=headers, timeout=timeout, stream=True) as resp:
+        if resp.status_code == 304 and meta is not None:
+            meta["fetched_at"] = datetime.now().isoformat(timespec="seconds")
+            _write_metadata(meta, cache_dir)
+            return _blob_path(meta["sha256"], cache_dir), "not_modified"
+
+        resp.raise_for_status()
+
+        # Stream to a temp file while hashing, so large files never sit in memory
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.join(cache_dir, "objects"), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in resp.iter_content(chunk_size=1 << 20):
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            content_hash = digest.hexdigest()
+            blob_path = _blob_path(content_hash, cache_dir)
+            if os.path.exists(blob_path):
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, blob_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        new_meta = {
+            "url": url,
+            "sha256": content_hash,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "size": size,
+            "fetched_at": datetime.now().isoformat(timespec="seconds")
+        }
+
+    _write_metadata(new_meta, cache_dir)
+
+    # Servers without validators resend the same bytes; nothing changed
+    if meta is not None and meta["sha256"] == content_hash:
+        return blob_path, "unchanged"
+
+    # Drop the superseded blob unless another URL shares it
+    if meta is not None:
+        if not _blob_in_use(meta["sha256"], cache_dir, exclude_url=url):
+            old_blob = _blob_path(meta["sha256"], cache_dir)
+            if os.path.exists(old_blob):
+                os.remove(old_blob)
+
+    return blob_path, "downloaded"
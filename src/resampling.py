@@ -0,0 +1,411 @@
+"""
+Resampling Module
+Batched bootstrap (i.i.d. and moving-block), permutation tests and
+simulated goodness of fit
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+# Resamples drawn per index matrix; bounds memory at batch_size x n indices
+BATCH_SIZE = 10_000
+
+# Above this many resamples the work is split across a process pool
+PARALLEL_THRESHOLD = 200_000
+
+# Permutations drawn per block in permutation_test
+PERMUTATION_BATCH_SIZE = 2_000
+
+PERMUTATION_STATISTICS = ('pearson', 'proportion_difference')
+
+
+def default_block_size(n):
+    """Moving-block length n^(1/3), the usual rate for variance estimation"""
+    return max(1, int(round(n ** (1 / 3))))
+
+
+def bootstrap_indices(n, n_resamples, block_size=None, rng=None):
+    """
+    Draw all resamples at once as an index matrix
+
+    Args:
+        n: Series length
+        n_resamples: Number of resamples (rows)
+        block_size: None for the i.i.d. bootstrap, otherwise the length of the
+                    overlapping blocks of the moving-block bootstrap
+        rng: numpy Generator (default: a fresh unseeded one)
+
+    Returns:
+        int64 array of shape (n_resamples, n)
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    if block_size is None or block_size <= 1:
+        return rng.integers(0, n, size=(n_resamples, n))
+
+    block_size = min(block_size, n)
+    n_blocks = -(-n // block_size)
+    starts = rng.integers(0, n - block_size + 1, size=(n_resamples, n_blocks))
+    idx = starts[:, :, None] + np.arange(block_size)
+    return idx.reshape(n_resamples, -1)[:, :n]
+
+
+def batched_pearson(x, y):
+    """
+    Pearson r of each row pair of two (B, n) matrices
+
+    Returns:
+        float array of shape (B,), NaN where a resample has zero variance
+    """
+    xc = x - x.mean(axis=1, keepdims=True)
+    yc = y - y.mean(axis=1, keepdims=True)
+    denom = np.sqrt(np.einsum('ij,ij->i', xc, xc) * np.einsum('ij,ij->i', yc, yc))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.einsum('ij,ij->i', xc, yc) / denom
+
+
+def batched_proportion_difference(outcome, in_group):
+    """
+    P(outcome | in_group) - P(outcome | not in_group) for each row of two (B, n) matrices
+
+    Returns:
+        float array of shape (B,), NaN where a resample misses either group
+    """
+    in_group = in_group.astype(bool)
+    n_in = in_group.sum(axis=1)
+    n_out = in_group.shape[1] - n_in
+    x_in = np.where(in_group, outcome, 0).sum(axis=1)
+    x_out = outcome.sum(axis=1) - x_in
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(n_in > 0, x_in / n_in, np.nan) - np.where(n_out > 0, x_out / n_out, np.nan)
+
+
+def _bootstrap_batch(statistic, arrays, n_resamples, block_size, seed):
+    """Statistic values for one batch of resamples (also the process-pool task)"""
+    rng = np.random.default_rng(seed)
+    idx = bootstrap_indices(len(arrays[0]), n_resamples, block_size, rng)
+    return statistic(*(a[idx] for a in arrays))
+
+
+def bootstrap(statistic, arrays, n_resamples=10_000, block_size=None, confidence=0.95, seed=None,
+              n_jobs=None, batch_size=BATCH_SIZE):
+    """
+    Bootstrap distribution and percentile interval of a batched statistic
+
+    Each batch of resamples is one (batch, n) index matrix; every input array
+    is gathered through it and the statistic is evaluated on whole matrices.
+    Batches are seeded from one SeedSequence, so results depend on the seed
+    and batch_size but not on n_jobs.
+
+    Args:
+        statistic: Function taking one (B, n) matrix per input array and
+                   returning B values (e.g. batched_pearson); must be a
+                   module-level function to run in a process pool
+        arrays: Sequence of equal-length 1-D arrays
+        n_resamples: Number of bootstrap resamples
+        block_size: None for the i.i.d. bootstrap, otherwise the moving-block length
+        confidence: Confidence level of the percentile interval
+        seed: Seed for reproducible resamples
+        n_jobs: Worker processes (default: one per CPU when n_resamples exceeds
+                PARALLEL_THRESHOLD, else 1)
+        batch_size: Resamples per index matrix
+
+    Returns:
+        Dictionary with estimate, standard error, percentile interval,
+        two-sided bootstrap p-value for 0, and the resampled values
+    """
+    arrays = [np.asarray(a, dtype=float) for a in arrays]
+    n = len(arrays[0])
+    if any(len(a) != n for a in arrays):
+        raise ValueError("All arrays must have the same length")
+
+    sizes = [batch_size] * (n_resamples // batch_size)
+    if n_resamples % batch_size:
+        sizes.append(n_resamples % batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    if n_jobs is None:
+        n_jobs = (os.cpu_count() or 1) if n_resamples > PARALLEL_THRESHOLD else 1
+    n_jobs = min(n_jobs, len(sizes))
+
+    if n_jobs > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            parts = list(executor.map(_bootstrap_batch, [statistic] * len(sizes), [arrays] * len(sizes),
+                                      sizes, [block_size] * len(sizes), seeds))
+    else:
+        parts = [_bootstrap_batch(statistic, arrays, size, block_size, s) for size, s in zip(sizes, seeds)]
+    values = np.concatenate(parts)
+
+    estimate = float(statistic(*(a[None, :] for a in arrays))[0])
+    finite = values[np.isfinite(values)]
+    alpha = 1 - confidence
+    ci_low, ci_high = np.quantile(finite, [alpha / 2, 1 - alpha / 2]) if len(finite) else (np.nan, np.nan)
+    p_value = min(1.0, 2 * min((finite <= 0).mean(), (finite >= 0).mean())) if len(finite) else np.nan
+
+    return {
+        "method": "moving-block" if block_size and block_size > 1 else "iid",
+        "block_size": int(block_size) if block_size and block_size > 1 else 1,
+        "n_resamples": n_resamples,
+        "n_valid": int(len(finite)),
+        "confidence": confidence,
+        "estimate": estimate,
+        "std_error": float(finite.std(ddof=1)) if len(finite) > 1 else np.nan,
+        "ci_low": float(ci_low),
+        "ci_high": float(ci_high),
+        "p_value": float(p_value),
+        "values": values
+    }
+
+
+def _dot_statistic(statistic, x, y):
+    """
+    Write a statistic as permuted_values @ weights
+
+    pearson: r = z(y_perm) . z(x) / n with z-scored vectors.
+    proportion_difference: with x the group indicator and y the outcome,
+    P(y | x) - P(y | not x) = y_perm . (x / n_x - (1 - x) / n_not_x).
+
+    Returns:
+        Tuple of (values to permute, fixed weights)
+    """
+    if statistic == 'pearson':
+        x_std = (x - x.mean()) / x.std()
+        y_std = (y - y.mean()) / y.std()
+        return y_std, x_std / len(x)
+    if statistic == 'proportion_difference':
+        in_group = x.astype(bool)
+        n_in = in_group.sum()
+        n_out = len(x) - n_in
+        if n_in == 0 or n_out == 0:
+            raise ValueError("Both groups need at least one observation")
+        return y, np.where(in_group, 1.0 / n_in, -1.0 / n_out)
+    raise ValueError(f"Unsupported statistic '{statistic}', expected one of {PERMUTATION_STATISTICS}")
+
+
+def _permutation_batch(values, weights, n_permutations, seed):
+    """Statistics of one block of permutations (also the process-pool task)"""
+    rng = np.random.default_rng(seed)
+    permuted = rng.permuted(np.broadcast_to(values, (n_permutations, len(values))), axis=1)
+    return permuted @ weights
+
+
+def permutation_test(x, y, statistic='pearson', alternative='two-sided', max_permutations=100_000,
+                     tolerance=0.001, min_permutations=2_000, batch_size=PERMUTATION_BATCH_SIZE,
+                     seed=None, n_jobs=1):
+    """
+    Monte Carlo permutation test of association between x and y
+
+    y is permuted relative to x. Permutations are drawn in blocks of
+    batch_size rows, and each block's statistics are one matrix-vector
+    product (see _dot_statistic), so memory stays at batch_size x n. After
+    each block the Monte Carlo standard error of the p-value,
+    sqrt(p (1 - p) / m), is checked and sampling stops once it is below
+    tolerance. With n_jobs > 1, rounds of n_jobs blocks run in a process
+    pool; blocks are still consumed in order, so the result does not depend
+    on n_jobs.
+
+    Args:
+        x: 1-D array (for 'proportion_difference': the 0/1 group indicator)
+        y: 1-D array (for 'proportion_difference': the 0/1 outcome)
+        statistic: 'pearson' or 'proportion_difference'
+        alternative: 'two-sided', 'greater' or 'less'
+        max_permutations: Upper bound on the number of permutations
+        tolerance: Target Monte Carlo standard error of the p-value
+        min_permutations: Permutations drawn before early stopping is allowed
+        batch_size: Permutations per block
+        seed: Seed for reproducible permutations
+        n_jobs: Worker processes
+
+    Returns:
+        Dictionary with the observed statistic, permutation p-value, its
+        Monte Carlo standard error and the number of permutations used;
+        the statistic and p-value are NaN when x or y is constant
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if len(x) != len(y):
+        raise ValueError("x and y must have the same length")
+    if alternative not in ('two-sided', 'greater', 'less'):
+        raise ValueError(f"Unsupported alternative '{alternative}'")
+
+    if statistic not in PERMUTATION_STATISTICS:
+        raise ValueError(f"Unsupported statistic '{statistic}', expected one of {PERMUTATION_STATISTICS}")
+
+    if len(x) == 0 or x.std() == 0 or y.std() == 0:
+        # A constant input has no defined correlation (or an empty group), so there is nothing to test
+        return {
+            "statistic": statistic,
+            "alternative": alternative,
+            "observed": np.nan,
+            "p_value": np.nan,
+            "mc_std_error": np.nan,
+            "n_permutations": 0,
+            "stopped_early": False
+        }
+
+    values, weights = _dot_statistic(statistic, x, y)
+    observed = float(values @ weights)
+    # Ties within floating-point noise count as at least as extreme
+    slack = 1e-12 * max(1.0, abs(observed))
+
+    def n_extreme(stats):
+        if alternative == 'greater':
+            return int((stats >= observed - slack).sum())
+        if alternative == 'less':
+            return int((stats <= observed + slack).sum())
+        return int((np.abs(stats) >= abs(observed) - slack).sum())
+
+    n_batches = -(-max_permutations // batch_size)
+    sizes = [batch_size] * n_batches
+    sizes[-1] = max_permutations - batch_size * (n_batches - 1)
+    seeds = np.random.SeedSequence(seed).spawn(n_batches)
+
+    executor = ProcessPoolExecutor(max_workers=n_jobs) if n_jobs > 1 else None
+    count = done = 0
+    mc_error = np.inf
+    try:
+        for round_start in range(0, n_batches, max(n_jobs, 1)):
+            batch_ids = range(round_start, min(round_start + max(n_jobs, 1), n_batches))
+            if executor is not None:
+                parts = list(executor.map(_permutation_batch, [values] * len(batch_ids), [weights] * len(batch_ids),
+                                          [sizes[i] for i in batch_ids], [seeds[i] for i in batch_ids]))
+            else:
+                parts = [_permutation_batch(values, weights, sizes[i], seeds[i]) for i in batch_ids]
+
+            for stats in parts:
+                count += n_extreme(stats)
+                done += len(stats)
+                p_value = (count + 1) / (done + 1)
+                mc_error = np.sqrt(p_value * (1 - p_value) / done)
+                if done >= min_permutations and mc_error < tolerance:
+                    break
+            else:
+                continue
+            break
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return {
+        "statistic": statistic,
+        "alternative": alternative,
+        "observed": observed,
+        "p_value": (count + 1) / (done + 1),
+        "mc_std_error": float(mc_error),
+        "n_permutations": done,
+        "stopped_early": done < max_permutations
+    }
+
+
+GOODNESS_OF_FIT_MODELS = ('binomial', 'beta_binomial')
+
+
+def _dispersion_statistics(counts, trials):
+    """
+    Sample variance of the period counts and the Pearson dispersion
+    sum((x - n p)^2 / (n p (1 - p))) / (m - 1), with p = sum(x) / sum(n)
+    refitted on each row of a (B, m) count matrix
+
+    Returns:
+        Tuple of two float arrays of shape (B,); dispersion is NaN where p is 0 or 1
+    """
+    p = counts.sum(axis=1) / trials.sum()
+    variance = counts.var(axis=1, ddof=1)
+    residual = ((counts - trials * p[:, None]) ** 2 / trials).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        dispersion = residual / (p * (1 - p) * (counts.shape[1] - 1))
+    return variance, dispersion
+
+
+def _goodness_of_fit_batch(trials, p, rho, n_simulations, seed):
+    """Variance and dispersion statistics of one batch of simulated count series"""
+    rng = np.random.default_rng(seed)
+    shape = (n_simulations, len(trials))
+    if rho > 0:
+        # Beta-binomial: one success probability per period, then the binomial draw
+        scale = 1 / rho - 1
+        p = rng.beta(p * scale, (1 - p) * scale, size=shape)
+    counts = rng.binomial(trials, p, size=shape)
+    return _dispersion_statistics(counts, trials.astype(float))
+
+
+def binomial_goodness_of_fit(counts, trials, n_simulations=100_000, seed=None, batch_size=BATCH_SIZE):
+    """
+    Parametric-bootstrap goodness of fit of Binomial and beta-binomial models
+    for per-period infection counts with unequal numbers of trials
+
+    Both models share p = sum(x) / sum(n). The beta-binomial intra-period
+    correlation rho comes from the moment equation
+    sum((x - n p)^2) = p (1 - p) sum(n (1 + (n - 1) rho)), clipped to [0, 1).
+    Each batch of series is drawn in one rng.binomial call shaped
+    (simulations, periods), p is refitted on every simulated series, and the
+    observed variance and dispersion are ranked against the simulated ones.
+    P-values are two-sided, 2 min(P(T >= t), P(T <= t)) with the usual +1
+    correction, so both over- and underdispersion count against a model.
+
+    Args:
+        counts: Observed infection count per period
+        trials: Number of trials per period (e.g. from aggregate.calendar_trials)
+        n_simulations: Simulated series per model
+        seed: Seed for reproducible simulations
+        batch_size: Simulated series per batch; bounds memory at batch_size x periods
+
+    Returns:
+        Dictionary with p, rho, the observed statistics and, per model, the
+        mean simulated statistics and their p-values
+    """
+    counts = np.asarray(counts, dtype=float)
+    trials = np.asarray(trials, dtype=np.int64)
+    if counts.shape != trials.shape:
+        raise ValueError("counts and trials must have the same length")
+    if (counts > trials).any() or (counts < 0).any():
+        raise ValueError("counts must lie between 0 and the number of trials")
+
+    p = counts.sum() / trials.sum()
+    variance, dispersion = (float(s[0]) for s in _dispersion_statistics(counts[None, :], trials.astype(float)))
+    pairs = (trials * (trials - 1)).sum()
+    if 0 < p < 1 and pairs > 0:
+        rho = ((((counts - trials * p) ** 2).sum() / (p * (1 - p)) - trials.sum()) / pairs)
+        rho = float(np.clip(rho, 0.0, 0.999))
+    else:
+        rho = 0.0
+
+    results = {
+        "p": float(p),
+        "rho": rho,
+        "n_periods": len(counts),
+        "n_simulations": n_simulations,
+        "observed_variance": variance,
+        "observed_dispersion": dispersion
+    }
+
+    n_batches = -(-n_simulations // batch_size)
+    sizes = [batch_size] * n_batches
+    sizes[-1] = n_simulations - batch_size * (n_batches - 1)
+    for model, seeds in zip(GOODNESS_OF_FIT_MODELS, np.random.SeedSequence(seed).spawn(2)):
+        model_rho = rho if model == 'beta_binomial' else 0.0
+        observed = np.array([variance, dispersion])
+        above, below, total, finite = np.zeros(2), np.zeros(2), np.zeros(2), np.zeros(2)
+        for size, batch_seed in zip(sizes, seeds.spawn(n_batches)):
+            simulated = np.vstack(_goodness_of_fit_batch(trials, p, model_rho, size, batch_seed))
+            # Ties within floating-point noise count as at least as extreme
+            slack = 1e-12 * np.maximum(1.0, np.abs(observed))[:, None]
+            above += (simulated >= observed[:, None] - slack).sum(axis=1)
+            below += (simulated <= observed[:, None] + slack).sum(axis=1)
+            total += np.nansum(simulated, axis=1)
+            finite += (~np.isnan(simulated)).sum(axis=1)
+
+        with np.errstate(invalid='ignore'):
+            p_values = np.minimum(1.0, 2 * np.minimum(above + 1, below + 1) / (finite + 1))
+            expected = total / finite
+        p_values = np.where(np.isnan(observed), np.nan, p_values)
+        results[model] = {
+            "rho": model_rho,
+            "expected_variance": float(expected[0]),
+            "expected_dispersion": float(expected[1]),
+            "variance_p_value": float(p_values[0]),
+            "dispersion_p_value": float(p_values[1])
+        }
+    return results
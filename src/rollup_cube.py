@@ -0,0 +1,166 @@
+"""
+Rollup Cube Module
+Pre-computed daily/weekly/monthly/variant-period rollups indexed by
+(country, frequency, period)
+"""
+
+import numpy as np
+import pandas as pd
+
+from aggregate import VARIANT_PERIODS, aggregate, aggregate_frequencies, aggregate_periods
+from columnar_store import read_columnar, write_columnar
+
+
+DEFAULT_CUBE_PATH = "data/processed/cube"
+
+# Calendar levels of the cube; 'variant' holds the named variant periods
+CUBE_FREQUENCIES = ('D', 'W', 'M')
+
+CUBE_REDUCERS = {
+    'new_cases': ('new_cases', 'sum'),
+    'new_cases_owid': ('new_cases_owid', 'sum'),
+    'new_deaths': ('new_deaths', 'sum'),
+    'I': ('I', 'any'),  # 1 if any infection in the period
+    'infected_days': ('I', 'sum'),
+    'n_days': ('I', 'count'),
+    'vaccination_rate': ('vaccination_rate', 'mean'),
+    'people_vaccinated': ('people_vaccinated', 'mean'),
+    'people_vaccinated_per_hundred': ('people_vaccinated_per_hundred', 'mean')
+}
+
+
+class RollupCube:
+    """
+    Pre-aggregated rollups of the daily series
+
+    Rows are stored sorted by (country, frequency, date), so each
+    (country, frequency) slice is a contiguous row range found with one
+    dictionary lookup. 'infected_weeks' counts the weeks (W-SUN, by week-end
+    date) with any infection in each period, which is what the weekly
+    analysis frame yields when resampled.
+    """
+
+    def __init__(self, table):
+        table = table.sort_values(['country', 'frequency', 'date'], kind='stable').reset_index(drop=True)
+        self.table = table
+
+        country = table['country'].to_numpy()
+        frequency = table['frequency'].to_numpy()
+        boundary = np.ones(len(table), dtype=bool)
+        boundary[1:] = (country[1:] != country[:-1]) | (frequency[1:] != frequency[:-1])
+        starts = np.flatnonzero(boundary)
+        stops = np.append(starts[1:], len(table))
+        self._offsets = {(country[s], frequency[s]): (s, e) for s, e in zip(starts, stops)}
+        self._slices = {}
+
+    @classmethod
+    def from_daily(cls, daily, country=None, date_col=None, group_col=None, periods=VARIANT_PERIODS):
+        """
+        Build the cube from a daily series
+
+        Args:
+            daily: Daily DataFrame (e.g. from build_daily_data), with a
+                   DatetimeIndex or a date column
+            country: Country name for a single-country frame
+            date_col: Date column name (default: use the index)
+            group_col: Country column of a multi-country frame
+            periods: List of (name, start_date) variant periods
+
+        Returns:
+            RollupCube
+        """
+        daily = daily.reset_index() if date_col is None else daily
+        date_col = date_col or 'date'
+        if group_col is None:
+            daily = daily.assign(country=country)
+            group_col = 'country'
+        reducers = {out: spec for out, spec in CUBE_REDUCERS.items() if spec[0] in daily.columns}
+
+        levels = aggregate_frequencies(daily, CUBE_FREQUENCIES, reducers, date_col=date_col, group_col=group_col)
+        weekly = levels['W'][['I']].reset_index()
+        weekly_reducers = {'infected_weeks': ('I', 'sum')}
+
+        frames = []
+        for freq, level in levels.items():
+            if freq == 'W':
+                level = level.assign(infected_weeks=level['I'])
+            elif freq == 'M':
+                weeks = aggregate(weekly, 'M', weekly_reducers, date_col='date', group_col=group_col)
+                level = level.join(weeks, how='outer')
+                level['infected_weeks'] = level['infected_weeks'].fillna(0)
+            else:
+                level = level.assign(infected_weeks=np.nan)
+            level = level.reset_index().rename(columns={group_col: 'country'})
+            level['frequency'] = freq
+            level['period'] = level['date'].dt.strftime('%Y-%m-%d')
+            frames.append(level)
+
+        variant = aggregate_periods(daily, periods, reducers, date_col=date_col, group_col=group_col)
+        weeks = aggregate_periods(weekly, periods, weekly_reducers, date_col='date', group_col=group_col)
+        variant = variant.join(weeks[['infected_weeks']], how='left')
+        variant = variant.reset_index().rename(columns={group_col: 'country', 'end': 'date'})
+        variant = variant.drop(columns=['start'])
+        variant['frequency'] = 'variant'
+        frames.append(variant)
+
+        table = pd.concat(frames, ignore_index=True)
+        columns = ['country', 'frequency', 'period', 'date'] + \
+            [c for c in table.columns if c not in ('country', 'frequency', 'period', 'date')]
+        return cls(table[columns])
+
+    def slice(self, country, frequency):
+        """
+        Pre-aggregated series for one country and frequency
+
+        Args:
+            country: Country name
+            frequency: 'D', 'W', 'M' or 'variant'
+
+        Returns:
+            DataFrame indexed by period end date ('variant': by period name)
+        """
+        key = (country, frequency)
+        if key not in self._slices:
+            if key not in self._offsets:
+                raise KeyError(f"No rollup for country '{country}' at frequency '{frequency}'")
+            start, stop = self._offsets[key]
+            part = self.table.iloc[start:stop].drop(columns=['country', 'frequency'])
+            if frequency == 'variant':
+                part = part.set_index('period')
+            else:
+                part = part.drop(columns=['period']).set_index('date')
+            self._slices[key] = part
+        return self._slices[key]
+
+    def get(self, country, frequency, period):
+        """
+        A single pre-aggregated cell
+
+        Args:
+            country: Country name
+            frequency: 'D', 'W', 'M' or 'variant'
+            period: Period end date (or variant name for 'variant')
+
+        Returns:
+            Series of metrics for that period
+        """
+        part = self.slice(country, frequency)
+        return part.loc[period if frequency == 'variant' else pd.Timestamp(period)]
+
+    @property
+    def countries(self):
+        return sorted({country for country, _ in self._offsets})
+
+    def save(self, path=DEFAULT_CUBE_PATH):
+        """Write the cube to a columnar store directory"""
+        write_columnar(self.table, path)
+        print(f"✓ Saved rollup cube ({len(self.table):,} rows) to: {path}")
+        return path
+
+    @classmethod
+    def load(cls, path=DEFAULT_CUBE_PATH):
+        """Load a cube written by save()"""
+        table = read_columnar(path)
+        for col in ('country', 'frequency', 'period'):
+            table[col] = table[col].astype(str)
+        return cls(table)
@@ -0,0 +1,191 @@
+"""
+Sensitivity Analysis Module
+Re-runs the core tests over a grid of analysis choices (threshold, lag,
+frequency, date window) on a process pool sharing one memory-mapped copy of
+the weekly data
+"""
+
+import itertools
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from aggregate import aggregate
+from analyze import grouped_statistics
+from columnar_store import read_columnar, write_columnar
+from process_data import END_DATE, START_DATE
+
+
+DEFAULT_STORE_DIR = "data/processed/columnar/weekly"
+DEFAULT_RESULTS_PATH = "results/sensitivity_results.csv"
+
+SENSITIVITY_COLUMNS = ['date', 'I', 'vaccination_rate', 'new_cases']
+
+# Weekly rows rolled up to coarser frequencies
+FREQUENCY_REDUCERS = {
+    'I': 'any',
+    'vaccination_rate': 'mean',
+    'new_cases': 'sum'
+}
+
+DEFAULT_GRID = {
+    'threshold': [round(t, 2) for t in np.arange(0.05, 0.951, 0.05)],
+    'lag': list(range(0, 13)),
+    'frequency': ['W', 'M'],
+    'window': [(START_DATE, END_DATE), ('2021-01-01', END_DATE), ('2021-01-01', '2021-12-31'),
+               ('2022-01-01', END_DATE)]
+}
+
+RESULT_COLUMNS = ['n', 'p_I', 'p_V', 'p_I_high', 'p_I_low', 'difference', 'n_high', 'n_low',
+                  'z_statistic', 'z_p_value', 'correlation_coefficient', 't_statistic', 'p_value']
+
+# Grid points sent to a worker per task
+CHUNK_SIZE = 500
+
+# Weekly data memory-mapped by each worker (set by _init_worker)
+_WEEKLY = None
+_FRAMES = {}
+
+
+def expand_grid(grid=None):
+    """
+    Cartesian product of the grid values
+
+    Args:
+        grid: Dict with 'threshold', 'lag', 'frequency' and 'window'
+              ((start, end) date pairs) lists (default: DEFAULT_GRID)
+
+    Returns:
+        DataFrame with one row per grid point
+    """
+    grid = {**DEFAULT_GRID, **(grid or {})}
+    points = list(itertools.product(grid['threshold'], grid['lag'], grid['frequency'], grid['window']))
+    return pd.DataFrame({
+        'threshold': np.array([p[0] for p in points], dtype=float),
+        'lag': np.array([p[1] for p in points], dtype=np.int16),
+        'frequency': pd.Categorical([p[2] for p in points]),
+        'start': pd.to_datetime([p[3][0] for p in points]),
+        'end': pd.to_datetime([p[3][1] for p in points])
+    })
+
+
+def _init_worker(store_dir):
+    """Memory-map the shared weekly columns once per worker process"""
+    global _WEEKLY
+    _WEEKLY = read_columnar(store_dir, columns=SENSITIVITY_COLUMNS, mmap=True)
+    _FRAMES.clear()
+
+
+def _frame(frequency, start, end):
+    """
+    Windowed series at one frequency, cached per worker
+
+    Weeks are labelled by their last day (W-SUN), so a week is kept when it
+    overlaps the window: it ends on or after start and begins (six days
+    before its label) on or before end. This matches the pipeline, which
+    filters the daily data to the window before aggregating.
+    """
+    key = (frequency, start, end)
+    if key not in _FRAMES:
+        dates = _WEEKLY['date'].to_numpy()
+        lo = np.searchsorted(dates, np.datetime64(start), side='left')
+        hi = np.searchsorted(dates, np.datetime64(end) + np.timedelta64(6, 'D'), side='right')
+        window = _WEEKLY.iloc[lo:hi].set_index('date')
+        if frequency != 'W' and len(window):
+            window = aggregate(window, frequency, FREQUENCY_REDUCERS)
+        _FRAMES[key] = tuple(window[col].to_numpy(dtype=float) for col in ('I', 'vaccination_rate', 'new_cases'))
+    return _FRAMES[key]
+
+
+def _run_chunk(points):
+    """Statistics for a list of (threshold, lag, frequency, start, end) points (the pool task)"""
+    out = np.full((len(points), len(RESULT_COLUMNS)), np.nan)
+    for i, (threshold, lag, frequency, start, end) in enumerate(points):
+        infection, vaccination, cases = _frame(frequency, start, end)
+        # Vaccination in period t against the outcome in period t + lag
+        n = len(vaccination) - lag
+        if n < 3:
+            continue
+        stats = grouped_statistics(infection[lag:], vaccination[:n], cases[lag:],
+                                    np.zeros(n, dtype=np.int64), 1, threshold)
+        stats['n'] = stats['sample_size']
+        out[i] = [stats[col][0] for col in RESULT_COLUMNS]
+    return out
+
+
+def run_sensitivity(df=None, grid=None, store_dir=DEFAULT_STORE_DIR, n_jobs=None, chunk_size=CHUNK_SIZE,
+                    save_path=DEFAULT_RESULTS_PATH):
+    """
+    Run the correlation and proportion tests at every point of a parameter grid
+
+    Only the analysis stage runs per point. Workers memory-map the weekly
+    columns from a columnar store (the pipeline's own copy, or a scratch
+    copy of df), so tasks carry only their grid points; each worker caches
+    the windowed and re-aggregated series it has built.
+
+    Args:
+        df: Optional weekly DataFrame (date index or 'date' column); default:
+            the columnar copy the pipeline saved under store_dir
+        grid: Parameter grid (see expand_grid)
+        store_dir: Columnar store with the weekly data
+        n_jobs: Worker processes (default: one per CPU; 1 runs in-process)
+        chunk_size: Grid points per task
+        save_path: CSV path for the results table (None to skip saving)
+
+    Returns:
+        DataFrame with one row per grid point: the parameters and the test results
+    """
+    print("=" * 60)
+    print("SENSITIVITY ANALYSIS")
+    print("=" * 60)
+
+    scratch = None
+    if df is not None:
+        weekly = df.reset_index() if 'date' not in df.columns else df
+        scratch = tempfile.mkdtemp(prefix="sensitivity_")
+        write_columnar(weekly[SENSITIVITY_COLUMNS].sort_values('date'), scratch)
+        store_dir = scratch
+
+    points = expand_grid(grid)
+    records = list(zip(points['threshold'], points['lag'].astype(int), points['frequency'].astype(str),
+                       points['start'].to_numpy(), points['end'].to_numpy()))
+    chunks = [records[i:i + chunk_size] for i in range(0, len(records), chunk_size)]
+    n_jobs = min(n_jobs or os.cpu_count() or 1, max(len(chunks), 1))
+    print(f"\nEvaluating {len(points):,} grid points in {len(chunks):,} tasks on {n_jobs} process(es)...")
+
+    try:
+        if n_jobs > 1:
+            with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                     initargs=(store_dir,)) as executor:
+                parts = list(executor.map(_run_chunk, chunks))
+        else:
+            _init_worker(store_dir)
+            parts = [_run_chunk(chunk) for chunk in chunks]
+    finally:
+        if scratch:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    values = np.concatenate(parts) if parts else np.empty((0, len(RESULT_COLUMNS)))
+    results = pd.concat([points, pd.DataFrame(values, columns=RESULT_COLUMNS)], axis=1)
+    for col in ('n', 'n_high', 'n_low'):
+        results[col] = results[col].fillna(0).astype(np.int32)
+    results['significant'] = results['p_value'] < 0.05
+
+    r = results['correlation_coefficient']
+    print(f"✓ Correlation r ranges from {r.min():.4f} to {r.max():.4f}; "
+          f"significant at {results['significant'].mean():.1%} of grid points")
+
+    if save_path:
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        results.to_csv(save_path, index=False)
+        print(f"✓ Saved sensitivity results to: {save_path}")
+
+    return results
+
+
+if __name__ == "__main__":
+    run_sensitivity()
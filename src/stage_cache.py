@@ -0,0 +1,233 @@
+"""
+Stage Cache Module
+Memoizes pipeline stage outputs on disk, keyed by fingerprints of their inputs
+
+Usage:
+    python src/stage_cache.py invalidate [stage]
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+import pandas as pd
+
+from columnar_store import read_columnar, write_columnar
+
+
+DEFAULT_STAGE_CACHE_DIR = "data/processed/.stage_cache"
+
+# Default size bounds; least recently used entries are evicted first
+MAX_ENTRIES = 8
+MAX_BYTES = 512 * 1024 * 1024
+
+META_FILE = "_entry.json"
+
+
+def fingerprint_frame(df):
+    """
+    Content hash of a DataFrame (values, index, column names and dtypes)
+
+    Args:
+        df: DataFrame or None
+
+    Returns:
+        Hex digest string
+    """
+    digest = hashlib.sha256()
+    if df is None:
+        digest.update(b"None")
+        return digest.hexdigest()
+    digest.update(json.dumps([str(c) for c in df.columns]).encode())
+    digest.update(json.dumps([str(t) for t in df.dtypes]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def fingerprint_file(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def code_version(*modules):
+    """
+    Hash of the source files of the given modules, so edits to the stage
+    code invalidate its cached outputs
+
+    Args:
+        modules: Imported module objects
+
+    Returns:
+        Hex digest string
+    """
+    digest = hashlib.sha256()
+    for module in modules:
+        digest.update(fingerprint_file(module.__file__).encode())
+    return digest.hexdigest()
+
+
+def stage_key(frames=(), **params):
+    """
+    Combine input fingerprints into one cache key
+
+    Args:
+        frames: Iterable of input DataFrames (None allowed)
+        params: Other inputs (country, date window, code version, ...)
+
+    Returns:
+        Hex digest string
+    """
+    digest = hashlib.sha256()
+    for df in frames:
+        digest.update(fingerprint_frame(df).encode())
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def _entry_dir(stage, key, cache_dir):
+    return os.path.join(cache_dir, f"{stage}-{key[:32]}")
+
+
+def _dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(path) for name in names)
+
+
+def load_stage(stage, key, cache_dir=DEFAULT_STAGE_CACHE_DIR):
+    """
+    Load the cached outputs of a stage
+
+    Args:
+        stage: Stage name
+        key: Cache key from stage_key
+        cache_dir: Cache directory
+
+    Returns:
+        Dict mapping output name to DataFrame, or None on a miss
+    """
+    entry = _entry_dir(stage, key, cache_dir)
+    meta_path = os.path.join(entry, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if meta.get("key") != key:
+        return None
+
+    outputs = {}
+    for name, info in meta["outputs"].items():
+        df = read_columnar(os.path.join(entry, name), mmap=False)
+        if info.get("index"):
+            df = df.set_index(info["index"])
+        outputs[name] = df
+
+    # Record the hit for least-recently-used eviction
+    meta["last_used"] = time.time()
+    with open(meta_path, "w") as f:
+        json.dump(meta, f, indent=2)
+
+    return outputs
+
+
+def store_stage(stage, key, outputs, cache_dir=DEFAULT_STAGE_CACHE_DIR,
+                max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+    """
+    Store the outputs of a stage and evict old entries beyond the size bounds
+
+    Args:
+        stage: Stage name
+        key: Cache key from stage_key
+        outputs: Dict mapping output name to DataFrame
+        cache_dir: Cache directory
+        max_entries: Maximum number of cached entries across all stages
+        max_bytes: Maximum total size of the cache in bytes
+    """
+    entry = _entry_dir(stage, key, cache_dir)
+    tmp_entry = entry + ".tmp"
+    if os.path.exists(tmp_entry):
+        shutil.rmtree(tmp_entry)
+    os.makedirs(tmp_entry)
+
+    meta = {"stage": stage, "key": key, "created": time.time(), "last_used": time.time(), "outputs": {}}
+    for name, df in outputs.items():
+        index_names = [n for n in df.index.names if n is not None]
+        write_columnar(df.reset_index() if index_names else df, os.path.join(tmp_entry, name))
+        meta["outputs"][name] = {"index": index_names}
+    with open(os.path.join(tmp_entry, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    if os.path.exists(entry):
+        shutil.rmtree(entry)
+    os.replace(tmp_entry, entry)
+
+    evict(cache_dir, max_entries=max_entries, max_bytes=max_bytes)
+
+
+def _entries(cache_dir):
+    """Cached entries as (last_used, path, size), oldest first"""
+    if not os.path.isdir(cache_dir):
+        return []
+    entries = []
+    for name in os.listdir(cache_dir):
+        meta_path = os.path.join(cache_dir, name, META_FILE)
+        if not os.path.exists(meta_path):
+            continue
+        with open(meta_path) as f:
+            meta = json.load(f)
+        path = os.path.join(cache_dir, name)
+        entries.append((meta.get("last_used", 0), path, _dir_size(path)))
+    return sorted(entries)
+
+
+def evict(cache_dir=DEFAULT_STAGE_CACHE_DIR, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+    """
+    Remove least recently used entries until the cache fits its bounds
+
+    Returns:
+        Number of entries removed
+    """
+    entries = _entries(cache_dir)
+    total = sum(size for _, _, size in entries)
+    removed = 0
+    while entries and (len(entries) > max_entries or total > max_bytes):
+        _, path, size = entries.pop(0)
+        shutil.rmtree(path)
+        total -= size
+        removed += 1
+    return removed
+
+
+def invalidate(stage=None, cache_dir=DEFAULT_STAGE_CACHE_DIR):
+    """
+    Drop cached entries
+
+    Args:
+        stage: Only drop entries of this stage (default: all)
+        cache_dir: Cache directory
+
+    Returns:
+        Number of entries removed
+    """
+    removed = 0
+    for _, path, _ in _entries(cache_dir):
+        if stage is None or os.path.basename(path).startswith(f"{stage}-"):
+            shutil.rmtree(path)
+            removed += 1
+    return removed
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "invalidate":
+        target = sys.argv[2] if len(sys.argv) > 2 else None
+        count = invalidate(target)
+        print(f"✓ Removed {count} cached stage entr{'y' if count == 1 else 'ies'}"
+              f"{f' for stage {target}' if target else ''}")
+    else:
+        print(__doc__.strip())
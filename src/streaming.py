@@ -0,0 +1,279 @@
+"""
+Streaming Statistics Module
+Mergeable single-pass accumulator for the core analysis statistics
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+
+def _moments(x, y=None):
+    """Count, means, second moments and co-moment of one chunk (complete pairs only)"""
+    if y is None:
+        n = len(x)
+        mean = x.mean() if n else 0.0
+        return n, mean, ((x - mean) ** 2).sum() if n else 0.0
+    n = len(x)
+    if n == 0:
+        return 0, 0.0, 0.0, 0.0, 0.0, 0.0
+    mean_x, mean_y = x.mean(), y.mean()
+    dx, dy = x - mean_x, y - mean_y
+    return n, mean_x, mean_y, (dx * dx).sum(), (dy * dy).sum(), (dx * dy).sum()
+
+
+def _merge_moments(a, b):
+    """
+    Combine (n, mean, M2) of two partitions (Chan et al.):
+    M2 = M2_a + M2_b + delta^2 * n_a * n_b / n
+    """
+    n_a, mean_a, m2_a = a
+    n_b, mean_b, m2_b = b
+    n = n_a + n_b
+    if n_a == 0 or n_b == 0:
+        return b if n_a == 0 else a
+    delta = mean_b - mean_a
+    return n, mean_a + delta * n_b / n, m2_a + m2_b + delta ** 2 * n_a * n_b / n
+
+
+def _merge_comoments(a, b):
+    """Combine (n, mean_x, mean_y, M2_x, M2_y, C_xy) of two partitions"""
+    n_a, n_b = a[0], b[0]
+    if n_a == 0 or n_b == 0:
+        return b if n_a == 0 else a
+    n = n_a + n_b
+    dx, dy = b[1] - a[1], b[2] - a[2]
+    w = n_a * n_b / n
+    return (n, a[1] + dx * n_b / n, a[2] + dy * n_b / n,
+            a[3] + b[3] + dx * dx * w, a[4] + b[4] + dy * dy * w, a[5] + b[5] + dx * dy * w)
+
+
+class AnalysisAccumulator:
+    """
+    Counts, means, co-moments and conditional counts for the core analysis,
+    updated one chunk at a time
+
+    Each chunk is summarized with vectorized NumPy reductions and folded
+    into the running state with Chan's parallel update, so rows can be fed
+    in any chunking (down to single rows) and accumulators built on separate
+    partitions or workers can be combined with merge(). results() gives the
+    same dictionaries as calculate_bernoulli_parameters,
+    calculate_conditional_probabilities, calculate_binomial_parameters (rows
+    are weeks), calculate_correlation_analysis and perform_statistical_tests.
+    """
+
+    def __init__(self, infection_col="I", vaccination_col="vaccination_rate", cases_col="new_cases",
+                 threshold=0.5):
+        self.infection_col = infection_col
+        self.vaccination_col = vaccination_col
+        self.cases_col = cases_col
+        self.threshold = threshold
+
+        self.n_rows = 0
+        self.infection = (0, 0.0, 0.0)  # (n, mean, M2) of I
+        self.vaccination = (0, 0.0, 0.0)  # (n, mean, M2) of V
+        self.pairs = (0, 0.0, 0.0, 0.0, 0.0, 0.0)  # (V, cases) co-moments over complete pairs
+        # Rows, rows with I, and infections in the high/low vaccination groups
+        self.groups = np.zeros((2, 3))
+
+    def update(self, df):
+        """
+        Add a chunk of rows
+
+        Args:
+            df: DataFrame chunk with the infection, vaccination and case columns
+
+        Returns:
+            self
+        """
+        return self.update_arrays(df[self.infection_col], df[self.vaccination_col], df[self.cases_col])
+
+    def update_arrays(self, infection, vaccination, cases):
+        """
+        Add rows given as arrays (or scalars for a single row); NaN marks missing values
+
+        Returns:
+            self
+        """
+        infection = np.atleast_1d(np.asarray(infection, dtype=float))
+        vaccination = np.atleast_1d(np.asarray(vaccination, dtype=float))
+        cases = np.atleast_1d(np.asarray(cases, dtype=float))
+
+        has_I, has_V = ~np.isnan(infection), ~np.isnan(vaccination)
+        pair = has_V & ~np.isnan(cases)
+        high = has_V & (vaccination >= self.threshold)
+        low = has_V & (vaccination < self.threshold)
+        groups = np.array([[mask.sum(), (mask & has_I).sum(), infection[mask & has_I].sum()]
+                           for mask in (high, low)], dtype=float)
+
+        chunk = AnalysisAccumulator(self.infection_col, self.vaccination_col, self.cases_col, self.threshold)
+        chunk.n_rows = len(infection)
+        chunk.infection = _moments(infection[has_I])
+        chunk.vaccination = _moments(vaccination[has_V])
+        chunk.pairs = _moments(vaccination[pair], cases[pair])
+        chunk.groups = groups
+        return self.merge(chunk)
+
+    def merge(self, other):
+        """
+        Fold another accumulator (e.g. from another partition or worker) into this one
+
+        Returns:
+            self
+        """
+        if other.threshold != self.threshold:
+            raise ValueError("Cannot merge accumulators with different thresholds")
+        self.n_rows += other.n_rows
+        self.infection = _merge_moments(self.infection, other.infection)
+        self.vaccination = _merge_moments(self.vaccination, other.vaccination)
+        self.pairs = _merge_comoments(self.pairs, other.pairs)
+        self.groups = self.groups + other.groups
+        return self
+
+    def bernoulli(self):
+        """Same dictionary as calculate_bernoulli_parameters"""
+        p_I = self.infection[1] if self.infection[0] else np.nan
+        p_V = self.vaccination[1] if self.vaccination[0] else np.nan
+        var_I = p_I * (1 - p_I)
+        var_V = p_V * (1 - p_V)
+        return {
+            "p_I": p_I,
+            "p_V": p_V,
+            "var_I": var_I,
+            "var_V": var_V,
+            "std_I": np.sqrt(var_I),
+            "std_V": np.sqrt(var_V)
+        }
+
+    def conditional(self):
+        """Same dictionary as calculate_conditional_probabilities"""
+        (n_high, n_high_I, x_high), (n_low, n_low_I, x_low) = self.groups
+        p_I_high = x_high / n_high_I if n_high_I else np.nan
+        p_I_low = x_low / n_low_I if n_low_I else np.nan
+        return {
+            "p_I_high": p_I_high,
+            "p_I_low": p_I_low,
+            "difference": p_I_high - p_I_low,
+            "n_high": int(n_high),
+            "n_low": int(n_low),
+            "se_high": np.sqrt(p_I_high * (1 - p_I_high) / n_high) if n_high > 0 else 0,
+            "se_low": np.sqrt(p_I_low * (1 - p_I_low) / n_low) if n_low > 0 else 0,
+            "threshold": self.threshold
+        }
+
+    def binomial_weekly(self):
+        """Same dictionary as calculate_binomial_parameters(period='W') for rows that are weeks"""
+        n, p_I, m2 = self.infection
+        # One observation per weekly period (calendar_trials at weekly resolution)
+        n_trials = 1.0
+        expected_mean = n_trials * p_I
+        expected_var = n_trials * p_I * (1 - p_I)
+        # A weekly row's infection indicator is that week's total
+        actual_mean = p_I if n else np.nan
+        actual_var = m2 / (n - 1) if n > 1 else np.nan
+        return {
+            "period": "W",
+            "n_trials": n_trials,
+            "p_I": p_I,
+            "expected_mean": expected_mean,
+            "expected_variance": expected_var,
+            "actual_mean": actual_mean,
+            "actual_variance": actual_var,
+            "mean_difference": actual_mean - expected_mean,
+            "variance_difference": actual_var - expected_var
+        }
+
+    def correlation(self):
+        """Same dictionary as calculate_correlation_analysis (asymptotic t-test)"""
+        n_pairs, _, _, m2_x, m2_y, c_xy = self.pairs
+        correlation = c_xy / np.sqrt(m2_x * m2_y) if n_pairs > 1 and m2_x > 0 and m2_y > 0 else np.nan
+        n = self.n_rows
+        if abs(correlation) < 1:
+            t_stat = correlation * np.sqrt(n - 2) / np.sqrt(1 - correlation**2)
+            p_value = 2 * (1 - stats.t.cdf(abs(t_stat), n - 2))
+        else:
+            t_stat = np.inf if correlation > 0 else -np.inf
+            p_value = 0.0
+        if np.isnan(correlation):
+            t_stat = p_value = np.nan
+        return {
+            "test_type": "Pearson correlation test",
+            "correlation_coefficient": correlation,
+            "sample_size": n,
+            "t_statistic": t_stat,
+            "p_value": p_value,
+            "significant": p_value < 0.05 if not np.isnan(p_value) else False
+        }
+
+    def proportion_test(self):
+        """Same dictionary as perform_statistical_tests (asymptotic z-test)"""
+        (n1, _, x1), (n2, _, x2) = self.groups
+        p1, p2 = x1 / n1 if n1 > 0 else 0, x2 / n2 if n2 > 0 else 0
+        p_pooled = (x1 + x2) / (n1 + n2) if (n1 + n2) > 0 else 0
+        se = np.sqrt(p_pooled * (1 - p_pooled) * (1/n1 + 1/n2)) if n1 > 0 and n2 > 0 else 0
+        z_stat = (p1 - p2) / se if se > 0 else 0
+        p_value = 2 * (1 - stats.norm.cdf(abs(z_stat))) if se > 0 else 1.0
+        return {
+            "test_type": "Two-sample proportion test (z-test)",
+            "n_high": int(n1),
+            "n_low": int(n2),
+            "p_high": p1,
+            "p_low": p2,
+            "difference": p1 - p2,
+            "z_statistic": z_stat,
+            "p_value": p_value,
+            "significant": p_value < 0.05
+        }
+
+    def results(self):
+        """
+        Results in the layout of run_complete_analysis
+
+        The entries that need the whole ordered series (monthly goodness of
+        fit, threshold sweep, lagged and rolling correlations, segments,
+        count models, bootstrap, weekly totals) are None.
+
+        Returns:
+            Dictionary with all analysis results
+        """
+        return {
+            "bernoulli": self.bernoulli(),
+            "conditional": self.conditional(),
+            "binomial_weekly": self.binomial_weekly(),
+            "binomial_monthly": None,
+            "correlation_analysis": self.correlation(),
+            "statistical_tests": self.proportion_test(),
+            "threshold_sweep": None,
+            "lagged_correlation": None,
+            "rolling_correlation": None,
+            "segments": None,
+            "segment_source": None,
+            "segment_periods": None,
+            "count_models": None,
+            "bootstrap": None,
+            "weekly_actual": None
+        }
+
+
+def accumulate(chunks, **kwargs):
+    """
+    Feed an iterable of DataFrame chunks (e.g. pd.read_csv(..., chunksize=...))
+    through one accumulator
+
+    Args:
+        chunks: Iterable of DataFrames
+        **kwargs: Column names and threshold for AnalysisAccumulator
+
+    Returns:
+        AnalysisAccumulator
+    """
+    acc = AnalysisAccumulator(**kwargs)
+    for chunk in chunks:
+        acc.update(chunk)
+    return acc
+
+
+if __name__ == "__main__":
+    acc = accumulate(pd.read_csv("data/processed/merged_data_clean_weekly.csv", chunksize=26))
+    for key, value in acc.results()["correlation_analysis"].items():
+        print(f"{key}: {value}")
@@ -0,0 +1,217 @@
+"""
+Sub-national Processing Module
+Out-of-core weekly panels from the NY Times state and county files
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from aggregate import aggregate
+from columnar_store import save_source
+from process_data import END_DATE, START_DATE
+
+
+# Name columns carried into the panel for each level
+LEVEL_COLUMNS = {
+    'states': ['state'],
+    'counties': ['state', 'county']
+}
+
+# Zero-padded FIPS width for each level
+FIPS_WIDTH = {
+    'states': 2,
+    'counties': 5
+}
+
+CHUNK_REDUCERS = {
+    'new_cases': 'sum',
+    'new_deaths': 'sum',
+    'I': 'any',  # 1 if any infection in the week
+    'n_days': ('I', 'count')  # Days reported in the week
+}
+
+# How partial weeks from neighbouring chunks are combined
+COMBINE_REDUCERS = {
+    'new_cases': 'sum',
+    'new_deaths': 'sum',
+    'I': 'max',
+    'n_days': 'sum'
+}
+
+
+def _geo_ids(chunk, level):
+    """
+    Geography id per row: the zero-padded FIPS code, or 'state|county' for
+    rows the NY Times publishes without one (e.g. New York City, Unknown)
+    """
+    fips = chunk['fips'].astype('string').str.zfill(FIPS_WIDTH[level])
+    fallback = chunk['state'].astype('string')
+    if level == 'counties':
+        fallback = fallback + '|' + chunk['county'].astype('string')
+    return fips.fillna(fallback).to_numpy(dtype=object)
+
+
+class _GeoState:
+    """
+    Integer codes, names and last cumulative counts of every geography seen
+    so far (NaN until a geography reports its first count)
+    """
+
+    def __init__(self, level):
+        self.ids = pd.Index([], dtype=object)
+        self.names = {col: [] for col in LEVEL_COLUMNS[level]}
+        self.last = {'cases': np.zeros(0), 'deaths': np.zeros(0)}
+
+    def codes(self, chunk, ids):
+        """Map chunk rows to stable integer codes, registering new geographies"""
+        inverse, uniques = pd.factorize(ids)
+        known = self.ids.get_indexer(uniques)
+        new = known < 0
+        if new.any():
+            first_rows = np.unique(inverse, return_index=True)[1][new]
+            known[new] = np.arange(len(self.ids), len(self.ids) + new.sum())
+            self.ids = self.ids.append(pd.Index(uniques[new], dtype=object))
+            for col, names in self.names.items():
+                names.extend(chunk[col].to_numpy()[first_rows])
+            for col in self.last:
+                self.last[col] = np.append(self.last[col], np.full(new.sum(), np.nan))
+        return known[inverse]
+
+
+def _daily_new(cumulative, codes, starts, last):
+    """
+    Daily increments of a cumulative count for rows sorted by (code, date)
+
+    Missing values repeat the previous cumulative count; the first row of each
+    geography in the chunk is diffed against the count carried from earlier
+    chunks, which is then updated in place. A geography's first reported count
+    has no previous value and gets 0, like diff().fillna(0) in the national
+    series. Negative corrections are clipped.
+    """
+    cumulative = pd.Series(cumulative).groupby(codes, sort=False).ffill().to_numpy()
+    cumulative = np.where(np.isnan(cumulative), last[codes], cumulative)
+
+    previous = np.empty_like(cumulative)
+    previous[1:] = cumulative[:-1]
+    previous[starts] = last[codes[starts]]
+
+    ends = np.append(starts[1:], len(codes)) - 1
+    last[codes[ends]] = cumulative[ends]
+    return np.clip(np.nan_to_num(cumulative - previous, nan=0.0), 0, None)
+
+
+def build_subnational_panel(paths, level="counties", start_date=START_DATE, end_date=END_DATE,
+                            chunksize=500_000, save_path=None, save_columnar=False):
+    """
+    Weekly panel per state or county from the NY Times cumulative files
+
+    The files are read in chunks, so memory is bounded by one chunk plus the
+    weekly output (~3,200 counties x ~160 weeks) rather than the millions of
+    daily rows. Within each chunk, daily diffs are computed per geography with
+    one sort and array shifts; the last cumulative count of every geography is
+    carried into the next chunk. Each chunk is rolled up to W-SUN weeks, and
+    weeks split across chunk boundaries are combined at the end.
+
+    Rows of each geography must appear in date order across the files, which
+    holds for the NY Times files (sorted by date, yearly files in order).
+
+    Args:
+        paths: CSV path or list of paths (from extract_nyt_subnational_data)
+        level: 'states' or 'counties'
+        start_date: First date of the analysis window
+        end_date: Last date of the analysis window (None = no upper bound)
+        chunksize: Number of rows parsed per chunk
+        save_path: Optional path to save the panel as a long CSV
+        save_columnar: Also write a typed columnar copy under data/processed/columnar/
+
+    Returns:
+        Weekly DataFrame indexed by (fips, date) with a categorical fips level,
+        categorical name columns and int32 counts
+    """
+    if level not in LEVEL_COLUMNS:
+        raise ValueError(f"Unknown level '{level}', expected one of {list(LEVEL_COLUMNS)}")
+    if isinstance(paths, str):
+        paths = [paths]
+
+    print("=" * 60)
+    print(f"PROCESSING NY TIMES {level.upper()} PANEL")
+    print("=" * 60)
+
+    start = np.datetime64(pd.Timestamp(start_date))
+    end = np.datetime64(pd.Timestamp(end_date)) if end_date is not None else None
+    usecols = ['date', 'fips', 'cases', 'deaths'] + LEVEL_COLUMNS[level]
+
+    state = _GeoState(level)
+    partials = []
+    n_rows = 0
+    for path in paths:
+        for chunk in pd.read_csv(path, usecols=usecols, dtype={'fips': str}, chunksize=chunksize):
+            n_rows += len(chunk)
+            codes = state.codes(chunk, _geo_ids(chunk, level))
+            dates = pd.to_datetime(chunk['date']).to_numpy(dtype='datetime64[ns]')
+
+            order = np.lexsort((dates, codes))
+            codes, dates = codes[order], dates[order]
+            boundary = np.ones(len(codes), dtype=bool)
+            boundary[1:] = codes[1:] != codes[:-1]
+            starts = np.flatnonzero(boundary)
+
+            daily = pd.DataFrame({
+                'code': codes,
+                'date': dates,
+                'new_cases': _daily_new(chunk['cases'].to_numpy(dtype=float)[order], codes,
+                                        starts, state.last['cases']),
+                'new_deaths': _daily_new(chunk['deaths'].to_numpy(dtype=float)[order], codes,
+                                         starts, state.last['deaths'])
+            })
+            daily['I'] = (daily['new_cases'] > 0).astype(int)
+
+            # Diffs use the full history; the window is applied afterwards
+            mask = dates >= start
+            if end is not None:
+                mask &= dates <= end
+            daily = daily[mask]
+            if len(daily) > 0:
+                partials.append(aggregate(daily, 'W', CHUNK_REDUCERS, date_col='date', group_col='code'))
+        print(f"   ✓ Read {n_rows:,} rows ({len(state.ids):,} geographies) from {path}")
+
+    if not partials:
+        raise ValueError(f"No {level} rows between {start_date} and {end_date}")
+
+    weekly = pd.concat(partials).groupby(level=['code', 'date'], sort=True).agg(COMBINE_REDUCERS)
+
+    codes = weekly.index.get_level_values('code').to_numpy()
+    fips = pd.Categorical(state.ids.to_numpy()[codes])
+    panel = pd.DataFrame({
+        col: pd.Categorical(np.asarray(names, dtype=object)[codes])
+        for col, names in state.names.items()
+    })
+    panel['new_cases'] = weekly['new_cases'].to_numpy().astype(np.int32)
+    panel['new_deaths'] = weekly['new_deaths'].to_numpy().astype(np.int32)
+    panel['I'] = weekly['I'].to_numpy().astype(np.int8)
+    panel['n_days'] = weekly['n_days'].to_numpy().astype(np.int8)
+    panel.index = pd.MultiIndex.from_arrays(
+        [pd.CategoricalIndex(fips, name='fips'), weekly.index.get_level_values('date')]
+    )
+
+    print(f"\n✓ Aggregated {n_rows:,} daily rows to {len(panel):,} {level[:-1]}-weeks "
+          f"({panel.memory_usage(deep=True).sum() / 1e6:.1f} MB)")
+
+    if save_path:
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        panel.reset_index().to_csv(save_path, index=False)
+        print(f"✓ Saved weekly {level} panel to: {save_path}")
+
+    if save_columnar:
+        save_source(panel.reset_index(), f"nyt_{level}", root="data/processed/columnar")
+
+    return panel
+
+
+if __name__ == "__main__":
+    from extract_data import extract_nyt_subnational_data
+    paths = extract_nyt_subnational_data("states", use_cache=True)
+    panel = build_subnational_panel(paths, "states", save_path="data/processed/nyt_states_weekly.csv")
+    print(panel.head())
@@ -0,0 +1,243 @@
+"""
+Data Validation Module
+Vectorized data-quality checks across all sources and countries, with a
+JSON/CSV report of counts and offending date ranges
+"""
+
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_REPORT_PATH = "data/processed/validation_report.json"
+
+# What to check in each raw source
+VALIDATION_RULES = {
+    'owid': {
+        'date_col': 'date',
+        'group_col': 'location',
+        'step_days': 1,
+        'cumulative': ['total_cases', 'total_deaths', 'total_vaccinations',
+                       'people_vaccinated', 'people_fully_vaccinated'],
+        'new': ['new_cases', 'new_deaths'],
+        'ffill': ['people_vaccinated_per_hundred', 'people_vaccinated']
+    },
+    'who': {
+        'date_col': 'Date_reported',
+        'group_col': 'Country',
+        'step_days': 7,  # WHO reports weekly
+        'cumulative': ['Cumulative_cases', 'Cumulative_deaths'],
+        'new': ['New_cases', 'New_deaths'],
+        'ffill': []
+    },
+    'nyt': {
+        'date_col': 'date',
+        'group_col': None,
+        'step_days': 1,
+        'cumulative': ['cases', 'deaths'],
+        'new': [],
+        'ffill': []
+    }
+}
+
+CHECKS = ('non_monotonic', 'negative_new', 'date_gap', 'duplicate_date', 'stale_ffill')
+
+# Forward-filled values older than this are reported as stale
+MAX_STALE_DAYS = 14
+
+ISSUE_COLUMNS = ['source', 'check', 'column', 'group', 'start', 'end', 'n_rows', 'magnitude']
+
+
+def _sort_source(df, date_col, group_col):
+    """Dates and group codes sorted by (group, date), plus the row order"""
+    dates = pd.to_datetime(df[date_col]).to_numpy(dtype='datetime64[ns]')
+    if group_col is None:
+        groups = np.zeros(len(df), dtype=np.int64)
+        names = pd.Index(['all'])
+    else:
+        groups, names = pd.factorize(df[group_col], sort=True)
+    order = np.lexsort((dates, groups))
+    return dates[order], groups[order], names, order
+
+
+def _previous_valid(valid, groups):
+    """
+    Position of the previous valid row in the same group (-1 if none),
+    for rows sorted by group
+    """
+    positions = np.where(valid, np.arange(len(valid)), -1)
+    last_valid = np.maximum.accumulate(positions) if len(valid) else positions
+    previous = np.full(len(valid), -1)
+    previous[1:] = last_valid[:-1]
+    same_group = previous >= 0
+    same_group[same_group] = groups[previous[same_group]] == groups[same_group]
+    return np.where(same_group, previous, -1)
+
+
+def _runs(flags, groups):
+    """Start/stop positions of contiguous runs of flagged rows within a group"""
+    continues = np.zeros(len(flags), dtype=bool)
+    continues[1:] = flags[1:] & flags[:-1] & (groups[1:] == groups[:-1])
+    starts = np.flatnonzero(flags & ~continues)
+    stops = np.flatnonzero(flags & ~np.append(continues[1:], False))
+    return starts, stops
+
+
+def _issues(source, check, column, names, groups, start_dates, end_dates, n_rows, magnitude):
+    return pd.DataFrame({
+        'source': source,
+        'check': check,
+        'column': column,
+        'group': names.take(groups).astype(str) if len(groups) else np.array([], dtype=object),
+        'start': pd.DatetimeIndex(start_dates).strftime('%Y-%m-%d'),
+        'end': pd.DatetimeIndex(end_dates).strftime('%Y-%m-%d'),
+        'n_rows': np.asarray(n_rows, dtype=np.int64),
+        'magnitude': np.asarray(magnitude, dtype=float)
+    }, columns=ISSUE_COLUMNS)
+
+
+def _run_issues(source, check, column, flags, magnitude, dates, groups, names):
+    """Collapse flagged rows into one issue per contiguous run"""
+    starts, stops = _runs(flags, groups)
+    totals = np.add.reduceat(np.where(flags, magnitude, 0.0), starts) if len(starts) else []
+    return _issues(source, check, column, names, groups[starts], dates[starts], dates[stops],
+                   stops - starts + 1, totals)
+
+
+def validate_source(df, source, rules=None, max_stale_days=MAX_STALE_DAYS):
+    """
+    Run all checks on one raw source in a single sorted pass
+
+    Checks:
+        non_monotonic: a cumulative column drops below its previous value
+                       (magnitude = size of the drop)
+        negative_new: a reported daily/weekly count is negative
+        date_gap: dates missing between consecutive rows (magnitude = missing periods)
+        duplicate_date: the same date appears more than once in a group
+        stale_ffill: a forward-filled column would carry a value for more than
+                     max_stale_days (magnitude = age in days of the last value)
+
+    Args:
+        df: Raw source DataFrame
+        source: Source name ('owid', 'who', 'nyt')
+        rules: Optional rules dict (default: VALIDATION_RULES[source])
+        max_stale_days: Age after which forward-filled values count as stale
+
+    Returns:
+        Tuple of (summary dict, issues DataFrame with one row per offending range)
+    """
+    rules = rules or VALIDATION_RULES[source]
+    group_col = rules['group_col']
+    dates, groups, names, order = _sort_source(df, rules['date_col'], group_col)
+    same_group = np.zeros(len(dates), dtype=bool)
+    same_group[1:] = groups[1:] == groups[:-1]
+
+    frames = []
+
+    for col in [c for c in rules['cumulative'] if c in df.columns]:
+        values = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=float)[order]
+        previous = _previous_valid(~np.isnan(values), groups)
+        has_previous = previous >= 0
+        drop = np.zeros(len(values))
+        drop[has_previous] = values[previous[has_previous]] - values[has_previous]
+        flags = has_previous & (drop > 0)
+        frames.append(_run_issues(source, 'non_monotonic', col, flags, drop, dates, groups, names))
+
+    for col in [c for c in rules['new'] if c in df.columns]:
+        values = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=float)[order]
+        flags = values < 0
+        frames.append(_run_issues(source, 'negative_new', col, flags, -np.nan_to_num(values), dates, groups, names))
+
+    # Date gaps and duplicates between consecutive rows of a group
+    step = np.zeros(len(dates), dtype=np.int64)
+    step[1:] = (dates[1:] - dates[:-1]).astype('timedelta64[D]').astype(np.int64)
+    gap = same_group & (step > rules['step_days'])
+    positions = np.flatnonzero(gap)
+    frames.append(_issues(source, 'date_gap', rules['date_col'], names, groups[positions],
+                          dates[positions - 1], dates[positions], np.ones(len(positions)),
+                          step[positions] / rules['step_days'] - 1))
+    duplicate = same_group & (step == 0)
+    frames.append(_run_issues(source, 'duplicate_date', rules['date_col'], duplicate,
+                              np.ones(len(dates)), dates, groups, names))
+
+    # Rows a forward-fill would fill from a value older than max_stale_days
+    for col in [c for c in rules['ffill'] if c in df.columns]:
+        valid = df[col].notna().to_numpy()[order]
+        previous = _previous_valid(valid, groups)
+        age = np.zeros(len(dates))
+        filled = ~valid & (previous >= 0)
+        age[filled] = (dates[filled] - dates[previous[filled]]).astype('timedelta64[D]').astype(np.int64)
+        flags = filled & (age > max_stale_days)
+        starts, stops = _runs(flags, groups)
+        frames.append(_issues(source, 'stale_ffill', col, names, groups[starts], dates[starts], dates[stops],
+                              stops - starts + 1, age[stops] if len(stops) else []))
+
+    issues = pd.concat(frames, ignore_index=True)
+    counts = issues.groupby(['check', 'column'])['n_rows'].agg(['size', 'sum'])
+    checks = {check: {} for check in CHECKS}
+    for (check, column), row in counts.iterrows():
+        checks[check][column] = {'ranges': int(row['size']), 'rows': int(row['sum'])}
+
+    summary = {
+        'rows': int(len(df)),
+        'groups': int(len(names)) if group_col is not None else 1,
+        'start': str(pd.Timestamp(dates.min()).date()) if len(dates) else None,
+        'end': str(pd.Timestamp(dates.max()).date()) if len(dates) else None,
+        'checks': checks
+    }
+    return summary, issues
+
+
+def validate_sources(sources, save_path=DEFAULT_REPORT_PATH, max_stale_days=MAX_STALE_DAYS):
+    """
+    Validate several raw sources and write a JSON report plus a CSV of issues
+
+    Args:
+        sources: Dict mapping source name ('owid', 'who', 'nyt') to DataFrame
+        save_path: Path of the JSON report; the issues CSV is written next to it
+                   with a .csv extension (None to skip saving)
+        max_stale_days: Age after which forward-filled values count as stale
+
+    Returns:
+        Tuple of (report dict, issues DataFrame)
+    """
+    print("=" * 60)
+    print("DATA VALIDATION")
+    print("=" * 60)
+
+    report = {'generated_at': datetime.now().isoformat(timespec='seconds'),
+              'max_stale_days': max_stale_days, 'sources': {}}
+    all_issues = []
+    for name, df in sources.items():
+        if df is None:
+            continue
+        summary, issues = validate_source(df, name, max_stale_days=max_stale_days)
+        report['sources'][name] = summary
+        all_issues.append(issues)
+
+        print(f"\n{name}: {summary['rows']:,} rows, {summary['groups']:,} series")
+        for check, columns in summary['checks'].items():
+            for column, count in columns.items():
+                print(f"   ⚠ {check} in {column}: {count['rows']:,} rows in {count['ranges']:,} ranges")
+
+    issues = pd.concat(all_issues, ignore_index=True) if all_issues else pd.DataFrame(columns=ISSUE_COLUMNS)
+    report['issues'] = issues.to_dict(orient='records')
+
+    if save_path:
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        with open(save_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        csv_path = os.path.splitext(save_path)[0] + '.csv'
+        issues.to_csv(csv_path, index=False)
+        print(f"\n✓ Saved validation report to: {save_path} ({len(issues):,} issues, also {csv_path})")
+
+    return report, issues
+
+
+if __name__ == "__main__":
+    from extract_data import extract_all_data
+    owid_df, who_df, nyt_df, _ = extract_all_data(use_cache=True)
+    validate_sources({'owid': owid_df, 'who': who_df, 'nyt': nyt_df})
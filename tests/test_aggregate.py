@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregate import aggregate, calendar_trials
+
+RESAMPLE_RULES = {'D': 'D', 'W': 'W-SUN', 'M': 'ME', 'Q': 'QE'}
+
+
+@pytest.fixture
+def daily():
+    rng = np.random.default_rng(7)
+    dates = pd.date_range('2020-01-03', '2021-08-17').astype('datetime64[ns]')
+    # Dropped days leave some periods empty; NaNs exercise the reducers' skipping
+    dates = dates[rng.random(len(dates)) > 0.15].delete(slice(100, 160))
+    values = rng.normal(size=len(dates))
+    values[rng.random(len(dates)) < 0.2] = np.nan
+    return pd.DataFrame({'x': values, 'count': rng.poisson(3, len(dates)).astype(float)},
+                        index=dates).iloc[rng.permutation(len(dates))]
+
+
+@pytest.mark.parametrize("freq", ['D', 'W', 'M', 'Q'])
+def test_aggregate_matches_resample(daily, freq):
+    reducers = {'sum': ('x', 'sum'), 'mean': ('x', 'mean'), 'max': ('x', 'max'), 'min': ('x', 'min'),
+                'count': ('x', 'count'), 'any': ('count', 'any'), 'first': ('count', 'first'),
+                'last': ('count', 'last')}
+    actual = aggregate(daily, freq, reducers)
+
+    resampled = daily.sort_index().resample(RESAMPLE_RULES[freq])
+    expected = pd.DataFrame({
+        'sum': resampled['x'].sum(), 'mean': resampled['x'].mean(), 'max': resampled['x'].max(),
+        'min': resampled['x'].min(), 'count': resampled['x'].count(),
+        'any': resampled['count'].max().gt(0).astype(np.int64), 'first': resampled['count'].first(),
+        'last': resampled['count'].last()
+    })
+    # aggregate returns only the periods that hold at least one row
+    expected = expected[resampled.size() > 0]
+    expected.index.name = 'date'
+
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False, check_freq=False)
+
+
+def test_grouped_aggregate_matches_per_group_resample(daily):
+    frames = [daily.iloc[:300].assign(group='a'), daily.iloc[250:].assign(group='b')]
+    actual = aggregate(pd.concat(frames), 'W', {'x': 'sum'}, group_col='group')
+    for group, frame in zip('ab', frames):
+        resampled = frame.sort_index().resample('W-SUN')['x']
+        expected = resampled.sum()[resampled.size() > 0]
+        np.testing.assert_allclose(actual.loc[group, 'x'].to_numpy(), expected.to_numpy())
+        assert (actual.loc[group].index == expected.index).all()
+
+
+
+def test_calendar_trials_counts_days_per_month():
+    labels, trials = calendar_trials(pd.date_range('2020-01-15', '2020-04-10').to_numpy(), 'M')
+    assert list(trials) == [17, 29, 31, 10]
+    assert list(pd.DatetimeIndex(labels).strftime('%Y-%m-%d')) == ['2020-01-31', '2020-02-29', '2020-03-31',
+                                                                   '2020-04-30']
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregate import VARIANT_PERIODS
+from analyze import (analyze_segments, calculate_bernoulli_parameters, calculate_binomial_parameters,
+                     calculate_conditional_probabilities, calculate_correlation_analysis, perform_statistical_tests)
+from process_data import build_country_panel, get_better_covid_data
+from test_process_data import _sources
+
+
+@pytest.fixture(scope="module")
+def weekly():
+    owid_df, who_df, nyt_df = _sources(seed=8)
+    df = get_better_covid_data(nyt_df, owid_df, save_path=None, who_df=who_df).set_index('date')
+    df.loc[df.index[::4], 'I'] = 0
+    return df
+
+
+def _assert_matches_slice(row, part, threshold):
+    """One analyze_segments row against the per-frame analysis functions on that slice"""
+    assert row['n_weeks'] == len(part)
+    bernoulli = calculate_bernoulli_parameters(part)
+    conditional = calculate_conditional_probabilities(part, threshold=threshold)
+    assert row['p_I'] == pytest.approx(bernoulli['p_I'])
+    assert row['p_V'] == pytest.approx(bernoulli['p_V'])
+    assert (row['n_high'], row['n_low']) == (conditional['n_high'], conditional['n_low'])
+    if conditional['n_high'] and conditional['n_low']:
+        tests = perform_statistical_tests(part, threshold=threshold)
+        assert row['difference'] == pytest.approx(conditional['difference'])
+        assert row['z_statistic'] == pytest.approx(tests['z_statistic'])
+        assert row['z_p_value'] == pytest.approx(tests['p_value'])
+    else:
+        assert np.isnan(row['z_statistic'])
+    if np.isnan(row['correlation_coefficient']):
+        assert len(part) < 3 or part['vaccination_rate'].std() == 0
+    else:
+        correlation = calculate_correlation_analysis(part)
+        assert row['correlation_coefficient'] == pytest.approx(correlation['correlation_coefficient'], rel=1e-9)
+        assert row['p_value'] == pytest.approx(correlation['p_value'], rel=1e-9, abs=1e-15)
+
+
+def test_variant_segments_match_sliced_analysis(weekly):
+    segments = analyze_segments(weekly, VARIANT_PERIODS, threshold=0.3)
+    assert list(segments['period']) == [name for name, _ in VARIANT_PERIODS]
+    for _, row in segments.iterrows():
+        _assert_matches_slice(row, weekly.loc[row['start']:row['end']], 0.3)
+
+
+def test_breakpoint_dates_and_detected_regimes_match_sliced_analysis(weekly):
+    for periods in (['2020-01-01', '2020-09-15', '2021-05-02'], "changepoints"):
+        segments = analyze_segments(weekly, periods, threshold=0.3)
+        assert segments['n_weeks'].sum() == len(weekly)
+        for _, row in segments.iterrows():
+            _assert_matches_slice(row, weekly.loc[row['start']:row['end']], 0.3)
+
+
+def test_panel_segments_match_per_country_slices():
+    owid_df, _, _ = _sources(seed=8)
+    panel = build_country_panel(owid_df.assign(total_deaths=owid_df['total_cases'] // 40))
+    panel.loc[panel.index[::3], 'I'] = 0
+    segments = analyze_segments(panel, VARIANT_PERIODS, threshold=0.3)
+    assert set(segments['country']) == {'Canada', 'United States'}
+    for _, row in segments.iterrows():
+        _assert_matches_slice(row, panel.loc[row['country']].loc[row['start']:row['end']], 0.3)
+
+
+def _daily_infections(start, end, p, seed):
+    dates = pd.date_range(start, end)
+    return pd.DataFrame({'I': (np.random.default_rng(seed).random(len(dates)) < p).astype(int)}, index=dates)
+
+
+@pytest.mark.parametrize("period", ['W', 'M', 'Q'])
+def test_closed_form_trials_match_simulation_calendar(period):
+    daily = _daily_infections('2020-01-06', '2021-12-26', 0.3, seed=1)
+    closed = calculate_binomial_parameters(daily, period=period)[0]
+    simulated = calculate_binomial_parameters(daily, period=period, method="simulation", n_simulations=20_000)[0]
+
+    # Both methods count trials on the same calendar: the closed form uses the mean per period
+    trials = np.array(simulated["period_trials"])
+    assert trials.sum() == len(daily)
+    assert closed["n_trials"] == pytest.approx(trials.mean())
+    assert closed["expected_mean"] == pytest.approx(closed["actual_mean"])
+    if period == 'W':
+        assert closed["n_trials"] == 7
+        # Equal trials per period: the simulated Binomial variance is the closed-form one
+        fit = simulated["goodness_of_fit"]["binomial"]
+        assert fit["expected_variance"] == pytest.approx(closed["expected_variance"], rel=0.02)
+
+
+def test_weekly_series_has_one_trial_per_week(weekly):
+    closed = calculate_binomial_parameters(weekly, period="W")[0]
+    assert closed["n_trials"] == 1
+    assert closed["expected_mean"] == pytest.approx(closed["actual_mean"])
+    monthly = calculate_binomial_parameters(weekly, period="M")[0]
+    assert 4 <= monthly["n_trials"] <= 5
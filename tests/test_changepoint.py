@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from changepoint import pelt
+
+
+def _segment_cost(segment, cost):
+    """Cost of one segment, written out directly"""
+    segment = segment[~np.isnan(segment)]
+    if cost == 'normal':
+        return ((segment - segment.mean()) ** 2).sum() if len(segment) else 0.0
+    total = segment.sum()
+    return 2 * (total - total * np.log(total / len(segment))) if total > 0 else 0.0
+
+
+def _optimal_partitioning(values, cost, penalty, min_size):
+    """Exhaustive O(n^2) dynamic program over every last breakpoint (no pruning)"""
+    n = len(values)
+    F = np.full(n + 1, np.inf)
+    F[0] = -penalty
+    last = np.zeros(n + 1, dtype=int)
+    for end in range(min_size, n + 1):
+        for start in range(0, end - min_size + 1):
+            candidate = F[start] + _segment_cost(values[start:end], cost) + penalty
+            if candidate < F[end] - 1e-9:
+                F[end], last[end] = candidate, start
+    points, t = [], n
+    while t > 0:
+        t = last[t]
+        if t > 0:
+            points.append(t)
+    return points[::-1], F[n]
+
+
+def _total_cost(values, breakpoints, cost, penalty):
+    bounds = [0, *breakpoints, len(values)]
+    return sum(_segment_cost(values[a:b], cost) for a, b in zip(bounds, bounds[1:])) + penalty * len(breakpoints)
+
+
+@pytest.mark.parametrize("cost", ['normal', 'poisson'])
+@pytest.mark.parametrize("min_size", [1, 3, 8])
+def test_pelt_matches_exhaustive_dynamic_program(cost, min_size):
+    rng = np.random.default_rng(min_size)
+    means = np.repeat([5.0, 20.0, 8.0, 30.0, 12.0], [25, 14, 30, 9, 22])
+    series = np.vstack([rng.poisson(means), rng.poisson(means[::-1]), rng.poisson(np.full(100, 10.0))]).astype(float)
+    series[0, [17, 55]] = np.nan
+    penalty = 3 * np.log(series.shape[1]) * (4 if cost == 'poisson' else 1)
+    if cost == 'normal':
+        series = series / 3.0
+
+    breakpoints = pelt(series, cost=cost, penalty=penalty, min_size=min_size, scale=False)
+    for values, found in zip(series, breakpoints):
+        expected, optimum = _optimal_partitioning(values, cost, penalty, min_size)
+        assert _total_cost(values, found, cost, penalty) == pytest.approx(optimum, rel=1e-9)
+        assert list(found) == expected
+        assert (np.diff([0, *found, len(values)]) >= min_size).all()
+
+
+def test_pelt_recovers_clear_mean_shifts():
+    values = np.repeat([0.0, 6.0, -3.0], [40, 30, 50]) + np.random.default_rng(0).normal(size=120)
+    assert list(pelt(values, cost='normal')[0]) == [40, 70]
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from columnar_store import read_columnar, write_columnar
+
+
+def _frame():
+    return pd.DataFrame({
+        'location': pd.Categorical(['France', 'Chile', 'France', 'Chile']),
+        'date': pd.to_datetime(['2021-01-01', '2021-01-01', '2021-01-02', '2021-01-02']).astype('datetime64[ns]'),
+        'new_cases': pd.array([5, None, 7, 0], dtype='Int32'),
+        'people_vaccinated_per_hundred': [0.5, np.nan, 1.25, 2.0]
+    })
+
+
+def test_round_trip_keeps_values_dtypes_and_int32_mask(tmp_path):
+    df = _frame()
+    schema = {'location': 'category', 'date': 'datetime64[ns]', 'new_cases': 'Int32',
+              'people_vaccinated_per_hundred': 'float64'}
+    meta = write_columnar(df, str(tmp_path), schema=schema)
+    assert meta['columns']['new_cases']['dtype'] == 'Int32'
+    assert (tmp_path / 'new_cases.mask.npy').exists()
+
+    for mmap in (True, False):
+        back = read_columnar(str(tmp_path), mmap=mmap)
+        assert back['location'].dtype == 'category'
+        assert back['new_cases'].dtype == 'Int32'
+        assert back['new_cases'].isna().tolist() == [False, True, False, False]
+        pd.testing.assert_frame_equal(back, df, check_categorical=False)
+
+
+def test_column_projection_reads_only_requested_columns(tmp_path):
+    write_columnar(_frame(), str(tmp_path), schema={'new_cases': 'Int32'})
+    back = read_columnar(str(tmp_path), columns=['date', 'new_cases'])
+    assert list(back.columns) == ['date', 'new_cases']
+    assert back['new_cases'].tolist() == [5, pd.NA, 7, 0]
+
+
+def test_int32_without_missing_values_has_no_mask(tmp_path):
+    df = pd.DataFrame({'cases': pd.array([1, 2, 3], dtype='Int32')})
+    meta = write_columnar(df, str(tmp_path), schema={'cases': 'Int32'})
+    assert meta['columns']['cases']['dtype'] == 'int32'
+    assert not (tmp_path / 'cases.mask.npy').exists()
+    assert read_columnar(str(tmp_path))['cases'].tolist() == [1, 2, 3]
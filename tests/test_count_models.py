@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from scipy import optimize, special
+
+from count_models import fit_glm_batch
+
+
+@pytest.fixture
+def panel():
+    rng = np.random.default_rng(13)
+    n_series, n_time = 4, 80
+    X = np.stack([np.ones((n_series, n_time)), rng.uniform(0, 1, (n_series, n_time)),
+                  (np.arange(n_time) >= 45).astype(float) * np.ones((n_series, 1))], axis=-1)
+    beta = np.array([[3.0, -1.0, 0.5], [2.0, 0.3, 1.0], [4.0, -0.5, -0.2], [1.0, 1.5, 0.0]])
+    mu = np.exp(np.einsum('stk,sk->st', X, beta))
+    # Gamma-mixed Poisson draws are overdispersed counts (NB2 with alpha = 0.2)
+    y = rng.poisson(mu * rng.gamma(5.0, 0.2, mu.shape)).astype(float)
+    mask = rng.random((n_series, n_time)) > 0.1
+    mask[1, :30] = False  # an unbalanced series
+    return X, y, mask
+
+
+def _scalar_mle(X, y, alpha):
+    """Maximize one series' Poisson (alpha = 0) or NB2 log-likelihood directly"""
+    def negative_log_likelihood(beta):
+        eta = X @ beta
+        if alpha == 0:
+            return -(y * eta - np.exp(eta) - special.gammaln(y + 1)).sum()
+        mu = np.exp(eta)
+        return -(special.gammaln(y + 1 / alpha) - special.gammaln(1 / alpha) - special.gammaln(y + 1)
+                 + y * np.log(alpha * mu / (1 + alpha * mu)) - np.log1p(alpha * mu) / alpha).sum()
+
+    start = np.linalg.lstsq(X, np.log1p(y), rcond=None)[0]
+    fit = optimize.minimize(negative_log_likelihood, start, method='BFGS', options={'gtol': 1e-9})
+    return fit.x, -fit.fun
+
+
+@pytest.mark.parametrize("family", ['poisson', 'negative_binomial'])
+def test_batched_irls_matches_scalar_mle(panel, family):
+    X, y, mask = panel
+    result = fit_glm_batch(X, y, mask, family=family, tol=1e-12)
+    assert result["converged"].all()
+
+    for s in range(len(y)):
+        # The negative binomial's alpha is a moment estimate; the coefficients maximize the likelihood at it
+        beta, log_likelihood = _scalar_mle(X[s][mask[s]], y[s][mask[s]], result["alpha"][s])
+        np.testing.assert_allclose(result["coef"][s], beta, rtol=1e-5, atol=1e-6)
+        assert result["log_likelihood"][s] == pytest.approx(log_likelihood, rel=1e-9)
+        assert result["n_obs"][s] == mask[s].sum()
+
+
+def test_batched_fit_matches_one_series_at_a_time(panel):
+    X, y, mask = panel
+    batched = fit_glm_batch(X, y, mask, family='negative_binomial', tol=1e-12)
+    for s in range(len(y)):
+        single = fit_glm_batch(X[s:s + 1], y[s:s + 1], mask[s:s + 1], family='negative_binomial', tol=1e-12)
+        for key in ("coef", "std_error", "alpha", "log_likelihood"):
+            np.testing.assert_allclose(batched[key][s], single[key][0], rtol=1e-8)
+
+
+def test_constant_column_is_not_identified(panel):
+    X, y, mask = panel
+    X = X.copy()
+    X[2, :, 2] = 1.0
+    result = fit_glm_batch(X, y, mask)
+    assert np.isnan(result["coef"][2, 2]) and np.isfinite(result["coef"][[0, 1, 3]]).all()
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cross_correlation import lagged_cross_correlation, rolling_correlation
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(9)
+    x = np.cumsum(rng.normal(size=(3, 90)), axis=1)
+    y = np.roll(x, 4, axis=1) + rng.normal(scale=3, size=(3, 90))
+    x[rng.random(x.shape) < 0.1] = np.nan
+    y[rng.random(y.shape) < 0.1] = np.nan
+    return x, y
+
+
+def test_lagged_correlation_matches_shifted_corr(series):
+    x, y = series
+    result = lagged_cross_correlation(x, y, max_lag=30, min_overlap=10)
+    assert list(result["lags"]) == list(range(-30, 31))
+
+    for row in range(x.shape[0]):
+        xs, ys = pd.Series(x[row]), pd.Series(y[row])
+        for j, lag in enumerate(result["lags"]):
+            # Lag k pairs x[t] with y[t + k]
+            shifted = ys.shift(-lag)
+            expected = xs.corr(shifted)
+            assert result["n"][row, j] == (xs.notna() & shifted.notna()).sum()
+            np.testing.assert_allclose(result["r"][row, j], expected, rtol=1e-9, atol=1e-12)
+
+
+def test_lagged_correlation_finds_the_lead():
+    rng = np.random.default_rng(4)
+    x = rng.normal(size=(3, 120))
+    y = np.roll(x, 4, axis=1) + rng.normal(scale=0.5, size=(3, 120))
+    result = lagged_cross_correlation(x, y, max_lag=10)
+    assert (result["lags"][np.nanargmax(result["r"], axis=1)] == 4).all()
+    assert (result["n_eff"] <= result["n"]).all()
+
+
+def test_short_overlap_gives_nan():
+    x = np.arange(12.0)
+    result = lagged_cross_correlation(x, x ** 2, max_lag=5, min_overlap=10)
+    assert np.isnan(result["r"][0, np.abs(result["lags"]) > 2]).all()
+    assert np.isfinite(result["r"][0, np.abs(result["lags"]) <= 2]).all()
+
+
+@pytest.mark.parametrize("method", ['sums', 'welford'])
+@pytest.mark.parametrize("window,min_periods", [(12, None), (20, 8)])
+def test_rolling_correlation_matches_pandas(series, method, window, min_periods):
+    x, y = series
+    r = rolling_correlation(x, y, window, min_periods=min_periods, method=method)
+
+    for row in range(x.shape[0]):
+        # Pairs with either value missing are skipped, so mask both series together
+        valid = ~np.isnan(x[row]) & ~np.isnan(y[row])
+        xs = pd.Series(np.where(valid, x[row], np.nan))
+        ys = pd.Series(np.where(valid, y[row], np.nan))
+        expected = xs.rolling(window, min_periods=min_periods or window).corr(ys)
+        np.testing.assert_allclose(r[row], expected.to_numpy(), rtol=1e-9, atol=1e-12)
+
+
+@pytest.mark.parametrize("method", ['sums', 'welford'])
+def test_rolling_correlation_is_exact_with_large_offsets(series, method):
+    # Large offsets cancel catastrophically in raw running sums
+    x, y = series[0][0] * 1e4 + 1e7, series[1][0] - 5e5
+    r = rolling_correlation(x, y, 12, method=method)
+
+    expected = np.full(len(x), np.nan)
+    for end in range(12, len(x) + 1):
+        xs, ys = x[end - 12:end], y[end - 12:end]
+        if not (np.isnan(xs) | np.isnan(ys)).any():
+            expected[end - 1] = np.corrcoef(xs, ys)[0, 1]
+    np.testing.assert_allclose(r, expected, rtol=1e-11, atol=1e-12)
+
+
+def test_rolling_methods_agree_on_a_single_series(series):
+    x, y = series[0][0], series[1][0]
+    np.testing.assert_allclose(rolling_correlation(x, y, 15, method='sums'),
+                               rolling_correlation(x, y, 15, method='welford'), rtol=1e-9, atol=1e-12)
@@ -0,0 +1,76 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+import extract_data
+from extract_data import extract_sources_concurrently
+
+
+def test_concurrent_extraction_of_no_sources():
+    assert extract_sources_concurrently({}) == {}
+
+
+class _FilesHandler(BaseHTTPRequestHandler):
+    """Serves server.files (path -> CSV text)"""
+
+    def do_GET(self):
+        body = self.server.files[self.path].encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _csv(rows, columns):
+    return pd.DataFrame(rows, columns=columns).to_csv(index=False)
+
+
+def _files(n_days):
+    dates = [f"2021-01-{day:02d}" for day in range(1, n_days + 1)]
+    owid = _csv([(loc, d, i) for d in dates for i, loc in enumerate(["Chile", "United States"])],
+                ["location", "date", "new_cases"])
+    who = _csv([(d, c, 1) for d in dates for c in ["Chile", "United States of America"]],
+               ["Date_reported", "Country", "New_cases"])
+    nyt = _csv([(d, i, 0) for i, d in enumerate(dates)], ["date", "cases", "deaths"])
+    return {"/owid.csv": owid, "/who.csv": who, "/nyt.csv": nyt}
+
+
+@pytest.fixture
+def upstream(tmp_path, monkeypatch):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _FilesHandler)
+    httpd.files = _files(3)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{httpd.server_address[1]}"
+    for name in ("owid", "who", "nyt"):
+        monkeypatch.setattr(extract_data, f"{name.upper()}_URL", f"{base}/{name}.csv")
+    monkeypatch.chdir(tmp_path)
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_incremental_never_mixes_country_filters(upstream):
+    extract_data.extract_all_data(incremental=True)
+    assert extract_data.read_snapshot_filter("data/raw/owid_covid_data.csv") == (True, None)
+
+    # A filtered refresh must not append single-country rows to a whole-world snapshot
+    upstream.files = _files(5)
+    owid_df, _, _, _ = extract_data.extract_all_data(incremental=True, countries=["United States"])
+    stored = pd.read_csv("data/raw/owid_covid_data.csv")
+    assert set(stored["location"]) == {"United States"}
+    assert len(stored) == 5
+    assert extract_data.read_snapshot_filter("data/raw/owid_covid_data.csv") == (True, ["United States"])
+
+    # With a matching filter only the new dates are appended
+    upstream.files = _files(7)
+    owid_df, who_df, nyt_df, _ = extract_data.extract_all_data(incremental=True, countries=["United States"])
+    stored = pd.read_csv("data/raw/owid_covid_data.csv")
+    assert stored["date"].tolist() == [f"2021-01-{day:02d}" for day in range(1, 8)]
+    assert set(pd.read_csv("data/raw/who_covid_data.csv")["Country"]) == {"United States of America"}
+    assert len(pd.read_csv("data/raw/nyt_covid_data.csv")) == 7
+    pd.testing.assert_frame_equal(owid_df, stored)
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from panel_regression import fit_fixed_effects
+
+
+@pytest.fixture
+def unbalanced_panel():
+    rng = np.random.default_rng(21)
+    entity, period = np.meshgrid(np.arange(7), np.arange(12), indexing='ij')
+    entity, period = entity.ravel(), period.ravel()
+    # Drop about a fifth of the cells; periods 0-1 of every entity and all periods of
+    # entities 1-2 stay, so no level is a singleton
+    keep = rng.random(len(entity)) > 0.2
+    keep[np.arange(0, len(entity), 12)] = keep[np.arange(1, len(entity), 12)] = True
+    keep[np.arange(12) + 12] = keep[np.arange(12) + 24] = True
+    entity, period = entity[keep], period[keep]
+
+    X = rng.normal(size=(len(entity), 2)) + 0.3 * entity[:, None]
+    y = (X @ np.array([1.5, -0.7]) + rng.normal(size=7)[entity] + rng.normal(size=12)[period]
+         + rng.normal(scale=0.5, size=len(entity)))
+    return y, X, entity, period
+
+
+def _dense_ols(y, X, entity, period):
+    """OLS with explicit entity and period dummies (one period dummy dropped)"""
+    design = np.column_stack([X, pd.get_dummies(entity).to_numpy(float),
+                              pd.get_dummies(period).to_numpy(float)[:, 1:]])
+    xtx_inv = np.linalg.inv(design.T @ design)
+    beta = xtx_inv @ design.T @ y
+    resid = y - design @ beta
+    return design, beta, resid, xtx_inv
+
+
+def test_within_estimator_matches_dummy_variable_ols(unbalanced_panel):
+    y, X, entity, period = unbalanced_panel
+    result = fit_fixed_effects(y, X, [entity, period], names=['a', 'b'], tol=1e-13)
+
+    design, beta, resid, xtx_inv = _dense_ols(y, X, entity, period)
+    sigma2 = resid @ resid / (len(y) - design.shape[1])
+    coefficients = result["coefficients"]
+    np.testing.assert_allclose(coefficients["coefficient"], beta[:2], rtol=1e-8)
+    np.testing.assert_allclose(coefficients["std_error"], np.sqrt(sigma2 * np.diag(xtx_inv)[:2]), rtol=1e-8)
+    assert result["df_resid"] == len(y) - design.shape[1]
+    assert result["n_singletons"] == 0
+
+
+def test_clustered_errors_match_dummy_variable_sandwich(unbalanced_panel):
+    y, X, entity, period = unbalanced_panel
+    result = fit_fixed_effects(y, X, [entity, period], cluster=entity, tol=1e-13)
+
+    design, beta, resid, xtx_inv = _dense_ols(y, X, entity, period)
+    scores = np.vstack([design[entity == g].T @ resid[entity == g] for g in range(7)])
+    # Entity effects are nested in the entity clusters, so only the 12 period levels count towards K
+    n, G = len(y), 7
+    correction = G / (G - 1) * (n - 1) / (n - 2 - 12)
+    cov = correction * xtx_inv @ scores.T @ scores @ xtx_inv
+    np.testing.assert_allclose(result["coefficients"]["std_error"], np.sqrt(np.diag(cov)[:2]), rtol=1e-7)
+    assert result["df_resid"] == G - 1
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from process_data import (WHO_TOLERANCE, build_country_panel, get_better_covid_data, process_all_data,
+                          reconcile_sources, update_weekly_data)
+
+
+def _sources(seed=0):
+    """Small OWID, WHO and NY Times frames shaped like the raw downloads"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2020-01-21', '2021-12-31')
+    n = len(dates)
+    cases = np.cumsum(rng.poisson(50, n))
+    deaths = np.cumsum(rng.poisson(2, n))
+    nyt = pd.DataFrame({'date': dates.strftime('%Y-%m-%d'), 'cases': cases, 'deaths': deaths})
+
+    vaccinated = np.where(dates >= '2020-12-15', np.linspace(0, 80, n), np.nan)
+    vaccinated[rng.random(n) < 0.1] = np.nan  # gaps exercise the forward fill
+    owid = pd.concat([pd.DataFrame({
+        'location': location,
+        'date': dates.strftime('%Y-%m-%d'),
+        'total_cases': cases * scale,
+        'new_cases': np.r_[cases[0], np.diff(cases)] * scale,
+        'people_vaccinated_per_hundred': vaccinated * scale,
+        'people_vaccinated': vaccinated * 3e6 * scale,
+        'total_vaccinations': vaccinated * 5e6 * scale,
+        'people_fully_vaccinated': vaccinated * 2e6 * scale
+    }) for location, scale in [('United States', 1.0), ('Canada', 0.5)]], ignore_index=True)
+
+    weeks = pd.date_range('2020-01-05', '2021-12-26', freq='W-SUN')
+    who = pd.DataFrame({'Date_reported': weeks.strftime('%Y-%m-%d'), 'Country': 'United States of America',
+                        'New_cases': rng.poisson(350, len(weeks))})
+    return owid, who, nyt
+
+
+@pytest.fixture
+def sources(tmp_path, monkeypatch):
+    # The processing stage writes under data/processed relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    return _sources()
+
+
+@pytest.mark.parametrize("cutoff", ['2020-01-25', '2020-06-14', '2020-11-03', '2021-02-28', '2021-07-15',
+                                    '2021-12-30'])
+def test_incremental_refresh_matches_full_rebuild(sources, cutoff):
+    owid_df, who_df, nyt_df = sources
+    _, _, full = process_all_data(owid_df, who_df, nyt_df, save_processed=False)
+
+    cutoff = pd.Timestamp(cutoff)
+    earlier = get_better_covid_data(nyt_df[pd.to_datetime(nyt_df['date']) <= cutoff],
+                                    owid_df[pd.to_datetime(owid_df['date']) <= cutoff], save_path=None,
+                                    who_df=who_df[pd.to_datetime(who_df['Date_reported']) <= cutoff])
+    refreshed = update_weekly_data(earlier, nyt_df, owid_df, save_path=None, who_df=who_df)
+
+    pd.testing.assert_frame_equal(refreshed, full, check_exact=True)
+
+
+def test_refresh_without_new_dates_keeps_stored_weeks(sources):
+    owid_df, who_df, nyt_df = sources
+    stored = get_better_covid_data(nyt_df, owid_df, save_path=None, who_df=who_df)
+    refreshed = update_weekly_data(stored, nyt_df, owid_df, save_path=None, who_df=who_df)
+    pd.testing.assert_frame_equal(refreshed, stored, check_exact=True)
+
+
+def test_country_panel_matches_single_country_processing(sources):
+    owid_df, _, _ = sources
+    owid_df = owid_df.assign(total_deaths=owid_df['total_cases'] // 40)
+    # Missing days exercise the panel's completed daily grid
+    owid_df = owid_df.drop(owid_df[owid_df['location'] == 'Canada'].index[[40, 41, 300]])
+    panel = build_country_panel(owid_df)
+
+    for country in ['Canada', 'United States']:
+        rows = owid_df[owid_df['location'] == country]
+        # The panel takes cases and deaths from OWID; feed the same counts in as the NY Times series
+        counts = pd.DataFrame({'date': rows['date'], 'cases': rows['total_cases'], 'deaths': rows['total_deaths']})
+        expected = get_better_covid_data(counts, owid_df, country=country, save_path=None).set_index('date')
+        actual = panel.loc[country]
+        pd.testing.assert_frame_equal(actual, expected[actual.columns], check_dtype=False)
+
+
+def test_who_reports_align_to_weekly_bins_within_tolerance():
+    weeks = pd.date_range('2021-01-03', periods=6, freq='W-SUN')
+    weekly = pd.DataFrame({'date': weeks, 'new_cases': np.arange(6.0), 'new_cases_owid': np.arange(6.0)})
+    who = pd.DataFrame({
+        'Date_reported': ['2021-01-03',  # on the bin's Sunday
+                          '2021-01-04',  # one day after: belongs to the next bin, six days before its Sunday
+                          '2021-01-13',  # Wednesday, four days before its Sunday
+                          '2021-01-20',  # superseded by the later report in the same bin
+                          '2021-01-22',
+                          '2021-01-30',
+                          '2021-01-31'],  # seven days before the last Sunday: out of tolerance there
+        'Country': 'United States of America',
+        'New_cases': [10, 20, 30, 40, None, 60, 70]
+    })
+    other = who.assign(Country='Canada', New_cases=999)
+
+    reconciled = reconcile_sources(weekly, pd.concat([other, who]), country='United States')
+
+    # Reference: latest report dated within WHO_TOLERANCE before each bin's Sunday
+    reported = pd.to_datetime(who['Date_reported'])
+    expected = []
+    for sunday in weeks:
+        in_range = who[(reported <= sunday) & (reported >= sunday - WHO_TOLERANCE)]
+        expected.append(in_range['New_cases'].fillna(0).iloc[-1] if len(in_range) else np.nan)
+
+    np.testing.assert_array_equal(reconciled['new_cases_who'].to_numpy(), expected)
+    np.testing.assert_array_equal(expected, [10, 20, 30, 0, 70, np.nan])
+    np.testing.assert_array_equal(reconciled['new_cases_nyt'], weekly['new_cases'])
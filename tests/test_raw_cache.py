@@ -0,0 +1,98 @@
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from raw_cache import fetch_cached
+
+
+class _SourceHandler(BaseHTTPRequestHandler):
+    """Serves the server's current body with an ETag, honouring If-None-Match"""
+
+    def do_GET(self):
+        body = self.server.body
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        self.server.requests += 1
+        if self.server.send_etag and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", str(len(body)))
+        if self.server.send_etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _SourceHandler)
+    httpd.body = b"date,cases\n2020-01-01,1\n"
+    httpd.send_etag = True
+    httpd.requests = 0
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}/data.csv"
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_download_then_not_modified(server, tmp_path):
+    path, status = fetch_cached(_url(server), cache_dir=str(tmp_path))
+    assert status == "downloaded"
+    assert _read(path) == server.body
+
+    path_again, status = fetch_cached(_url(server), cache_dir=str(tmp_path))
+    assert status == "not_modified"
+    assert path_again == path
+    assert server.requests == 2
+
+
+def test_changed_body_replaces_blob(server, tmp_path):
+    old_path, _ = fetch_cached(_url(server), cache_dir=str(tmp_path))
+    server.body = b"date,cases\n2020-01-01,1\n2020-01-02,3\n"
+
+    new_path, status = fetch_cached(_url(server), cache_dir=str(tmp_path))
+    assert status == "downloaded"
+    assert new_path != old_path
+    assert _read(new_path) == server.body
+    assert not (tmp_path / "objects" / old_path.split("/")[-1]).exists()
+
+
+def test_same_content_without_validators_is_unchanged(server, tmp_path):
+    server.send_etag = False
+    path, status = fetch_cached(_url(server), cache_dir=str(tmp_path))
+    assert status == "downloaded"
+
+    path_again, status = fetch_cached(_url(server), cache_dir=str(tmp_path))
+    assert status == "unchanged"
+    assert path_again == path
+    assert _read(path) == server.body
+
+
+def test_offline_hit_and_miss(server, tmp_path):
+    path, _ = fetch_cached(_url(server), cache_dir=str(tmp_path))
+    requests_before = server.requests
+
+    offline_path, status = fetch_cached(_url(server), cache_dir=str(tmp_path), offline=True)
+    assert status == "offline"
+    assert offline_path == path
+    assert server.requests == requests_before
+
+    with pytest.raises(FileNotFoundError):
+        fetch_cached(_url(server) + "?other", cache_dir=str(tmp_path), offline=True)
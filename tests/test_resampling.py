@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from scipy import stats
+
+from resampling import (batched_pearson, batched_proportion_difference, bootstrap, bootstrap_indices,
+                        permutation_test)
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(11)
+    x = np.cumsum(rng.normal(size=120))
+    y = 0.4 * x + rng.normal(size=120)
+    return x, y
+
+
+def _reference_interval(statistic, arrays, n_resamples, block_size, seed, batch_size, confidence=0.95):
+    """Percentile interval from one resample at a time, drawing the same indices as bootstrap"""
+    sizes = [batch_size] * (n_resamples // batch_size)
+    if n_resamples % batch_size:
+        sizes.append(n_resamples % batch_size)
+    values = []
+    for size, batch_seed in zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))):
+        for idx in bootstrap_indices(len(arrays[0]), size, block_size, np.random.default_rng(batch_seed)):
+            values.append(statistic(*(a[idx] for a in arrays)))
+    values = np.array(values)
+    values = values[np.isfinite(values)]
+    alpha = 1 - confidence
+    return np.percentile(values, [100 * alpha / 2, 100 * (1 - alpha / 2)]), values.std(ddof=1)
+
+
+@pytest.mark.parametrize("block_size", [None, 5])
+def test_pearson_interval_matches_percentile_reference(series, block_size):
+    result = bootstrap(batched_pearson, series, n_resamples=2_500, block_size=block_size, seed=1, batch_size=1_000)
+    (low, high), std_error = _reference_interval(lambda x, y: np.corrcoef(x, y)[0, 1], series, 2_500,
+                                                 block_size, 1, 1_000)
+
+    assert result["estimate"] == pytest.approx(np.corrcoef(*series)[0, 1])
+    assert (result["ci_low"], result["ci_high"]) == pytest.approx((low, high), rel=1e-9)
+    assert result["std_error"] == pytest.approx(std_error, rel=1e-9)
+
+
+def test_proportion_interval_matches_percentile_reference(series):
+    outcome = (series[1] > 0).astype(float)
+    in_group = (series[0] > np.median(series[0])).astype(float)
+
+    def difference(outcome, in_group):
+        in_group = in_group.astype(bool)
+        return outcome[in_group].mean() - outcome[~in_group].mean()
+
+    result = bootstrap(batched_proportion_difference, (outcome, in_group), n_resamples=1_500, block_size=4,
+                       seed=2, batch_size=600)
+    (low, high), _ = _reference_interval(difference, (outcome, in_group), 1_500, 4, 2, 600)
+    assert (result["ci_low"], result["ci_high"]) == pytest.approx((low, high), rel=1e-9)
+
+
+def test_moving_blocks_are_contiguous_runs():
+    idx = bootstrap_indices(50, 200, block_size=7, rng=np.random.default_rng(0))
+    assert idx.shape == (200, 50)
+    steps = np.diff(idx, axis=1)
+    within_block = np.arange(1, 50) % 7 != 0
+    assert (steps[:, within_block] == 1).all()
+
+
+def test_result_does_not_depend_on_n_jobs(series):
+    serial = bootstrap(batched_pearson, series, n_resamples=3_000, block_size=5, seed=3, batch_size=1_000, n_jobs=1)
+    pooled = bootstrap(batched_pearson, series, n_resamples=3_000, block_size=5, seed=3, batch_size=1_000, n_jobs=2)
+    np.testing.assert_array_equal(serial["values"], pooled["values"])
+
+
+@pytest.mark.parametrize("statistic", ['pearson', 'proportion_difference'])
+def test_permutation_p_value_is_nan_for_constant_input(statistic):
+    varying = (np.arange(40) % 3 == 0).astype(float)
+    for x, y in [(np.ones(40), varying), (varying, np.zeros(40))]:
+        result = permutation_test(x, y, statistic=statistic, seed=0)
+        assert np.isnan(result["p_value"]) and np.isnan(result["observed"])
+        assert result["n_permutations"] == 0
+
+
+@pytest.mark.parametrize("slope", [0.0, 0.25, 0.4])
+def test_permutation_p_value_tracks_t_test_on_gaussian_data(slope):
+    rng = np.random.default_rng(5)
+    x = rng.normal(size=80)
+    y = slope * x + rng.normal(size=80)
+
+    result = permutation_test(x, y, statistic='pearson', seed=6, tolerance=0.002)
+    t_test = stats.pearsonr(x, y)
+    assert result["observed"] == pytest.approx(t_test.statistic)
+    assert abs(result["p_value"] - t_test.pvalue) < 5 * result["mc_std_error"] + 0.005
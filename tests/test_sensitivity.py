@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analyze import calculate_correlation_analysis, run_complete_analysis
+from process_data import END_DATE, START_DATE
+from sensitivity import run_sensitivity
+
+
+@pytest.fixture(scope="module")
+def weekly():
+    rng = np.random.default_rng(17)
+    # Week-end labels through 2023-01-01, whose week (Dec 26-Jan 1) starts inside the analysis window
+    dates = pd.date_range('2020-01-26', '2023-01-01', freq='W-SUN')
+    vaccination = np.clip(np.linspace(-0.3, 0.8, len(dates)), 0, None)
+    cases = rng.poisson(5e4 * (1.5 + np.sin(np.arange(len(dates)) / 8))).astype(float)
+    return pd.DataFrame({'date': dates, 'I': (rng.random(len(dates)) > 0.2).astype(int),
+                         'vaccination_rate': vaccination, 'new_cases': cases})
+
+
+def _grid(**overrides):
+    return {'threshold': [0.5], 'lag': [0], 'frequency': ['W'], 'window': [(START_DATE, END_DATE)], **overrides}
+
+
+def test_baseline_grid_point_matches_complete_analysis(weekly, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    point = run_sensitivity(weekly, grid=_grid(), n_jobs=1, save_path=None).iloc[0]
+    results = run_complete_analysis(weekly.set_index('date'), n_bootstrap=0)
+
+    correlation, tests = results['correlation_analysis'], results['statistical_tests']
+    assert point['n'] == correlation['sample_size'] == len(weekly)
+    for column, expected in [('correlation_coefficient', correlation['correlation_coefficient']),
+                             ('t_statistic', correlation['t_statistic']), ('p_value', correlation['p_value']),
+                             ('n_high', tests['n_high']), ('n_low', tests['n_low']),
+                             ('difference', tests['difference']), ('z_statistic', tests['z_statistic']),
+                             ('z_p_value', tests['p_value'])]:
+        assert point[column] == pytest.approx(expected, rel=1e-9), column
+
+
+def test_lagged_grid_points_pair_vaccination_with_later_cases(weekly):
+    points = run_sensitivity(weekly, grid=_grid(lag=[0, 3, 10], window=[('2021-01-01', END_DATE)]), n_jobs=1,
+                             save_path=None)
+    window = weekly[weekly['date'] >= '2021-01-01'].reset_index(drop=True)
+    for _, point in points.iterrows():
+        lag = int(point['lag'])
+        pairs = pd.DataFrame({'vaccination_rate': window['vaccination_rate'].iloc[:len(window) - lag].to_numpy(),
+                              'new_cases': window['new_cases'].iloc[lag:].to_numpy()})
+        expected = calculate_correlation_analysis(pairs)
+        assert point['n'] == len(pairs)
+        assert point['correlation_coefficient'] == pytest.approx(expected['correlation_coefficient'], rel=1e-9)
@@ -0,0 +1,64 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import stage_cache
+from process_data import process_all_data
+from stage_cache import load_stage, stage_key, store_stage
+from test_process_data import _sources
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # A strictly increasing clock, so last-used order never ties
+    ticks = itertools.count(1)
+    monkeypatch.setattr(stage_cache.time, "time", lambda: float(next(ticks)))
+
+
+def _frame(seed):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2021-01-03', periods=5, freq='W-SUN', name='date').astype('datetime64[ns]')
+    return pd.DataFrame({'value': rng.normal(size=5)}, index=dates)
+
+
+def test_hit_returns_stored_outputs_and_miss_returns_none(tmp_path):
+    df = _frame(0)
+    key = stage_key((df,), country="United States")
+    assert load_stage('process', key, cache_dir=tmp_path) is None
+
+    store_stage('process', key, {'weekly': df}, cache_dir=tmp_path)
+    cached = load_stage('process', key, cache_dir=tmp_path)
+    pd.testing.assert_frame_equal(cached['weekly'], df)
+
+    assert stage_key((_frame(1),), country="United States") != key
+    assert stage_key((df,), country="Canada") != key
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path, clock):
+    keys = [stage_key((_frame(seed),)) for seed in range(3)]
+    store_stage('process', keys[0], {'weekly': _frame(0)}, cache_dir=tmp_path, max_entries=2)
+    store_stage('process', keys[1], {'weekly': _frame(1)}, cache_dir=tmp_path, max_entries=2)
+    # Touching the older entry makes the second one the least recently used
+    assert load_stage('process', keys[0], cache_dir=tmp_path) is not None
+    store_stage('process', keys[2], {'weekly': _frame(2)}, cache_dir=tmp_path, max_entries=2)
+
+    assert load_stage('process', keys[0], cache_dir=tmp_path) is not None
+    assert load_stage('process', keys[1], cache_dir=tmp_path) is None
+    assert load_stage('process', keys[2], cache_dir=tmp_path) is not None
+
+
+def test_processing_reuses_cached_output(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    owid_df, who_df, nyt_df = _sources()
+    _, _, first = process_all_data(owid_df, who_df, nyt_df, memoize=True)
+    capsys.readouterr()
+
+    _, _, second = process_all_data(owid_df, who_df, nyt_df, memoize=True)
+    assert "reusing cached processed data" in capsys.readouterr().out
+    pd.testing.assert_frame_equal(second, first, check_dtype=False)
+
+    _, _, other = process_all_data(owid_df, who_df, nyt_df.iloc[:-30], memoize=True)
+    assert "reusing cached processed data" not in capsys.readouterr().out
+    assert len(other) < len(first)
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from analyze import (calculate_bernoulli_parameters, calculate_binomial_parameters, calculate_conditional_probabilities,
+                     calculate_correlation_analysis, perform_statistical_tests)
+from process_data import get_better_covid_data
+from streaming import AnalysisAccumulator, accumulate
+from test_process_data import _sources
+
+
+@pytest.fixture(scope="module")
+def weekly():
+    owid_df, who_df, nyt_df = _sources(seed=4)
+    df = get_better_covid_data(nyt_df, owid_df, save_path=None, who_df=who_df).set_index('date')
+    # Some weeks without infections keep both groups and outcomes non-constant
+    df.loc[df.index[::5], 'I'] = 0
+    return df
+
+
+def _assert_same(actual, expected):
+    assert actual.keys() == expected.keys()
+    for key, value in expected.items():
+        if isinstance(value, str):
+            assert actual[key] == value, key
+        else:
+            np.testing.assert_allclose(actual[key], value, rtol=1e-10, atol=1e-12, err_msg=key)
+
+
+def _reference(df, threshold=0.5):
+    return {
+        "bernoulli": calculate_bernoulli_parameters(df),
+        "conditional": calculate_conditional_probabilities(df, threshold=threshold),
+        "binomial_weekly": calculate_binomial_parameters(df, period="W")[0],
+        "correlation_analysis": calculate_correlation_analysis(df),
+        "statistical_tests": perform_statistical_tests(df, threshold=threshold)
+    }
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 40, 1_000])
+def test_chunked_accumulator_matches_analysis_functions(weekly, chunk_size):
+    acc = accumulate(weekly.iloc[i:i + chunk_size] for i in range(0, len(weekly), chunk_size))
+    results = acc.results()
+    for key, expected in _reference(weekly).items():
+        _assert_same(results[key], expected)
+
+
+def test_merged_partitions_match_analysis_functions(weekly):
+    # Partitions accumulated separately (e.g. on workers) and merged out of order
+    bounds = [0, 13, 14, 60, 101, len(weekly)]
+    parts = [AnalysisAccumulator(threshold=0.3).update(weekly.iloc[lo:hi]) for lo, hi in zip(bounds, bounds[1:])]
+    acc = AnalysisAccumulator(threshold=0.3)
+    for part in reversed(parts):
+        acc.merge(part)
+
+    results = acc.results()
+    for key, expected in _reference(weekly, threshold=0.3).items():
+        _assert_same(results[key], expected)
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from subnational import build_subnational_panel
+
+
+@pytest.fixture
+def counties_csv(tmp_path):
+    rng = np.random.default_rng(3)
+    frames = []
+    for i, (state, county, fips, first_day) in enumerate([('Washington', 'King', '53033', '2020-01-21'),
+                                                          ('Washington', 'Pierce', '53053', '2020-03-02'),
+                                                          ('New York', 'New York City', None, '2020-03-01'),
+                                                          ('Alabama', 'Autauga', '1001', '2020-03-24')]):
+        dates = pd.date_range(first_day, '2020-07-31')
+        # Counties enter the file with a non-zero cumulative count
+        cases = 1000 * (i + 1) + np.cumsum(rng.poisson(20, len(dates))).astype(float)
+        cases[rng.random(len(dates)) < 0.05] = np.nan
+        cases[10] -= 30  # a downward correction
+        frames.append(pd.DataFrame({'date': dates, 'county': county, 'state': state, 'fips': fips,
+                                    'cases': cases, 'deaths': np.floor(cases / 50)}))
+    # The NY Times files are sorted by date
+    path = tmp_path / "us-counties.csv"
+    pd.concat(frames).sort_values('date', kind='stable').to_csv(path, index=False)
+    return str(path)
+
+
+def test_chunked_panel_matches_single_chunk(counties_csv):
+    whole = build_subnational_panel(counties_csv, "counties", chunksize=1_000_000)
+    for chunksize in (7, 50, 333):
+        pd.testing.assert_frame_equal(build_subnational_panel(counties_csv, "counties", chunksize=chunksize), whole)
+
+
+def test_first_report_of_each_county_is_not_a_spike(counties_csv):
+    panel = build_subnational_panel(counties_csv, "counties", start_date="2020-01-01")
+
+    raw = pd.read_csv(counties_csv, dtype={'fips': str}, parse_dates=['date'])
+    raw['geo'] = raw['fips'].str.zfill(5).fillna(raw['state'] + '|' + raw['county'])
+    # Same rule as the national series: diff of the forward-filled cumulative count, first day 0
+    cumulative = raw.groupby('geo')['cases'].ffill()
+    raw['new_cases'] = cumulative.groupby(raw['geo']).diff().fillna(0).clip(lower=0)
+    expected = raw.groupby(['geo', pd.Grouper(key='date', freq='W-SUN')])['new_cases'].sum()
+
+    keys = list(zip(panel.index.get_level_values('fips').astype(str), panel.index.get_level_values('date')))
+    np.testing.assert_array_equal(panel['new_cases'].to_numpy(), expected.loc[keys].to_numpy())
+    assert len(panel) == len(expected)
+    assert panel['new_cases'].max() < 1000